@@ -1,8 +1,11 @@
 import os
 import streamlit as st
-import requests
 import pandas as pd
 from core.config import BACKEND_URL, CREDENTIALS_PATH
+from backend_upload import upload_to_backend
+from connection_check import check_connection
+from jobs import get_job, render_job_status, submit_job, track_job
+from metadata_ingest import detached_copy
 
 # NOTE: this module exposes a callable function `render_configure_page(selected_tool)`
 # so the configuration UI can be embedded in other pages without creating a new Streamlit page.
@@ -151,30 +154,24 @@ def render_configure_page(selected_tool: str = 'Tableau'):
     # ---------- Handle Test Connection ----------
     if test_conn:
         if server and token_name and token_secret:
-            with st.spinner('Testing connection...'):
-                try:
-                    config = {
-                        'tableau_prod': {
-                            'server': server,
-                            'api_version': api_version,
-                            'personal_access_token_name': token_name,
-                            'personal_access_token_secret': token_secret,
-                            'site_name': site_name,
-                        }
-                    }
-                    adapter_key = selected_tool.lower() if selected_tool else 'tableau'
-                    r = requests.post(
-                        f'{BACKEND_URL}/reports/test-connection',
-                        json={'adapter': adapter_key, 'config': config},
-                        timeout=30,
-                    )
-                    r.raise_for_status()
-                    st.success('Connection successful!')
-                except Exception as e:
-                    st.error(f'Connection failed: {e}')
+            config = {
+                'tableau_prod': {
+                    'server': server,
+                    'api_version': api_version,
+                    'personal_access_token_name': token_name,
+                    'personal_access_token_secret': token_secret,
+                    'site_name': site_name,
+                }
+            }
+            adapter_key = selected_tool.lower() if selected_tool else 'tableau'
+            track_job(submit_job('Test connection', check_connection, adapter_key, config,
+                                 progress_kw='on_progress', cancel_kw='cancel'))
         else:
             st.warning('Please fill in Server, Token name, and Token secret to test the connection.')
 
+    # Runs in the background (see connection_check.py): live stage, elapsed time and Cancel
+    render_job_status()
+
     # ---------- Upload metadata file ----------
     st.markdown("<div style='margin-top:2rem;'></div>", unsafe_allow_html=True)
     st.markdown(
@@ -203,6 +200,22 @@ def render_configure_page(selected_tool: str = 'Tableau'):
         except Exception as e:
             st.error(f"Failed to read CSV: {e}")
 
+    # Handle Upload button: send the file to the backend in resumable, compressed chunks. It runs
+    # as a background job (progress and errors show in the job status above), not on this thread.
+    if upload_btn:
+        if uploaded_file is None:
+            st.warning('Choose a metadata file to upload first.')
+        else:
+            job_id = submit_job(f'Upload {uploaded_file.name} to backend', upload_to_backend,
+                                detached_copy(uploaded_file), BACKEND_URL, progress_kw='on_progress', lane='batch')
+            st.session_state['backend_upload_job'] = job_id
+            track_job(job_id)
+            st.rerun()
+    upload_job = get_job(st.session_state.get('backend_upload_job'))
+    if upload_job is not None and upload_job['status'] == 'done':
+        result = upload_job['result']
+        st.success(f"Sent {result['name']} to the backend ({result['size']:,} bytes, checksum verified)")
+
     # ---------- Save and Cancel buttons at bottom ----------
     st.markdown("<div style='margin-top:2rem;'></div>", unsafe_allow_html=True)
     
@@ -0,0 +1,91 @@
+import importlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:  # Python < 3.8
+    entry_points = None
+
+# NOTE: the BI environments on the choose_tool page come from this registry instead of a
+# hard-coded list. adapters.json lists every tool (key, name, logo) with the "module:function"
+# that renders its configure page, or null while it is "coming soon". Installed packages can
+# add or replace adapters through the `bi4bi.adapters` entry point group, e.g.
+#   [project.entry-points."bi4bi.adapters"]
+#   powerbi = "bi4bi_powerbi.configure:render_configure_page"
+# Listing tools reads only the manifest and package metadata. An adapter's module, and the
+# heavy libraries it pulls in, is imported the first time its tool is configured, and the
+# import time is recorded (import_times()).
+
+ADAPTER_MANIFEST = Path(os.environ.get("BI4BI_ADAPTER_MANIFEST", Path(__file__).parent / "adapters.json"))
+ENTRY_POINT_GROUP = "bi4bi.adapters"
+
+_registry = None
+_loaded = {}  # adapter key -> render function
+_import_seconds = {}  # adapter key -> seconds its first import took
+_lock = threading.Lock()
+
+
+def _plugin_entries() -> dict:
+    """{adapter key: "module:function"} from installed entry points (nothing is imported)."""
+    if entry_points is None:
+        return {}
+    try:
+        found = entry_points(group=ENTRY_POINT_GROUP)
+    except TypeError:  # Python < 3.10
+        found = entry_points().get(ENTRY_POINT_GROUP, [])
+    return {ep.name: ep.value for ep in found}
+
+
+def registry() -> list:
+    """Adapter specs (key, name, logo, entry), manifest order first, then plugin-only adapters."""
+    global _registry
+    with _lock:
+        if _registry is None:
+            manifest = json.loads(ADAPTER_MANIFEST.read_text(encoding="utf-8"))["adapters"]
+            plugins = _plugin_entries()
+            adapters = []
+            for spec in manifest:
+                spec = dict(spec)
+                spec["entry"] = plugins.pop(spec["key"], spec.get("entry"))
+                adapters.append(spec)
+            for key, entry in sorted(plugins.items()):
+                adapters.append({"key": key, "name": key.replace("_", " ").title(), "logo": None, "entry": entry})
+            _registry = adapters
+        return _registry
+
+
+def tools() -> list:
+    """The choose_tool list: name, logo and adapter_key (None while no adapter is installed)."""
+    return [{"name": a["name"], "logo": a["logo"], "adapter_key": a["key"] if a["entry"] else None} for a in registry()]
+
+
+def adapter_key_for(tool_name: str):
+    return next((a["key"] for a in registry() if a["name"] == tool_name), None)
+
+
+def load_adapter(key: str):
+    """The adapter's render function, importing its module on first use."""
+    with _lock:
+        render = _loaded.get(key)
+    if render is not None:
+        return render
+    spec = next((a for a in registry() if a["key"] == key), None)
+    if spec is None or not spec["entry"]:
+        raise KeyError(f"No adapter installed for {key!r}")
+    module_name, _, function = spec["entry"].partition(":")
+    started = time.perf_counter()
+    render = getattr(importlib.import_module(module_name), function or "render_configure_page")
+    with _lock:
+        _import_seconds.setdefault(key, time.perf_counter() - started)
+        _loaded[key] = render
+    return render
+
+
+def import_times() -> dict:
+    """{adapter key: seconds} for the adapters imported so far in this process."""
+    with _lock:
+        return dict(_import_seconds)
@@ -0,0 +1,87 @@
+import base64
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+# NOTE: this module is imported once per process, so everything cached here is shared by
+# every Streamlit session instead of being rebuilt on each rerun.
+
+ASSET_CACHE_MAX_BYTES = int(os.environ.get("BI4BI_ASSET_CACHE_BYTES", 32 * 1024 * 1024))
+
+
+class ByteLRUCache:
+    """Thread-safe LRU cache that evicts by total byte size instead of entry count."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            # Values bigger than the whole budget are returned to the caller but never stored
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (value, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+ASSET_CACHE = ByteLRUCache(ASSET_CACHE_MAX_BYTES)
+
+
+def file_fingerprint(path: Path) -> tuple:
+    """(resolved path, mtime_ns, size) — changes whenever the file on disk is replaced or edited."""
+    stat = path.stat()
+    return str(path.resolve()), stat.st_mtime_ns, stat.st_size
+
+
+def get_data_uri(path: Path, mime: str = None) -> str:
+    """Return `data:<mime>;base64,...` for `path`, encoding it only once per file version."""
+    key = ("data_uri",) + file_fingerprint(path)
+    uri = ASSET_CACHE.get(key)
+    if uri is None:
+        if mime is None:
+            mime, _ = mimetypes.guess_type(str(path))
+        b64 = base64.b64encode(path.read_bytes()).decode("utf-8")
+        uri = f"data:{mime or 'application/octet-stream'};base64,{b64}"
+        ASSET_CACHE.put(key, uri, len(uri))
+    return uri
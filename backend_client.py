@@ -0,0 +1,282 @@
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from core.config import BACKEND_URL
+
+# NOTE: every call to BACKEND_URL goes through one requests.Session per process. Its
+# connection pool keeps TCP/TLS connections alive between calls (and between sessions and
+# reruns), so only the first request pays for the handshake. Failed connects and
+# 502/503/504 answers are retried with exponential backoff (honouring Retry-After); POSTs
+# are only retried when the caller marks them idempotent. Connect and read timeouts are
+# separate: an unreachable host fails in seconds, a slow but alive backend gets the full
+# read timeout.
+# Every call is timed into a per-endpoint latency histogram (log-spaced buckets, so p50/p95/
+# p99 cost a fixed 60 counters per endpoint) and feeds a circuit breaker. When at least
+# BREAKER_MIN_CALLS calls in the last BREAKER_WINDOW_SECONDS failed (connection errors,
+# timeouts, 502/503/504) at BREAKER_FAILURE_RATIO or worse, the breaker opens and calls fail at once
+# with BackendUnavailable instead of each waiting out its timeouts. After a cooldown one
+# probe call is let through (half-open): success closes the breaker, failure reopens it
+# with a doubled cooldown. Other 5xx count as errors in the endpoint stats but not for the
+# breaker: the backend answered, often relaying a client's broken Tableau site (e.g. during
+# a bulk connection test), and that must not cut every user off. render_health_panel() shows
+# all of it.
+
+BACKEND_CONNECT_TIMEOUT = float(os.environ.get("BI4BI_BACKEND_CONNECT_TIMEOUT", 3.05))
+BACKEND_READ_TIMEOUT = float(os.environ.get("BI4BI_BACKEND_READ_TIMEOUT", 30))
+BACKEND_RETRIES = int(os.environ.get("BI4BI_BACKEND_RETRIES", 3))
+BACKEND_BACKOFF = float(os.environ.get("BI4BI_BACKEND_BACKOFF", 0.5))
+BACKEND_POOL_SIZE = int(os.environ.get("BI4BI_BACKEND_POOL_SIZE", 16))
+RETRY_STATUSES = (502, 503, 504)
+BREAKER_WINDOW_SECONDS = float(os.environ.get("BI4BI_BREAKER_WINDOW", 30))
+BREAKER_MIN_CALLS = int(os.environ.get("BI4BI_BREAKER_MIN_CALLS", 5))
+BREAKER_FAILURE_RATIO = float(os.environ.get("BI4BI_BREAKER_FAILURE_RATIO", 0.5))
+BREAKER_COOLDOWN_SECONDS = float(os.environ.get("BI4BI_BREAKER_COOLDOWN", 15))
+BREAKER_MAX_COOLDOWN_SECONDS = 120
+LATENCY_BUCKETS_MS = tuple(1.25 ** i for i in range(60))  # upper bounds, 1 ms .. ~9 min
+
+_sessions = {}  # idempotent POSTs retried or not -> session
+_lock = threading.Lock()
+
+_stats = {}  # endpoint -> {calls, errors, buckets, last_error}
+_breaker = {"state": "closed", "opened_at": 0.0, "cooldown": BREAKER_COOLDOWN_SECONDS, "probing": False,
+            "recent": deque()}  # recent: (monotonic time, healthy) of calls in the window
+_stats_lock = threading.Lock()
+
+
+class BackendUnavailable(requests.ConnectionError):
+    """Raised without contacting the backend while the circuit breaker is open."""
+
+
+# ---------------- HEALTH ----------------
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,})$")
+
+
+def endpoint_name(method: str, url: str) -> str:
+    """'PUT /uploads/{id}/chunks' — ids in the path collapsed so stats group per endpoint."""
+    path = "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in urlparse(url).path.split("/"))
+    return f"{method.upper()} {path or '/'}"
+
+
+def _admit() -> bool:
+    """Raise BackendUnavailable if the breaker is open; True if this call is the half-open probe."""
+    with _stats_lock:
+        if _breaker["state"] == "open":
+            wait = _breaker["opened_at"] + _breaker["cooldown"] - time.monotonic()
+            if wait > 0:
+                raise BackendUnavailable(f"Backend unavailable (failing fast after repeated errors; next try in {wait:.0f}s)")
+            _breaker["state"], _breaker["probing"] = "half-open", False
+        if _breaker["state"] == "half-open":
+            if _breaker["probing"]:
+                raise BackendUnavailable("Backend unavailable (checking whether it has recovered)")
+            _breaker["probing"] = True
+            return True
+        return False
+
+
+def breaker_failure(response=None, error: Exception = None) -> bool:
+    """Whether a call's outcome says the backend itself is unreachable or overloaded."""
+    if error is not None:
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return response.status_code in RETRY_STATUSES
+
+
+def _record(endpoint: str, seconds: float, ok: bool, probe: bool, error: str = None, healthy: bool = None) -> None:
+    """Count a call in the endpoint's stats (`ok`) and the breaker window (`healthy`, default `ok`)."""
+    healthy = ok if healthy is None else healthy
+    now = time.monotonic()
+    with _stats_lock:
+        stats = _stats.setdefault(endpoint, {"calls": 0, "errors": 0, "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                                             "last_error": None})
+        stats["calls"] += 1
+        stats["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        if not ok:
+            stats["errors"] += 1
+            stats["last_error"] = error
+
+        recent = _breaker["recent"]
+        recent.append((now, healthy))
+        while recent and recent[0][0] < now - BREAKER_WINDOW_SECONDS:
+            recent.popleft()
+        if probe:
+            _breaker["probing"] = False
+            if healthy:
+                _breaker.update(state="closed", cooldown=BREAKER_COOLDOWN_SECONDS)
+                recent.clear()
+            else:
+                _breaker.update(state="open", opened_at=now,
+                                cooldown=min(_breaker["cooldown"] * 2, BREAKER_MAX_COOLDOWN_SECONDS))
+        elif _breaker["state"] == "closed" and len(recent) >= BREAKER_MIN_CALLS:
+            failures = sum(1 for _, good in recent if not good)
+            if failures / len(recent) >= BREAKER_FAILURE_RATIO:
+                _breaker.update(state="open", opened_at=now)
+
+
+def _percentile(buckets, q: float):
+    total = sum(buckets)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS_MS + (float("inf"),), buckets):
+        seen += count
+        if seen >= q * total:
+            return bound
+    return None
+
+
+def health_snapshot() -> dict:
+    """Breaker state plus per-endpoint calls, error rate and p50/p95/p99 latency (ms, bucket bounds)."""
+    now = time.monotonic()
+    with _stats_lock:
+        recent = [ok for t, ok in _breaker["recent"] if t >= now - BREAKER_WINDOW_SECONDS]
+        retry_in = max(_breaker["opened_at"] + _breaker["cooldown"] - now, 0.0) if _breaker["state"] == "open" else 0.0
+        endpoints = [
+            {
+                "endpoint": endpoint,
+                "calls": s["calls"],
+                "error_rate": s["errors"] / s["calls"],
+                "p50_ms": _percentile(s["buckets"], 0.50),
+                "p95_ms": _percentile(s["buckets"], 0.95),
+                "p99_ms": _percentile(s["buckets"], 0.99),
+                "last_error": s["last_error"],
+            }
+            for endpoint, s in sorted(_stats.items())
+        ]
+        state = _breaker["state"]
+    return {
+        "state": state,
+        "retry_in": retry_in,
+        "window_calls": len(recent),
+        "window_error_rate": (recent.count(False) / len(recent)) if recent else None,
+        "endpoints": endpoints,
+    }
+
+
+def reset_health() -> None:
+    with _stats_lock:
+        _stats.clear()
+        _breaker.update(state="closed", opened_at=0.0, cooldown=BREAKER_COOLDOWN_SECONDS, probing=False)
+        _breaker["recent"].clear()
+
+
+class _InstrumentedAdapter(HTTPAdapter):
+    """HTTPAdapter that goes through the circuit breaker and times every call (retries included)."""
+
+    def send(self, request, **kwargs):
+        endpoint = endpoint_name(request.method, request.url)
+        probe = _admit()
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+        except Exception as e:
+            _record(endpoint, time.perf_counter() - started, False, probe, f"{type(e).__name__}: {e}",
+                    healthy=not breaker_failure(error=e))
+            raise
+        ok = response.status_code < 500
+        _record(endpoint, time.perf_counter() - started, ok, probe, None if ok else f"HTTP {response.status_code}",
+                healthy=not breaker_failure(response))
+        return response
+
+
+def _retry(retry_post: bool) -> Retry:
+    methods = Retry.DEFAULT_ALLOWED_METHODS | ({"POST"} if retry_post else set())
+    return Retry(
+        total=BACKEND_RETRIES,
+        connect=BACKEND_RETRIES,
+        read=BACKEND_RETRIES,  # only for allowed_methods
+        status=BACKEND_RETRIES,
+        backoff_factor=BACKEND_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=methods,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # hand the last response back; callers raise_for_status()
+    )
+
+
+def get_session(retry_post: bool = False) -> requests.Session:
+    """The process-wide pooled session (one per retry policy)."""
+    with _lock:
+        session = _sessions.get(retry_post)
+        if session is None:
+            session = requests.Session()
+            adapter = _InstrumentedAdapter(pool_connections=4, pool_maxsize=BACKEND_POOL_SIZE,
+                                           max_retries=_retry(retry_post))
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update({"Accept-Encoding": "gzip, deflate", "User-Agent": "bi4bi-frontend"})
+            _sessions[retry_post] = session
+        return session
+
+
+def backend_url(path: str) -> str:
+    return f"{BACKEND_URL.rstrip('/')}/{path.lstrip('/')}"
+
+
+def request(method: str, path: str, timeout=None, idempotent: bool = False, **kwargs) -> requests.Response:
+    """Send `method` to BACKEND_URL/`path` on the pooled session.
+
+    `timeout` is (connect, read) seconds, or a single read timeout. `idempotent=True` lets a
+    POST be retried like a GET.
+    """
+    if timeout is None:
+        timeout = (BACKEND_CONNECT_TIMEOUT, BACKEND_READ_TIMEOUT)
+    elif not isinstance(timeout, tuple):
+        timeout = (BACKEND_CONNECT_TIMEOUT, timeout)
+    session = get_session(retry_post=idempotent and method.upper() == "POST")
+    return session.request(method, backend_url(path), timeout=timeout, **kwargs)
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return request("GET", path, **kwargs)
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return request("POST", path, **kwargs)
+
+
+def post_json(path: str, payload, **kwargs):
+    """POST `payload` as JSON, raise on HTTP errors and return the decoded answer (None if empty)."""
+    r = post(path, json=payload, **kwargs)
+    r.raise_for_status()
+    return r.json() if r.content else None
+
+
+def close() -> None:
+    """Drop pooled connections (e.g. in tests or after BACKEND_URL changes)."""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+# ---------------- UI ----------------
+def render_health_panel() -> None:
+    """Breaker state and per-endpoint latency / error table for this process's backend calls."""
+    health = health_snapshot()
+    labels = {"closed": "Healthy", "open": "Unavailable", "half-open": "Recovering"}
+    c1, c2, c3 = st.columns(3)
+    c1.metric("Backend", labels[health["state"]])
+    rate = health["window_error_rate"]
+    c2.metric(f"Unavailable (last {BREAKER_WINDOW_SECONDS:g}s)", "–" if rate is None else f"{rate:.0%}")
+    c3.metric(f"Calls (last {BREAKER_WINDOW_SECONDS:g}s)", f"{health['window_calls']:,}")
+    if health["state"] == "open":
+        st.warning(f"Backend calls fail immediately for another {health['retry_in']:.0f}s, then one probe is let through.")
+    if health["endpoints"]:
+        rows = [dict(row, error_rate=100 * row["error_rate"]) for row in health["endpoints"]]
+        st.dataframe(rows, use_container_width=True, hide_index=True, column_config={
+            "error_rate": st.column_config.NumberColumn("errors (%)", format="%.1f"),
+            "p50_ms": st.column_config.NumberColumn("p50 (ms)", format="%.0f"),
+            "p95_ms": st.column_config.NumberColumn("p95 (ms)", format="%.0f"),
+            "p99_ms": st.column_config.NumberColumn("p99 (ms)", format="%.0f"),
+        })
+    else:
+        st.caption("No backend calls yet.")
@@ -0,0 +1,184 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import requests
+
+from backend_client import get_session
+from metadata_store import WORKSPACE_DIR
+
+# NOTE: uploads are handed to the backend in fixed-size chunks instead of one request body,
+# so memory stays at one chunk whatever the file size and a dropped connection only costs
+# the chunk in flight. Protocol (all JSON responses):
+#   POST {base}/uploads                      {name, size, sha256, chunk_size} -> {upload_id, received}
+#   GET  {base}/uploads/{id}                 -> {upload_id, received, complete}
+#   PUT  {base}/uploads/{id}/chunks?offset=N gzip body, X-Chunk-Sha256 of the raw bytes -> {received}
+#   POST {base}/uploads/{id}/complete        {sha256} -> {complete, sha256}
+# The server only accepts a chunk at its current `received` offset, so resuming is "ask
+# where you are, seek there, carry on". The upload id for each file hash is remembered in
+# UPLOAD_STATE_DIR, so a restarted app resumes instead of starting over.
+# mock_backend.py implements the same protocol for local testing.
+
+UPLOAD_CHUNK_BYTES = int(os.environ.get("BI4BI_UPLOAD_CHUNK_BYTES", 8 * 1024 * 1024))
+UPLOAD_MAX_RETRIES = 5
+UPLOAD_TIMEOUT = (5, 60)  # (connect, read) seconds
+UPLOAD_STATE_DIR = WORKSPACE_DIR / "uploads"
+
+
+class UploadError(RuntimeError):
+    pass
+
+
+# ---------------- RESUME STATE ----------------
+def _state_path(sha256: str):
+    return UPLOAD_STATE_DIR / f"{sha256}.json"
+
+
+def _load_state(sha256: str, base_url: str):
+    try:
+        state = json.loads(_state_path(sha256).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return state if state.get("base_url") == base_url else None
+
+
+def _save_state(sha256: str, state: dict) -> None:
+    UPLOAD_STATE_DIR.mkdir(parents=True, exist_ok=True)
+    path = _state_path(sha256)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _clear_state(sha256: str) -> None:
+    try:
+        _state_path(sha256).unlink()
+    except OSError:
+        pass
+
+
+# ---------------- PROTOCOL ----------------
+def file_sha256(fileobj, block_size: int = UPLOAD_CHUNK_BYTES) -> str:
+    h = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(block_size), b""):
+        h.update(block)
+    fileobj.seek(0)
+    return h.hexdigest()
+
+
+def _file_size(fileobj) -> int:
+    size = getattr(fileobj, "size", None)
+    if size is None:
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+    return size
+
+
+def _json(r: requests.Response) -> dict:
+    r.raise_for_status()
+    return r.json()
+
+
+def _open_upload(session, base_url, name, size, sha256, chunk_size) -> dict:
+    """Resume the upload recorded for `sha256` if the backend still has it, else start one."""
+    state = _load_state(sha256, base_url)
+    if state:
+        r = session.get(f"{base_url}/uploads/{state['upload_id']}", timeout=UPLOAD_TIMEOUT)
+        if r.status_code != 404:
+            return _json(r)
+    status = _json(session.post(
+        f"{base_url}/uploads",
+        json={"name": name, "size": size, "sha256": sha256, "chunk_size": chunk_size},
+        timeout=UPLOAD_TIMEOUT,
+    ))
+    _save_state(sha256, {"base_url": base_url, "upload_id": status["upload_id"], "name": name})
+    return status
+
+
+def _send_chunk(session, base_url, upload_id, offset, chunk) -> int:
+    r = session.put(
+        f"{base_url}/uploads/{upload_id}/chunks",
+        params={"offset": offset},
+        data=gzip.compress(chunk, compresslevel=5),
+        headers={
+            "Content-Type": "application/octet-stream",
+            "Content-Encoding": "gzip",
+            "X-Chunk-Sha256": hashlib.sha256(chunk).hexdigest(),
+        },
+        timeout=UPLOAD_TIMEOUT,
+    )
+    if r.status_code == 409:  # offset mismatch: the server tells us where it actually is
+        return int(r.json()["received"])
+    return int(_json(r)["received"])
+
+
+def upload_to_backend(fileobj, base_url: str, name: str = None, chunk_size: int = UPLOAD_CHUNK_BYTES,
+                      on_progress=None, session=None) -> dict:
+    """Send a seekable file to the backend in gzip-compressed chunks, resuming where it stopped.
+
+    Retries transient failures up to UPLOAD_MAX_RETRIES times in a row, re-reading the
+    server's offset each time. Returns {upload_id, name, size, sha256, sent_bytes, seconds}.
+    """
+    base_url = base_url.rstrip("/")
+    name = name or getattr(fileobj, "name", None) or "upload.csv"
+    session = session or get_session()
+    size = _file_size(fileobj)
+    sha256 = file_sha256(fileobj)
+    started = time.perf_counter()
+    sent_bytes = 0
+    failures = 0
+
+    status = _open_upload(session, base_url, name, size, sha256, chunk_size)
+    upload_id, received = status["upload_id"], int(status["received"])
+    while received < size:
+        if on_progress is not None:
+            on_progress(received / size if size else 1.0, f"{received / 1e6:,.1f} / {size / 1e6:,.1f} MB")
+        fileobj.seek(received)
+        chunk = fileobj.read(chunk_size)
+        try:
+            received = _send_chunk(session, base_url, upload_id, received, chunk)
+            sent_bytes += len(chunk)
+            failures = 0
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            failures += 1
+            if failures > UPLOAD_MAX_RETRIES:
+                raise UploadError(f"Upload of {name} failed at byte {received:,}: {e}") from e
+            time.sleep(min(0.5 * 2 ** (failures - 1), 8))
+            try:
+                received = int(_json(session.get(f"{base_url}/uploads/{upload_id}", timeout=UPLOAD_TIMEOUT))["received"])
+            except (requests.RequestException, ValueError, KeyError):
+                pass  # keep the old offset; the next attempt sorts it out
+
+    r = session.post(f"{base_url}/uploads/{upload_id}/complete", json={"sha256": sha256}, timeout=UPLOAD_TIMEOUT)
+    done = r.json() if r.status_code == 422 else _json(r)  # 422: the backend's bytes hash differently
+    if not done.get("complete") or done.get("sha256") != sha256:
+        raise UploadError(f"Checksum mismatch for {name}: sent {sha256}, backend has {done.get('sha256')}")
+    _clear_state(sha256)
+    if on_progress is not None:
+        on_progress(1.0, f"{size / 1e6:,.1f} MB")
+    return {
+        "upload_id": upload_id,
+        "name": name,
+        "size": size,
+        "sha256": sha256,
+        "sent_bytes": sent_bytes,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def upload_many(files, base_url: str, on_progress=None) -> list:
+    """upload_to_backend() for several files, one after the other."""
+    session = get_session()
+    results = []
+    for i, f in enumerate(files):
+        def report(fraction, detail, i=i, f=f):
+            on_progress((i + fraction) / len(files), f"{f.name}: {detail}")
+
+        results.append(upload_to_backend(f, base_url, session=session,
+                                         on_progress=report if on_progress is not None else None))
+    return results
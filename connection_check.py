@@ -0,0 +1,353 @@
+import hashlib
+import hmac
+import io
+import json
+import os
+import secrets
+import socket
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+
+import backend_client
+from metadata_schema import normalize_column
+
+# NOTE: Test Connection runs in stages, each with its own deadline, so a broken stage is
+# reported by name instead of after one 30 s timeout:
+#   1. DNS      — resolve the Tableau server's host name (from the frontend)
+#   2. Connect  — open a TCP connection to it, plus the TLS handshake for https (from the frontend)
+#   3. Sign-in  — the backend signs in with the token and makes its first API call
+# Stage 3 is the backend's /reports/test-connection and decides the outcome: it is the
+# backend that has to reach Tableau, and it may well see a network the frontend does not.
+# Stages 1-2 are advisory — when they fail the check goes on and their errors are returned
+# as warnings (and added to a sign-in failure, where they usually explain it). Every stage
+# runs on a helper thread while the caller polls its cancel event, so Cancel returns at once
+# even in the middle of a blocking getaddrinfo() or HTTP read; the abandoned call finishes
+# (or times out) on its own. Called as a jobs.py job, so no st.* in here.
+# Results are cached for a short while (failures for less), so repeated clicks don't sign in
+# to the client's server again. The cache key is an HMAC of the whole config under a random
+# per-process salt: the token secret is never stored, and the key is useless outside this
+# process.
+# check_many() tests a whole list of sites (pasted or uploaded as CSV) with at most
+# CHECK_CONCURRENCY checks in flight, updating one row per site as each one finishes. A bulk
+# run gets its own stage threads, so it never queues behind (or in front of) other sessions'
+# checks. A stage's deadline starts when the stage starts running, not when it is queued, and
+# timeouts are not cached: they say more about load than about the config.
+
+DNS_TIMEOUT = float(os.environ.get("BI4BI_DNS_TIMEOUT", 5))
+CONNECT_TIMEOUT = float(os.environ.get("BI4BI_CONNECT_TIMEOUT", 10))
+SIGNIN_TIMEOUT = float(os.environ.get("BI4BI_SIGNIN_TIMEOUT", backend_client.BACKEND_READ_TIMEOUT))
+POLL_SECONDS = 0.1
+RESULT_TTL_SECONDS = float(os.environ.get("BI4BI_CONN_CACHE_TTL", 300))
+FAILURE_TTL_SECONDS = float(os.environ.get("BI4BI_CONN_CACHE_FAILURE_TTL", 30))
+RESULT_CACHE_MAX_ENTRIES = 1024
+CHECK_CONCURRENCY = int(os.environ.get("BI4BI_CONN_CHECK_CONCURRENCY", 8))
+STAGE_QUEUE_TIMEOUT = 60  # seconds a stage may wait for a free thread before giving up
+
+# Columns of a site list (normalized header -> config key); headerless lists use this order
+SITE_LIST_COLUMNS = {
+    "server": "server",
+    "site_name": "site_name",
+    "site": "site_name",
+    "api_version": "api_version",
+    "token_name": "personal_access_token_name",
+    "personal_access_token_name": "personal_access_token_name",
+    "token_secret": "personal_access_token_secret",
+    "personal_access_token_secret": "personal_access_token_secret",
+}
+SITE_LIST_ORDER = ("server", "site_name", "api_version", "personal_access_token_name", "personal_access_token_secret")
+
+_SALT = secrets.token_bytes(32)
+_results = {}  # config fingerprint -> (expires_at, checked_at, result dict or error message)
+_results_lock = threading.Lock()
+
+# Stages of abandoned (cancelled / timed out) checks keep a thread until they return
+_stage_executor = ThreadPoolExecutor(max_workers=4 * CHECK_CONCURRENCY, thread_name_prefix="bi4bi-conn-stage")
+
+
+class ConnectionCheckError(RuntimeError):
+    pass
+
+
+class ConnectionCheckCancelled(RuntimeError):
+    pass
+
+
+class ConnectionCheckTimeout(ConnectionCheckError):
+    """A stage ran out of time (or never got a thread); not remembered by the result cache."""
+
+
+def server_address(server: str):
+    """(host, port, tls) of a Tableau server URL; a bare host name means https."""
+    parsed = urlparse(server if "://" in server else f"https://{server}")
+    if not parsed.hostname:
+        raise ConnectionCheckError(f"Not a server address: {server!r}")
+    tls = parsed.scheme == "https"
+    return parsed.hostname, parsed.port or (443 if tls else 80), tls
+
+
+def _run_stage(label: str, fn, timeout: float, cancel: threading.Event = None, executor=None):
+    """fn() on a helper thread, giving up `timeout` seconds after it starts or when `cancel` is set."""
+    started = []  # monotonic start time, once a thread picks the stage up
+
+    def timed():
+        started.append(time.monotonic())
+        return fn()
+
+    future = (executor or _stage_executor).submit(timed)
+    queued_at = time.monotonic()
+    while True:
+        if cancel is not None and cancel.is_set():
+            future.cancel()
+            raise ConnectionCheckCancelled(f"Cancelled during {label}")
+        if started:
+            remaining = started[0] + timeout - time.monotonic()
+            if remaining <= 0:
+                raise ConnectionCheckTimeout(f"{label} timed out after {timeout:g}s")
+        else:
+            remaining = queued_at + STAGE_QUEUE_TIMEOUT - time.monotonic()
+            if remaining <= 0 and future.cancel():
+                raise ConnectionCheckTimeout(f"{label} did not start within {STAGE_QUEUE_TIMEOUT}s (too many checks running)")
+            remaining = max(remaining, POLL_SECONDS)
+        try:
+            return future.result(timeout=min(POLL_SECONDS, remaining))
+        except FutureTimeout:
+            continue
+        except ConnectionCheckError:
+            raise
+        except Exception as e:
+            raise ConnectionCheckError(f"{label} failed: {e}") from e
+
+
+def _resolve(host: str, port: int):
+    try:
+        return socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise ConnectionCheckError(f"DNS lookup for {host} failed: {e.strerror or e}") from e
+
+
+def _connect(addrinfo, host: str, tls: bool):
+    """Connect (and handshake) to the first of the resolved addresses that answers, in order.
+
+    A dual-stack host whose first address is unreachable still passes through the others;
+    CONNECT_TIMEOUT is shared between the attempts.
+    """
+    candidates = list(dict.fromkeys((family, socktype, proto, address) for family, socktype, proto, _, address in addrinfo))
+    errors, cause = [], None
+    for family, socktype, proto, address in candidates:
+        try:
+            with socket.socket(family, socktype, proto) as sock:
+                sock.settimeout(CONNECT_TIMEOUT / len(candidates))
+                sock.connect(address)
+                if tls:
+                    with ssl.create_default_context().wrap_socket(sock, server_hostname=host):
+                        pass
+            return address
+        except ssl.SSLError as e:
+            raise ConnectionCheckError(f"TLS handshake with {host} failed: {e.reason or e}") from e
+        except OSError as e:
+            errors.append(f"{address[0]}:{address[1]}: {e.strerror or e}")
+            cause = e
+    raise ConnectionCheckError(f"Could not connect to {host} ({'; '.join(errors)})") from cause
+
+
+# ---------------- RESULT CACHE ----------------
+def config_fingerprint(adapter_key: str, config: dict) -> str:
+    canonical = json.dumps({"adapter": adapter_key, "config": config}, sort_keys=True, default=str)
+    return hmac.new(_SALT, canonical.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _cached(fingerprint: str):
+    with _results_lock:
+        entry = _results.get(fingerprint)
+        if entry is not None and entry[0] <= time.monotonic():
+            del _results[fingerprint]
+            entry = None
+    return entry
+
+
+def _remember(fingerprint: str, outcome, ttl: float) -> None:
+    now = time.monotonic()
+    with _results_lock:
+        if len(_results) >= RESULT_CACHE_MAX_ENTRIES:
+            for key in [k for k, e in _results.items() if e[0] <= now] or [min(_results, key=lambda k: _results[k][0])]:
+                del _results[key]
+        _results[fingerprint] = (now + ttl, now, outcome)
+
+
+def forget(adapter_key: str, config: dict) -> None:
+    with _results_lock:
+        _results.pop(config_fingerprint(adapter_key, config), None)
+
+
+# ---------------- CHECK ----------------
+def _cacheable(error: ConnectionCheckError) -> bool:
+    """Whether a failure says something about the config (not about load or the backend)."""
+    if isinstance(error, ConnectionCheckTimeout):
+        return False
+    return not isinstance(error.__cause__, (backend_client.BackendUnavailable, requests.Timeout, TimeoutError))
+
+
+def check_connection(adapter_key: str, config: dict, on_progress=None, cancel: threading.Event = None,
+                     force_refresh: bool = False, executor=None) -> dict:
+    """Staged connection check, answered from the result cache when possible.
+
+    Returns {stages: [(stage, seconds)], seconds, warnings, cached, age}. Raises ConnectionCheckError
+    naming the failing stage (also for a cached failure), or ConnectionCheckCancelled.
+    `executor` runs the stages instead of the shared stage pool (check_many() passes its own).
+    """
+    fingerprint = config_fingerprint(adapter_key, config)
+    entry = None if force_refresh else _cached(fingerprint)
+    if entry is not None:
+        _, checked_at, outcome = entry
+        age = time.monotonic() - checked_at
+        if isinstance(outcome, str):
+            raise ConnectionCheckError(f"{outcome} (cached {age:.0f}s ago)")
+        if on_progress is not None:
+            on_progress(1.0, f"cached result from {age:.0f}s ago")
+        return dict(outcome, cached=True, age=age)
+    try:
+        result = _run_check(adapter_key, config, on_progress, cancel, executor)
+    except ConnectionCheckError as e:
+        if _cacheable(e):
+            _remember(fingerprint, str(e), FAILURE_TTL_SECONDS)
+        raise
+    _remember(fingerprint, result, RESULT_TTL_SECONDS)
+    return dict(result, cached=False, age=0.0)
+
+
+def _run_check(adapter_key: str, config: dict, on_progress=None, cancel: threading.Event = None,
+               executor=None) -> dict:
+    """Run the stages. Returns {stages: [(stage, seconds)], seconds, warnings}.
+
+    Failures of the frontend-side stages become `warnings`; only the sign-in stage raises.
+    """
+    site = next(iter(config.values()))
+    host, port, tls = server_address(site["server"])
+    # (stage, label, timeout, fn, advisory)
+    stages = [
+        ("DNS", f"DNS lookup of {host} (from the frontend)", DNS_TIMEOUT, lambda: _resolve(host, port), True),
+        ("connect", f"Connect to {host}:{port} (from the frontend)", CONNECT_TIMEOUT + 1,
+         lambda: _connect(resolved, host, tls), True),
+        ("sign-in", "Sign-in and first API call (by the backend)", SIGNIN_TIMEOUT + backend_client.BACKEND_CONNECT_TIMEOUT,
+         lambda: backend_client.post_json('/reports/test-connection', {'adapter': adapter_key, 'config': config},
+                                          timeout=(backend_client.BACKEND_CONNECT_TIMEOUT, SIGNIN_TIMEOUT)),
+         False),  # not idempotent: every retry would sign in to the client's Tableau again
+    ]
+    started = time.perf_counter()
+    timings, warnings = [], []
+    resolved = None
+    for i, (stage, label, timeout, fn, advisory) in enumerate(stages):
+        if stage == "connect" and resolved is None:
+            continue  # nothing to connect to; DNS already warned
+        if on_progress is not None:
+            on_progress(i / len(stages), f"{label}…")
+        stage_started = time.perf_counter()
+        try:
+            result = _run_stage(label, fn, timeout, cancel, executor)
+        except ConnectionCheckError as e:
+            if not advisory:
+                if warnings:
+                    raise type(e)(f"{e} (frontend also could not reach the server: {'; '.join(warnings)})") from e.__cause__
+                raise
+            warnings.append(str(e))
+            continue
+        if stage == "DNS":
+            resolved = result
+        timings.append((stage, time.perf_counter() - stage_started))
+    if on_progress is not None:
+        detail = " · ".join(f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timings)
+        if warnings:
+            detail += " · the backend reached the server, the frontend could not: " + "; ".join(warnings)
+        on_progress(1.0, detail)
+    return {"stages": timings, "seconds": time.perf_counter() - started, "warnings": warnings}
+
+
+# ---------------- BULK ----------------
+def parse_site_list(text: str, defaults: dict = None) -> list:
+    """Site configs ({'tableau_prod': {...}}) from CSV text, one site per line.
+
+    A header row may name any SITE_LIST_COLUMNS; without one the columns are read in
+    SITE_LIST_ORDER. Missing fields come from `defaults` (e.g. the token entered in the form).
+    """
+    text = text.strip()
+    if not text:
+        return []
+    df = pd.read_csv(io.StringIO(text), dtype=str, skipinitialspace=True, keep_default_na=False)
+    columns = {c: SITE_LIST_COLUMNS.get(normalize_column(c)) for c in df.columns}
+    if "server" not in columns.values():
+        df = pd.read_csv(io.StringIO(text), dtype=str, skipinitialspace=True, keep_default_na=False, header=None)
+        df = df.iloc[:, :len(SITE_LIST_ORDER)]
+        columns = dict(zip(df.columns, SITE_LIST_ORDER))
+    configs = []
+    for record in df.to_dict("records"):
+        site = dict(defaults or {})
+        site.update({columns[c]: str(v).strip() for c, v in record.items() if columns.get(c) and str(v).strip()})
+        if site.get("server"):
+            configs.append({"tableau_prod": site})
+    return configs
+
+
+def site_label(config: dict) -> str:
+    site = next(iter(config.values()))
+    return f"{site['server']} · {site.get('site_name') or 'Default'}"
+
+
+def check_many(adapter_key: str, configs: list, rows: list = None, on_progress=None,
+               cancel: threading.Event = None, concurrency: int = CHECK_CONCURRENCY,
+               force_refresh: bool = False) -> list:
+    """check_connection() for every config, at most `concurrency` at a time.
+
+    `rows` (a list owned by the caller, so a page can show it while this runs) gets one dict
+    per site — site, status, latency_ms, error — updated in place as each check finishes.
+    Returns `rows`.
+    """
+    rows = rows if rows is not None else []
+    new_rows = [{"site": site_label(c), "status": "queued", "latency_ms": None, "error": None} for c in configs]
+    rows.extend(new_rows)
+    cancel = cancel or threading.Event()
+    done = 0
+    done_lock = threading.Lock()
+
+    def one(row, config):
+        nonlocal done
+        if cancel.is_set():
+            row["status"] = "cancelled"
+            return
+        row["status"] = "testing"
+        started = time.perf_counter()
+        try:
+            result = check_connection(adapter_key, config, cancel=cancel, force_refresh=force_refresh,
+                                      executor=stages)
+            row["status"] = "ok (cached)" if result["cached"] else "ok"
+            if result.get("warnings"):
+                row["error"] = "frontend-side only: " + "; ".join(result["warnings"])
+        except ConnectionCheckCancelled:
+            row["status"] = "cancelled"
+        except ConnectionCheckError as e:
+            row["status"], row["error"] = "failed", str(e)
+        except Exception as e:
+            row["status"], row["error"] = "failed", f"{type(e).__name__}: {e}"
+        row["latency_ms"] = round((time.perf_counter() - started) * 1000)
+        with done_lock:
+            done += 1
+            if on_progress is not None:
+                failed = sum(r["status"] == "failed" for r in new_rows)
+                on_progress(done / len(new_rows), f"{done}/{len(new_rows)} sites · {failed} failed")
+
+    concurrency = max(1, concurrency)
+    # This run's own stage threads: twice the checks in flight leaves room for stages that
+    # were abandoned (timed out) but have not returned yet
+    stages = ThreadPoolExecutor(max_workers=2 * concurrency, thread_name_prefix="bi4bi-conn-bulk-stage")
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bi4bi-conn-bulk") as pool:
+            for row, config in zip(new_rows, configs):
+                pool.submit(one, row, config)
+    finally:
+        stages.shutdown(wait=False, cancel_futures=True)  # abandoned stages finish on their own
+    return rows
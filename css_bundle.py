@@ -0,0 +1,140 @@
+import re
+import threading
+from pathlib import Path
+
+from asset_cache import file_fingerprint
+
+# NOTE: page styles live in ./styles and are compiled into one minified stylesheet per page
+# (the shared sheets plus that page's own), built once per process and re-built only when a
+# sheet changes on disk. The page inlines it as <style>: Streamlit's app/static handler serves
+# .css as text/plain with `nosniff` on older versions, so a <link> to it is rejected by the
+# browser. Rules from a page sheet are still scoped to a marker element
+# (`<div class="bi4bi-page-<page>">`) that the page emits, so a stylesheet left over from
+# the previous page while Streamlit swaps elements cannot restyle the new one.
+#
+#   python css_bundle.py      # print the compiled size of every page's stylesheet
+
+STYLES_DIR = Path(__file__).parent / "styles"
+
+# (file, page it is scoped to — None means it applies everywhere), in cascade order
+BUNDLE_SHEETS = [
+    ("common.css", None),
+    ("home.css", "home"),
+    ("choose_tool.css", "choose_tool"),
+    ("configure.css", "configure"),
+    ("configure_form.css", "configure"),
+]
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_built = {}  # (page, fingerprints of its source sheets) -> css text
+_lock = threading.Lock()
+
+
+def page_marker(page: str) -> str:
+    # `page` can come straight from the ?page= query param
+    return "bi4bi-page-" + re.sub(r"[^a-z_]", "", page or "")
+
+
+# ---------------- MINIFY / SCOPE ----------------
+def _split_rules(css: str):
+    """Yield (prelude, body) for each top-level block of `css`."""
+    pos = 0
+    while True:
+        open_at = css.find("{", pos)
+        if open_at < 0:
+            return
+        depth, i = 1, open_at + 1
+        while depth and i < len(css):
+            if css[i] == "{":
+                depth += 1
+            elif css[i] == "}":
+                depth -= 1
+            i += 1
+        yield css[pos:open_at].strip(), css[open_at + 1:i - 1]
+        pos = i
+
+
+def _split_selectors(prelude: str):
+    """Split a selector list on top-level commas (not the ones inside `:has(...)` etc.)."""
+    parts, depth, start = [], 0, 0
+    for i, ch in enumerate(prelude):
+        if ch in "([":
+            depth += 1
+        elif ch in ")]":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(prelude[start:i])
+            start = i + 1
+    parts.append(prelude[start:])
+    return [p.strip() for p in parts if p.strip()]
+
+
+def _minify_selector(selector: str) -> str:
+    selector = " ".join(selector.split())
+    return re.sub(r"\s*([,>+~])\s*", r"\1", selector)
+
+
+def _minify_declarations(body: str) -> str:
+    decls = []
+    for decl in body.split(";"):
+        if ":" not in decl:
+            continue
+        prop, value = decl.split(":", 1)
+        value = " ".join(value.split()).replace(" !important", "!important")
+        decls.append(f"{prop.strip()}:{value}")
+    return ";".join(decls)
+
+
+def _scope_selector(selector: str, marker: str) -> str:
+    scope = f"html:has(.{marker})"
+    if selector == "html" or selector.startswith(("html ", "html:", "html>", "html[", "html.")):
+        return scope + selector[4:]
+    return f"{scope} {selector}"
+
+
+def compile_css(css: str, page: str = None) -> str:
+    """Strip comments/whitespace and, if `page` is given, scope every selector to that page."""
+    out = []
+    for prelude, body in _split_rules(_COMMENT_RE.sub("", css)):
+        if prelude.startswith("@"):
+            at_rule = " ".join(prelude.split())
+            if at_rule.startswith(("@media", "@supports")):
+                out.append(f"{at_rule}{{{compile_css(body, page)}}}")
+            else:
+                out.append(f"{at_rule}{{{_minify_declarations(body)}}}")
+            continue
+        selectors = [_minify_selector(s) for s in _split_selectors(prelude)]
+        if page:
+            selectors = [_scope_selector(s, page_marker(page)) for s in selectors]
+        declarations = _minify_declarations(body)
+        if selectors and declarations:
+            out.append(f"{','.join(selectors)}{{{declarations}}}")
+    return "".join(out)
+
+
+# ---------------- BUILD ----------------
+def page_css(page: str) -> str:
+    """Minified CSS for `page`: the shared sheets plus the ones scoped to it."""
+    sources = [(STYLES_DIR / name, scope) for name, scope in BUNDLE_SHEETS if scope in (None, page)]
+    key = (page,) + tuple(file_fingerprint(path) for path, _ in sources if path.exists())
+    with _lock:
+        css = _built.get(key)
+    if css is None:
+        css = "".join(
+            compile_css(path.read_text(encoding="utf-8"), scope) for path, scope in sources if path.exists()
+        )
+        with _lock:
+            for stale in [k for k in _built if k[0] == page]:
+                del _built[stale]
+            _built[key] = css
+    return css
+
+
+def page_css_html(page: str) -> str:
+    """HTML that applies `page`'s stylesheet: emit it once per page render."""
+    return f'<style>{page_css(page)}</style><div class="{page_marker(page)}"></div>'
+
+
+if __name__ == "__main__":
+    for page in sorted({scope for _, scope in BUNDLE_SHEETS if scope}):
+        print(f"{page}: {len(page_css(page))} bytes")
@@ -0,0 +1,226 @@
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+# NOTE: heavy work (parsing uploads, backend calls) runs on process-wide thread pools
+# instead of the Streamlit script thread, so a session's widgets stay responsive while it
+# runs. Job functions must not call st.* — they run outside any script context. They report
+# through the `progress(fraction, detail)` callback instead, and the page polls the job.
+# There are two lanes, each with its own pool: "interactive" for short jobs a user is
+# waiting on (Test Connection, reading one upload) and "batch" for long ones (site syncs,
+# bulk checks, backend uploads), so one user's sync never holds up everyone's clicks.
+
+JOB_WORKERS = int(os.environ.get("BI4BI_JOB_WORKERS", 4))
+BATCH_JOB_WORKERS = int(os.environ.get("BI4BI_BATCH_JOB_WORKERS", 2))
+JOB_RETENTION_SECONDS = 30 * 60
+SESSION_FINISHED_JOBS = 5  # finished jobs a session keeps listing (render_job_status shows 5)
+POLL_INTERVAL_SECONDS = 1.0
+LANES = {"interactive": JOB_WORKERS, "batch": BATCH_JOB_WORKERS}
+
+_executors = {}  # lane -> ThreadPoolExecutor
+_jobs = {}  # job id -> job dict
+_ids = itertools.count(1)
+_lock = threading.Lock()
+
+
+def _get_executor(lane: str) -> ThreadPoolExecutor:
+    with _lock:
+        executor = _executors.get(lane)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=LANES[lane], thread_name_prefix=f"bi4bi-{lane}-job")
+            _executors[lane] = executor
+        return executor
+
+
+def _prune() -> None:
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [j for j, job in _jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+        del _jobs[job_id]
+
+
+def _run(job: dict, fn, args, kwargs, progress_kw, cancel_kw):
+    if job["cancel"].is_set():
+        job["status"], job["finished_at"] = "cancelled", time.time()
+        return
+    job["status"], job["started_at"] = "running", time.time()
+
+    def progress(fraction, detail=None):
+        job["progress"] = max(0.0, min(float(fraction), 1.0))
+        if detail is not None:
+            job["detail"] = detail
+
+    if progress_kw:
+        kwargs = dict(kwargs, **{progress_kw: progress})
+    if cancel_kw:
+        kwargs = dict(kwargs, **{cancel_kw: job["cancel"]})
+    try:
+        result = fn(*args, **kwargs)
+        if job["cancel"].is_set():
+            job["status"] = "cancelled"
+        else:
+            job["result"], job["status"], job["progress"] = result, "done", 1.0
+    except Exception as e:
+        if job["cancel"].is_set():  # whatever a cancelled job fails with afterwards is moot
+            job["status"] = "cancelled"
+        else:
+            job["error"] = f"{type(e).__name__}: {e}"
+            job["status"] = "failed"
+    finally:
+        job["finished_at"] = job["finished_at"] or time.time()
+
+
+def submit_job(label: str, fn, *args, progress_kw: str = None, cancel_kw: str = None,
+               lane: str = "interactive", **kwargs) -> int:
+    """Run `fn(*args, **kwargs)` in the background and return a job id.
+
+    If `progress_kw` is given, a `progress(fraction, detail=None)` callback is passed to `fn`
+    under that keyword argument. If `cancel_kw` is given, the job's cancel threading.Event is
+    passed under that one; such jobs get a Cancel button and are expected to check it.
+    `lane` is "interactive" (default) or "batch" for jobs that can run for minutes.
+    """
+    if lane not in LANES:
+        raise ValueError(f"Unknown job lane {lane!r}")
+    job = {
+        "id": next(_ids),
+        "label": label,
+        "status": "queued",
+        "progress": 0.0,
+        "detail": None,
+        "result": None,
+        "error": None,
+        "submitted_at": time.time(),
+        "started_at": None,
+        "finished_at": None,
+        "cancel": threading.Event(),
+        "cancellable": bool(cancel_kw),
+        "lane": lane,
+    }
+    with _lock:
+        _prune()
+        _jobs[job["id"]] = job
+    job["future"] = _get_executor(lane).submit(_run, job, fn, args, kwargs, progress_kw, cancel_kw)
+    return job["id"]
+
+
+def get_job(job_id):
+    with _lock:
+        return _jobs.get(job_id)
+
+
+def cancel_job(job_id) -> None:
+    """Ask a job to stop: queued jobs never start, running ones see job['cancel'] set.
+
+    Cancellable jobs are reported as cancelled at once; their worker winds down on its own.
+    """
+    job = get_job(job_id)
+    if job is not None and job["finished_at"] is None:
+        job["cancel"].set()
+        if job["future"].cancel() or job["cancellable"]:
+            job["status"], job["finished_at"] = "cancelled", time.time()
+
+
+def is_active(job) -> bool:
+    return job is not None and job["status"] in ("queued", "running")
+
+
+def elapsed(job) -> float:
+    start = job["started_at"] or job["submitted_at"]
+    return (job["finished_at"] or time.time()) - start
+
+
+# ---------------- UI ----------------
+def _prune_session(job_ids: list) -> list:
+    """Active jobs plus the last SESSION_FINISHED_JOBS finished ones, in order; the rest are dropped."""
+    jobs = [(j, get_job(j)) for j in job_ids]
+    jobs = [(j, job) for j, job in jobs if job is not None]
+    finished = [j for j, job in jobs if not is_active(job)][-SESSION_FINISHED_JOBS:]
+    return [j for j, job in jobs if is_active(job) or j in finished]
+
+
+def track_job(job_id, key: str = "jobs") -> None:
+    """Remember `job_id` in this session so render_job_status() shows it."""
+    st.session_state[key] = _prune_session(st.session_state.get(key, []) + [job_id])
+
+
+def _fragment(run_every):
+    """st.fragment with periodic reruns — supports both new and old Streamlit APIs."""
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if fragment is None:
+        return None
+    return fragment(run_every=run_every)
+
+
+def _job_rows(job_ids):
+    for job_id in job_ids[-5:]:
+        job = get_job(job_id)
+        if job is None:
+            continue
+        if job["status"] == "failed":
+            st.error(f"{job['label']} failed: {job['error']}")
+        elif is_active(job):
+            detail = f" · {job['detail']}" if job["detail"] is not None else ""
+            text = f"{job['label']} — {job['status']}{detail} · {elapsed(job):.1f}s"
+            if job["cancellable"]:
+                bar, button = st.columns([5, 1])
+                bar.progress(job["progress"], text=text)
+                if button.button("Cancel", key=f"cancel_job_{job_id}"):
+                    cancel_job(job_id)
+            else:
+                st.progress(job["progress"], text=text)
+        elif job["status"] == "done":
+            detail = f" · {job['detail']}" if job["detail"] is not None else ""
+            st.success(f"{job['label']} — done in {elapsed(job):.1f}s{detail}")
+        else:
+            st.caption(f"{job['label']} — {job['status']} · {elapsed(job):.1f}s")
+
+
+def render_job_status(key: str = "jobs") -> None:
+    """Status area for this session's jobs, polling until they finish.
+
+    When the last running job completes the whole page reruns so it can use the result.
+    """
+    job_ids = st.session_state[key] = _prune_session(st.session_state.get(key, []))
+    if not any(is_active(get_job(j)) for j in job_ids):
+        _job_rows(job_ids)
+        return
+
+    def _poll():
+        _job_rows(job_ids)
+        if not any(is_active(get_job(j)) for j in job_ids):
+            st.rerun()
+
+    fragment = _fragment(POLL_INTERVAL_SECONDS)
+    if fragment is not None:
+        fragment(_poll)()
+    else:
+        _job_rows(job_ids)
+        time.sleep(POLL_INTERVAL_SECONDS)
+        st.rerun()
+
+
+def render_live(job_id, render) -> None:
+    """Call `render(job)` now, and again every poll interval while the job is still active.
+
+    For jobs that publish partial results (e.g. rows filled in by the worker) as they go.
+    """
+    job = get_job(job_id)
+    if job is None:
+        return
+    if not is_active(job):
+        render(job)
+        return
+
+    def _poll():
+        render(job)
+        if not is_active(job):
+            st.rerun()
+
+    fragment = _fragment(POLL_INTERVAL_SECONDS)
+    if fragment is not None:
+        fragment(_poll)()
+    else:
+        render(job)
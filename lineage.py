@@ -0,0 +1,262 @@
+import time
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+import metadata_store
+from asset_cache import ByteLRUCache
+from metadata_schema import normalize_column
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# NOTE: impact analysis ("what breaks if this data source goes?") runs on a lineage graph
+# of data source -> workbook -> view -> field built from the uploaded rows: each row links
+# the objects it names on consecutive levels. Nodes are integers ("kind:id" labels kept
+# alongside), edges live in CSR arrays (indptr/indices, forward and reverse) with a support
+# count per edge, so one row disappearing only drops an edge no other row backs.
+# Every node's full set of descendants is precomputed (transitive closure, one sorted int32
+# array per node, filled in reverse topological order), which makes an impact query a slice.
+# On re-upload only the changed rows are applied, and only the ancestors of the touched
+# edges get their closure recomputed; objects left without any link are dropped, as a full
+# build would never have added them. That needs a diff of exact rows: lineage exports repeat
+# their layout key (a view once per field), and metadata_diff then matches whole rows
+# (`by` = "row"). A diff without that guarantee gets a full rebuild instead.
+
+# Lineage levels, upstream first, with the columns that can name an object of each kind
+LINEAGE_LEVELS = (
+    ("datasource", ("datasource_id", "datasource_name")),
+    ("workbook", ("workbook_id", "workbook_name")),
+    ("view", ("view_id", "view_name")),
+    ("field", ("field_id", "field_name")),
+)
+
+_INDEXES = ByteLRUCache(512 * 1024 * 1024)  # source_hash -> lineage index
+
+
+# ---------------- EDGES ----------------
+def level_columns(columns) -> list:
+    """[(kind, column)] for the levels present in `columns`, upstream first."""
+    by_normalized = {normalize_column(c): c for c in columns}
+    found = []
+    for kind, candidates in LINEAGE_LEVELS:
+        column = next((by_normalized[c] for c in candidates if c in by_normalized), None)
+        if column is not None:
+            found.append((kind, column))
+    return found
+
+
+def lineage_edges(df: pd.DataFrame) -> pd.DataFrame:
+    """(src, dst) label pairs, one per row and pair of consecutive levels present in `df`."""
+    levels = level_columns(df.columns)
+    parts = []
+    for (up_kind, up_col), (down_kind, down_col) in zip(levels, levels[1:]):
+        up, down = df[up_col].astype("string"), df[down_col].astype("string")
+        ok = (up.notna() & down.notna()).to_numpy()
+        parts.append(pd.DataFrame({"src": up_kind + ":" + up[ok], "dst": down_kind + ":" + down[ok]}))
+    if not parts:
+        return pd.DataFrame({"src": pd.Series(dtype="string"), "dst": pd.Series(dtype="string")})
+    return pd.concat(parts, ignore_index=True)
+
+
+# ---------------- INDEX ----------------
+def _csr(src: np.ndarray, dst: np.ndarray, n: int):
+    order = np.argsort(src, kind="stable")
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    return indptr, dst[order].astype(np.int32)
+
+
+def _node_ids(index: dict, labels) -> np.ndarray:
+    """Integer ids for `labels`, adding unseen ones as new nodes."""
+    ids = index["node_ids"]
+    for label in pd.unique(np.asarray(labels, dtype=object)):
+        if label not in ids:
+            ids[label] = len(index["nodes"])
+            index["nodes"].append(label)
+            index["reach"].append(np.empty(0, dtype=np.int32))
+    return np.fromiter((ids[label] for label in labels), dtype=np.int64, count=len(labels))
+
+
+def _rebuild_csr(index: dict) -> None:
+    n = len(index["nodes"])
+    index["indptr"], index["indices"] = _csr(index["src"], index["dst"], n)
+    index["rindptr"], index["rindices"] = _csr(index["dst"], index["src"], n)
+
+
+def _children(index: dict, node: int) -> np.ndarray:
+    return index["indices"][index["indptr"][node]:index["indptr"][node + 1]]
+
+
+def _parents(index: dict, node: int) -> np.ndarray:
+    return index["rindices"][index["rindptr"][node]:index["rindptr"][node + 1]]
+
+
+def _recompute_reach(index: dict, nodes) -> None:
+    """Recompute the closure of `nodes` (which must include all their ancestors), children first."""
+    nodes = set(int(n) for n in nodes)
+    # Kahn's algorithm restricted to `nodes`, on the reversed graph: a node is ready once
+    # all its children inside the set are done
+    pending = {n: sum(1 for c in _children(index, n) if int(c) in nodes) for n in nodes}
+    ready = deque(n for n, k in pending.items() if k == 0)
+    done = 0
+    while ready:
+        node = ready.popleft()
+        children = _children(index, node)
+        if len(children):
+            index["reach"][node] = np.unique(np.concatenate([children] + [index["reach"][c] for c in children])).astype(np.int32)
+        else:
+            index["reach"][node] = np.empty(0, dtype=np.int32)
+        done += 1
+        for parent in _parents(index, node):
+            parent = int(parent)
+            if parent in pending:
+                pending[parent] -= 1
+                if pending[parent] == 0:
+                    ready.append(parent)
+    if done != len(nodes):
+        raise ValueError("Lineage contains a cycle")
+
+
+def build_lineage(df: pd.DataFrame) -> dict:
+    """Lineage index for the rows of `df` (see lineage_edges)."""
+    started = time.perf_counter()
+    index = {"nodes": [], "node_ids": {}, "reach": []}
+    edges = lineage_edges(df)
+    counts = edges.groupby(["src", "dst"], sort=False).size()
+    src = _node_ids(index, counts.index.get_level_values("src").to_numpy(dtype=object))
+    dst = _node_ids(index, counts.index.get_level_values("dst").to_numpy(dtype=object))
+    index.update(src=src, dst=dst, count=counts.to_numpy(dtype=np.int64))
+    _rebuild_csr(index)
+    _recompute_reach(index, range(len(index["nodes"])))
+    index["build_seconds"] = time.perf_counter() - started
+    return index
+
+
+def apply_changes(index: dict, added: pd.DataFrame, removed: pd.DataFrame) -> int:
+    """Apply rows that appeared (`added`) and disappeared (`removed`) to `index` in place.
+
+    Returns how many closures were recomputed: only the ancestors of edges whose existence
+    changed are touched.
+    """
+    delta = pd.concat([lineage_edges(added).assign(n=1), lineage_edges(removed).assign(n=-1)], ignore_index=True)
+    if delta.empty:
+        return 0
+    delta = delta.groupby(["src", "dst"], sort=False)["n"].sum()
+    delta = delta[delta != 0]
+    src = _node_ids(index, delta.index.get_level_values("src").to_numpy(dtype=object))
+    dst = _node_ids(index, delta.index.get_level_values("dst").to_numpy(dtype=object))
+
+    n = len(index["nodes"])
+    existing = pd.Series(index["count"], index=index["src"] * n + index["dst"])
+    change = pd.Series(delta.to_numpy(), index=src * n + dst)
+    merged = existing.add(change, fill_value=0)
+    merged = merged[merged > 0]
+    before, after = set(existing.index), set(merged.index)
+    touched = np.array(sorted(before ^ after), dtype=np.int64)  # edges that appeared or vanished
+    index["src"], index["dst"] = merged.index.to_numpy() // n, merged.index.to_numpy() % n
+    index["count"] = merged.to_numpy(dtype=np.int64)
+    _rebuild_csr(index)
+    affected = upstream_ids(index, np.unique(touched // n), include_self=True) if len(touched) else []
+    _recompute_reach(index, affected)
+    _drop_isolated(index)
+    return len(affected)
+
+
+def _drop_isolated(index: dict) -> None:
+    """Remove nodes left without any edge (their last row went), renumbering the rest, so the
+    index holds the same objects a full build_lineage() of the new rows would."""
+    n = len(index["nodes"])
+    linked = np.zeros(n, dtype=bool)
+    linked[index["src"]] = True
+    linked[index["dst"]] = True
+    if linked.all():
+        return
+    new_ids = np.cumsum(linked) - 1  # old id -> new id, for the nodes that stay
+    keep = np.flatnonzero(linked)
+    index["nodes"] = [index["nodes"][i] for i in keep]
+    index["node_ids"] = {label: i for i, label in enumerate(index["nodes"])}
+    # descendants always have an incoming edge, so every id in a closure is kept
+    index["reach"] = [new_ids[index["reach"][i]].astype(np.int32) for i in keep]
+    index["src"], index["dst"] = new_ids[index["src"]], new_ids[index["dst"]]
+    _rebuild_csr(index)
+
+
+# ---------------- QUERIES ----------------
+def upstream_ids(index: dict, nodes, include_self: bool = False) -> np.ndarray:
+    """All ancestors of `nodes` (breadth-first over the reverse CSR, one frontier at a time)."""
+    seen = np.zeros(len(index["nodes"]), dtype=bool)
+    frontier = np.unique(np.asarray(nodes, dtype=np.int64))
+    if include_self:
+        seen[frontier] = True
+    while len(frontier):
+        starts, ends = index["rindptr"][frontier], index["rindptr"][frontier + 1]
+        parents = np.unique(np.concatenate([index["rindices"][s:e] for s, e in zip(starts, ends)])).astype(np.int64)
+        frontier = parents[~seen[parents]]
+        seen[frontier] = True
+    return np.flatnonzero(seen)
+
+
+def impacted(index: dict, label: str, kind: str = None) -> list:
+    """Labels of everything downstream of `label` (optionally only of one kind)."""
+    node = index["node_ids"].get(label)
+    if node is None:
+        return []
+    labels = [index["nodes"][i] for i in index["reach"][node]]
+    return [x for x in labels if x.startswith(kind + ":")] if kind else labels
+
+
+def depends_on(index: dict, label: str, kind: str = None) -> list:
+    """Labels of everything upstream of `label` (optionally only of one kind)."""
+    node = index["node_ids"].get(label)
+    if node is None:
+        return []
+    labels = [index["nodes"][i] for i in upstream_ids(index, [node]) if i != node]
+    return [x for x in labels if x.startswith(kind + ":")] if kind else labels
+
+
+def nodes_of_kind(index: dict, kind: str) -> list:
+    return [x for x in index["nodes"] if x.startswith(kind + ":")]
+
+
+def index_nbytes(index: dict) -> int:
+    arrays = ("src", "dst", "count", "indptr", "indices", "rindptr", "rindices")
+    return sum(index[a].nbytes for a in arrays) + sum(r.nbytes for r in index["reach"]) + 100 * len(index["nodes"])
+
+
+# ---------------- SNAPSHOTS ----------------
+def _snapshot_frame(source_hash: str, positions=None) -> pd.DataFrame:
+    table = metadata_store.open_snapshot(source_hash)
+    columns = [column for _, column in level_columns(table.column_names)]
+    table = table.select(columns)
+    if positions is not None:
+        table = table.take(pa.array(np.asarray(positions, dtype=np.int64)))
+    return table.to_pandas()
+
+
+def lineage_for_snapshot(source_hash: str, diff: dict = None) -> dict:
+    """Lineage index for a stored upload, cached per snapshot.
+
+    With a metadata_diff result whose previous snapshot is still indexed, the previous index
+    is copied and only the diff's rows are applied instead of rebuilding from scratch.
+    """
+    index = _INDEXES.get(source_hash)
+    if index is not None:
+        return index
+    exact = diff is not None and diff.get("by") in ("key", "row")  # keys unique, or whole rows matched
+    previous = _INDEXES.get(diff["old_hash"]) if exact else None
+    if previous is not None:
+        started = time.perf_counter()
+        index = {k: (list(v) if isinstance(v, list) else dict(v) if isinstance(v, dict) else v) for k, v in previous.items()}
+        added = _snapshot_frame(source_hash, np.concatenate([diff["added"], diff["changed"]]))
+        removed = _snapshot_frame(diff["old_hash"], np.concatenate([diff["deleted"], diff["changed_old"]]))
+        index["recomputed"] = apply_changes(index, added, removed)
+        index["build_seconds"] = time.perf_counter() - started
+    else:
+        index = build_lineage(_snapshot_frame(source_hash))
+        index["recomputed"] = len(index["nodes"])
+    _INDEXES.put(source_hash, index, index_nbytes(index))
+    return index
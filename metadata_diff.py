@@ -0,0 +1,221 @@
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+
+import metadata_store
+from asset_cache import ByteLRUCache
+from metadata_schema import COLUMN_DTYPES, LAYOUT_KEYS, detect_layout, normalize_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# NOTE: weekly re-uploads are mostly the same rows. Each snapshot gets two uint64 hashes per
+# row — one of its key columns (workbook/view/datasource/user id, see LAYOUT_KEYS) and one of
+# the whole row — saved next to the snapshot as <sha256>.rows.npz, so a snapshot is hashed
+# once, in record batches, and never re-read for diffing. Comparing two snapshots is then a
+# join of hash arrays: only the added/changed/deleted rows need to be touched afterwards.
+# Values are hashed as normalised strings (columns matched by normalize_column(), integral
+# floats as ints, declared timestamps parsed), so the same export read in memory or streamed
+# hashes the same.
+# A re-upload is only compared with the same owner's previous upload of the same source
+# (the sites the rows name), never with whatever snapshot of that layout came last.
+
+HASH_BATCH_ROWS = 100_000
+SOURCE_COLUMNS = ("site", "site_name")  # columns naming the site a row belongs to
+_HASHES = ByteLRUCache(128 * 1024 * 1024)  # source_hash -> (key columns, key hashes, row hashes)
+
+
+def _hash_path(source_hash: str):
+    return metadata_store.snapshot_path(source_hash).with_suffix(".rows.npz")
+
+
+def key_columns(columns) -> list:
+    """Normalised columns identifying a row of the detected layout (all columns if unknown)."""
+    names = [normalize_column(c) for c in columns]
+    keys = [k for k in LAYOUT_KEYS.get(detect_layout(names), ()) if k in names]
+    return keys or sorted(names)
+
+
+def _as_text(df: pd.DataFrame) -> pd.DataFrame:
+    out = {}
+    for col in df.columns:
+        s, name = df[col], normalize_column(col)
+        if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+            s = s.astype("Int64")  # 3.0 from a streamed spill == 3 from an in-memory read
+        elif COLUMN_DTYPES.get(name) == "datetime" and not pd.api.types.is_datetime64_any_dtype(s):
+            parsed = pd.to_datetime(s, errors="coerce", utc=True)  # raw text from a spill
+            if parsed.isna().sum() == s.isna().sum():
+                s = parsed
+        out[name] = s.astype("string").fillna("")
+    return pd.DataFrame(out)
+
+
+def _hash_frame(df: pd.DataFrame, keys: list):
+    text = _as_text(df)
+    key_hash = pd.util.hash_pandas_object(text[keys], index=False).to_numpy()
+    row_hash = pd.util.hash_pandas_object(text[sorted(text.columns)], index=False).to_numpy()
+    return key_hash, row_hash
+
+
+def snapshot_hashes(source_hash: str):
+    """(key columns, key hashes, row hashes) for a stored snapshot, computed once and persisted."""
+    cached = _HASHES.get(source_hash)
+    if cached is not None:
+        return cached
+    path = _hash_path(source_hash)
+    if path.exists():
+        with np.load(path, allow_pickle=False) as data:
+            cached = ([str(k) for k in data["keys"]], data["key_hash"], data["row_hash"])
+    else:
+        table = metadata_store.open_snapshot(source_hash)
+        keys = key_columns(table.column_names)
+        parts = [_hash_frame(batch.to_pandas(), keys) for batch in table.to_batches(max_chunksize=HASH_BATCH_ROWS)]
+        key_hash = np.concatenate([p[0] for p in parts]) if parts else np.empty(0, np.uint64)
+        row_hash = np.concatenate([p[1] for p in parts]) if parts else np.empty(0, np.uint64)
+        tmp = path.with_name(f".{path.stem}.tmp.npz")
+        np.savez(tmp, keys=np.array(keys), key_hash=key_hash, row_hash=row_hash)
+        tmp.replace(path)
+        cached = (keys, key_hash, row_hash)
+    _HASHES.put(source_hash, cached, cached[1].nbytes + cached[2].nbytes)
+    return cached
+
+
+def snapshot_source(source_hash: str, default: str = None):
+    """What a snapshot is metadata of: the sites named in its SOURCE_COLUMNS, else `default`."""
+    table = metadata_store.open_snapshot(source_hash)
+    by_normalized = {normalize_column(c): c for c in table.column_names}
+    columns = [by_normalized[c] for c in SOURCE_COLUMNS if c in by_normalized]
+    if not columns:
+        return default
+    sites = sorted({str(v) for c in columns for v in pc.unique(table[c]).to_pylist() if v is not None})
+    return "sites:" + hashlib.sha256("\n".join(sites).encode("utf-8")).hexdigest()[:16]
+
+
+def previous_entry(source_hash: str, owner: str, source: str):
+    """Snapshot `owner` last uploaded for `source` with the same layout as `source_hash` (None if none)."""
+    current = metadata_store.get_entry(source_hash)
+    if current is None or owner is None:
+        return None
+    layout = detect_layout([f["name"] for f in current["schema"]])
+    for record in reversed(metadata_store.upload_history()):
+        if record["owner"] != owner or record["source"] != source or record["source_hash"] == source_hash:
+            continue
+        entry = metadata_store.get_entry(record["source_hash"])
+        if entry is not None and detect_layout([f["name"] for f in entry["schema"]]) == layout:
+            return entry
+    return None
+
+
+# ---------------- DIFF ----------------
+def _unique(hashes: np.ndarray) -> bool:
+    return len(np.unique(hashes)) == len(hashes)
+
+
+def _occurrence_hash(row_hash: np.ndarray) -> np.ndarray:
+    """Row hashes made unique by numbering repeats, so identical rows pair up one to one."""
+    occurrence = pd.Series(row_hash).groupby(row_hash).cumcount().to_numpy()
+    return pd.util.hash_pandas_object(pd.DataFrame({"row": row_hash, "n": occurrence}), index=False).to_numpy()
+
+
+def diff_snapshots(old_hash: str, new_hash: str) -> dict:
+    """Row-level diff of two snapshots. Positions index rows of the respective snapshot.
+
+    Rows are matched by key when the keys are unique in both snapshots (`by` = "key"). A key
+    naming several rows cannot say which of them changed, so otherwise whole rows are matched
+    (`by` = "row"): a changed row is then reported as one deleted and one added row.
+    """
+    old_keys, old_key_hash, old_row_hash = snapshot_hashes(old_hash)
+    new_keys, new_key_hash, new_row_hash = snapshot_hashes(new_hash)
+    if old_keys != new_keys:
+        raise ValueError(f"Snapshots are keyed differently: {old_keys} vs {new_keys}")
+    by = "key"
+    if not (_unique(old_key_hash) and _unique(new_key_hash)):
+        by = "row"
+        old_key_hash, new_key_hash = _occurrence_hash(old_row_hash), _occurrence_hash(new_row_hash)
+
+    old_position = pd.Series(np.arange(len(old_key_hash)), index=old_key_hash)
+    present = np.isin(new_key_hash, old_key_hash)
+    previous = old_position.reindex(new_key_hash[present]).to_numpy()
+    differs = old_row_hash[previous] != new_row_hash[present]
+    changed = np.zeros(len(new_key_hash), dtype=bool)
+    changed[np.flatnonzero(present)] = differs
+    deleted = ~np.isin(old_key_hash, new_key_hash)
+    return {
+        "old_hash": old_hash,
+        "new_hash": new_hash,
+        "keys": new_keys,
+        "by": by,
+        "old_rows": len(old_key_hash),
+        "new_rows": len(new_key_hash),
+        "added": np.flatnonzero(~present),
+        "changed": np.flatnonzero(changed),
+        "changed_old": np.sort(previous[differs]),  # the previous versions of the changed rows
+        "deleted": np.flatnonzero(deleted),
+        "unchanged": int(present.sum() - changed.sum()),
+    }
+
+
+def diff_against_previous(source_hash: str, owner: str = None, source: str = None):
+    """diff_snapshots() against `owner`'s previous upload for the same source and layout, or None.
+
+    The source is the set of sites the rows name (see snapshot_source()), or `source` (e.g. the
+    connection or file name) when they name none. Without an owner nothing is compared: a
+    snapshot from someone else, or of another site, would turn every row into a deletion.
+    """
+    if not metadata_store.available() or owner is None:
+        return None
+    source = snapshot_source(source_hash, source)
+    previous = previous_entry(source_hash, owner, source)
+    metadata_store.record_upload(source_hash, owner, source)
+    if previous is None:
+        return None
+    try:
+        diff = diff_snapshots(previous["source_hash"], source_hash)
+    except ValueError:
+        return None
+    diff["previous_name"] = previous["source_name"]
+    return diff
+
+
+def diff_summary(diff: dict) -> dict:
+    touched = len(diff["added"]) + len(diff["changed"]) + len(diff["deleted"])
+    return {
+        "added": len(diff["added"]),
+        "changed": len(diff["changed"]),
+        "deleted": len(diff["deleted"]),
+        "unchanged": diff["unchanged"],
+        "changed_share": min(touched / max(diff["old_rows"], diff["new_rows"], 1), 1.0),
+    }
+
+
+def delta_frame(diff: dict) -> pd.DataFrame:
+    """Only the rows that need processing: added and changed rows in full, deleted rows by key
+    (in full when the diff matched whole rows).
+
+    A leading `_change` column says which ("added", "changed", "deleted").
+    """
+    new_table = metadata_store.open_snapshot(diff["new_hash"])
+    upserts = np.sort(np.concatenate([diff["added"], diff["changed"]]))
+    rows = new_table.take(pa.array(upserts)).to_pandas()
+    rows.insert(0, "_change", np.where(np.isin(upserts, diff["added"]), "added", "changed"))
+
+    old_table = metadata_store.open_snapshot(diff["old_hash"])
+    if diff.get("by") != "row":
+        by_normalized = {normalize_column(c): c for c in old_table.column_names}
+        old_table = old_table.select([by_normalized[k] for k in diff["keys"]])
+    deleted = old_table.take(pa.array(diff["deleted"])).to_pandas()
+    deleted.insert(0, "_change", "deleted")
+    return pd.concat([rows, deleted], ignore_index=True)
+
+
+def delta_csv(diff: dict, name: str) -> io.BytesIO:
+    """delta_frame() as an in-memory CSV upload, e.g. for backend_upload."""
+    out = io.BytesIO(delta_frame(diff).to_csv(index=False).encode("utf-8"))
+    out.name = f"{name.rsplit('.', 1)[0]}.delta.csv"
+    out.size = out.getbuffer().nbytes
+    return out
@@ -0,0 +1,432 @@
+import bz2
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import metadata_store
+from asset_cache import ByteLRUCache
+from metadata_diff import diff_against_previous
+from metadata_schema import compact_frame, normalize_column
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # streaming still works, the full data just isn't spilled to disk
+    pa = pc = None
+
+# NOTE: uploads are identified by the SHA-256 of their bytes, so the same export uploaded
+# again — by this session after a rerun or by anyone else — is parsed only once per process.
+# Frames handed out from the cache are shared: treat them as read-only. Parsed frames go
+# through metadata_schema.compact_frame() first, so the cache budget holds several times more.
+# Every parsed upload also gets a columnar snapshot in metadata_store, so a cache miss reopens
+# that instead of reparsing the CSV, and is diffed row by row against the previous upload of
+# the same layout (see metadata_diff.py).
+
+METADATA_CACHE_MAX_BYTES = int(os.environ.get("BI4BI_METADATA_CACHE_BYTES", 1024 * 1024 * 1024))
+HASH_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Uploads larger than this are streamed in chunks instead of parsed into one DataFrame
+STREAMING_THRESHOLD_BYTES = int(os.environ.get("BI4BI_STREAMING_THRESHOLD_BYTES", 50 * 1024 * 1024))
+CHUNK_ROWS = 100_000
+PREVIEW_ROWS = 50
+BATCH_WORKERS = int(os.environ.get("BI4BI_BATCH_WORKERS", os.cpu_count() or 2))
+
+# Extensions the uploader accepts. Compressed uploads are always decompressed as a stream
+# into the chunked parser, never expanded in memory.
+UPLOAD_TYPES = ["csv", "gz", "bz2", "zip"]
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".zip")
+
+FRAME_CACHE = ByteLRUCache(METADATA_CACHE_MAX_BYTES)
+_DIGESTS = ByteLRUCache(1024 * 1024)  # upload file_id -> sha256, so reruns skip rehashing
+
+
+def fingerprint_upload(fileobj) -> str:
+    """SHA-256 hex digest of a (seekable) file object; leaves it positioned at the start."""
+    upload_id = getattr(fileobj, "file_id", None) or getattr(fileobj, "id", None)
+    if upload_id is not None:
+        digest = _DIGESTS.get(upload_id)
+        if digest is not None:
+            return digest
+
+    h = hashlib.sha256()
+    fileobj.seek(0)
+    for block in iter(lambda: fileobj.read(HASH_BLOCK_SIZE), b""):
+        h.update(block)
+    fileobj.seek(0)
+    digest = h.hexdigest()
+    if upload_id is not None:
+        _DIGESTS.put(upload_id, digest, len(digest) + 64)
+    return digest
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def read_metadata_csv(fileobj, source_name: str = None):
+    """Parse an uploaded metadata CSV once per content hash. Returns (DataFrame, sha256)."""
+    digest = fingerprint_upload(fileobj)
+    key = ("csv", digest)
+    df = FRAME_CACHE.get(key)
+    if df is None:
+        if metadata_store.available() and metadata_store.get_entry(digest):
+            df = metadata_store.load_snapshot_frame(digest)
+        else:
+            df, report = compact_frame(pd.read_csv(fileobj))
+            df.attrs["compaction"] = report
+            fileobj.seek(0)
+            if metadata_store.available():
+                metadata_store.write_snapshot(df, digest, source_name or getattr(fileobj, "name", digest))
+        FRAME_CACHE.put(key, df, frame_nbytes(df))
+    return df, digest
+
+
+# ---------------- DECOMPRESSION ----------------
+def is_compressed(name) -> bool:
+    return bool(name) and name.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def open_csv_streams(fileobj, name: str = None):
+    """Yield (member name, binary stream) for each CSV inside a .csv/.gz/.bz2/.zip upload.
+
+    The streams decompress lazily as they are read; nothing is expanded up front.
+    """
+    lower = (name or "").lower()
+    fileobj.seek(0)
+    if lower.endswith(".gz"):
+        with gzip.GzipFile(fileobj=fileobj, mode="rb") as stream:
+            yield name[:-3], stream
+    elif lower.endswith(".bz2"):
+        with bz2.BZ2File(fileobj, mode="rb") as stream:
+            yield name[:-4], stream
+    elif lower.endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            members = [i for i in archive.infolist() if not i.is_dir() and i.filename.lower().endswith(".csv")]
+            if not members:
+                raise ValueError(f"{name} contains no .csv files")
+            for info in members:
+                with archive.open(info) as stream:
+                    yield info.filename, stream
+    else:
+        yield name, fileobj
+
+
+def iter_csv_chunks(fileobj, name: str = None, chunk_rows: int = CHUNK_ROWS):
+    """DataFrame chunks of every CSV in the upload, in order (zip members back to back)."""
+    for _, stream in open_csv_streams(fileobj, name):
+        yield from pd.read_csv(stream, chunksize=chunk_rows)
+
+
+def read_csv_any(fileobj, name: str = None, chunk_rows: int = CHUNK_ROWS) -> pd.DataFrame:
+    """Whole-file read of a possibly compressed upload (zip members are concatenated).
+
+    Parsed chunk by chunk straight off the decompressing stream, like the streaming path, so
+    the decompressed text is never held in memory — only the parsed rows.
+    """
+    frames = list(iter_csv_chunks(fileobj, name, chunk_rows))
+    if not frames:
+        raise ValueError(f"{name or 'upload'} contains no rows")
+    return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+
+# ---------------- STREAMING INGEST ----------------
+def _spill_schema(table):
+    """Schema for the spill file, widened so later chunks still fit it.
+
+    Columns that were all-empty in the first chunk become strings, and integer columns become
+    float64 because any later chunk with a blank cell is parsed by pandas as float.
+    """
+    fields = []
+    for field in table.schema:
+        if pa.types.is_null(field.type):
+            field = pa.field(field.name, pa.string())
+        elif pa.types.is_integer(field.type):
+            field = pa.field(field.name, pa.float64())
+        fields.append(field)
+    return pa.schema(fields)
+
+
+def _chunk_table(chunk: pd.DataFrame, schema):
+    """`chunk` cast to the spill schema. Returns (table, names of columns widened to string).
+
+    A later chunk may not fit the types the first one set (a numeric column meets a text
+    value, or the other way round); such columns become strings rather than failing the ingest.
+    """
+    arrays, widened = [], []
+    for i, field in enumerate(schema):
+        column = chunk.iloc[:, i]
+        try:
+            array = pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):  # mixed Python types, as in frame_to_arrow
+            array = pa.array(column.astype("string"), from_pandas=True)
+        if array.type != field.type:
+            try:
+                array = pc.cast(array, field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                array = pc.cast(array, pa.string())
+                widened.append(field.name)
+        arrays.append(array)
+    fields = [pa.field(f.name, pa.string()) if f.name in widened else f for f in schema]
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields)), widened
+
+
+def _widen_spill(path, sink, writer, schema, names):
+    """Rewrite the spill written so far with columns `names` as strings; returns the new
+    (path, sink, writer, schema) to go on appending to. Batches are copied one at a time."""
+    writer.close()
+    sink.close()
+    widened = pa.schema([pa.field(f.name, pa.string()) if f.name in names else f for f in schema])
+    new_path = path.with_name(path.name + ".w")
+    new_sink = pa.OSFile(str(new_path), "wb")
+    new_writer = pa.ipc.new_file(new_sink, widened)
+    with pa.memory_map(str(path), "r") as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            columns = [pc.cast(c, pa.string()) if f.name in names else c for f, c in zip(schema, batch.columns)]
+            new_writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=widened))
+    path.unlink()
+    return new_path, new_sink, new_writer, widened
+
+
+def _update_stats(stats: dict, chunk: pd.DataFrame) -> None:
+    """Fold one chunk into the running per-column aggregates."""
+    for col in chunk.columns:
+        s = chunk[col]
+        agg = stats.setdefault(col, {"non_null": 0, "min": None, "max": None, "sum": None})
+        agg["non_null"] += int(s.count())
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s) and s.count():
+            lo, hi, total = s.min(), s.max(), s.sum()
+            agg["min"] = lo if agg["min"] is None else min(agg["min"], lo)
+            agg["max"] = hi if agg["max"] is None else max(agg["max"], hi)
+            agg["sum"] = total if agg["sum"] is None else agg["sum"] + total
+
+
+def stats_frame(result: dict) -> pd.DataFrame:
+    """Per-column summary (non-null count, nulls, min/max/mean) of a streaming ingest result."""
+    rows = result["rows"]
+    summary = []
+    for col, agg in result["stats"].items():
+        mean = agg["sum"] / agg["non_null"] if agg["sum"] is not None and agg["non_null"] else None
+        summary.append({
+            "column": col,
+            "non_null": agg["non_null"],
+            "nulls": rows - agg["non_null"],
+            "min": agg["min"],
+            "max": agg["max"],
+            "mean": mean,
+        })
+    return pd.DataFrame(summary)
+
+
+def ingest_csv_streaming(fileobj, digest: str, total_bytes: int = None, on_progress=None,
+                         chunk_rows: int = CHUNK_ROWS, source_name: str = None) -> dict:
+    """Read a CSV in `chunk_rows` chunks keeping only aggregates and a preview in memory.
+
+    `.gz`/`.bz2`/`.zip` uploads (by `source_name`) are decompressed on the fly. Every chunk is
+    appended to the file's Arrow snapshot in metadata_store (when pyarrow is available), so the
+    full data stays on disk. A column whose values stop fitting the type
+    the earlier chunks gave it is turned into strings in the spill (see _chunk_table), as a
+    whole-file read would have. `on_progress(fraction, rows_so_far)` is called after each chunk.
+    """
+    result = {"digest": digest, "rows": 0, "columns": [], "preview": None, "stats": {}, "spill_path": None}
+    writer = schema = sink = None
+    spill_path = metadata_store.snapshot_path(digest)
+    # unique per writer: jobs of several sessions may ingest the same file at once
+    tmp_path = spill_path.with_name(f".{spill_path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    try:
+        for chunk in iter_csv_chunks(fileobj, source_name, chunk_rows):
+            if result["preview"] is None:
+                result["preview"] = chunk.head(PREVIEW_ROWS).copy()
+                result["columns"] = list(chunk.columns)
+            result["rows"] += len(chunk)
+            _update_stats(result["stats"], chunk)
+
+            if pa is not None:
+                if writer is None:
+                    schema = _spill_schema(metadata_store.frame_to_arrow(chunk))
+                    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+                    sink = pa.OSFile(str(tmp_path), "wb")
+                    writer = pa.ipc.new_file(sink, schema)
+                table, widened = _chunk_table(chunk, schema)
+                if widened:
+                    tmp_path, sink, writer, schema = _widen_spill(tmp_path, sink, writer, schema, widened)
+                writer.write_table(table)
+
+            if on_progress is not None:
+                # position in the (possibly compressed) upload, so this works for archives too
+                fraction = min(fileobj.tell() / total_bytes, 1.0) if total_bytes else 0.0
+                on_progress(fraction, result["rows"])
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            sink.close()
+            tmp_path.unlink(missing_ok=True)
+        raise
+    finally:
+        fileobj.seek(0)
+
+    if writer is not None:
+        writer.close()
+        sink.close()
+        entry = metadata_store.commit_snapshot(tmp_path, digest, source_name or digest, schema, result["rows"])
+        result["spill_path"] = entry["path"]
+    if result["preview"] is None:
+        result["preview"] = pd.DataFrame()
+    if on_progress is not None:
+        on_progress(1.0, result["rows"])
+    return result
+
+
+def read_metadata_streaming(fileobj, on_progress=None) -> dict:
+    """Streaming counterpart of read_metadata_csv(); results are cached per content hash too."""
+    digest = fingerprint_upload(fileobj)
+    key = ("stream", digest)
+    result = FRAME_CACHE.get(key)
+    if result is None or (result["spill_path"] and not os.path.exists(result["spill_path"])):
+        total_bytes = getattr(fileobj, "size", None)
+        result = ingest_csv_streaming(fileobj, digest, total_bytes=total_bytes, on_progress=on_progress,
+                                      source_name=getattr(fileobj, "name", None))
+        FRAME_CACHE.put(key, result, frame_nbytes(result["preview"]) + 512 * len(result["stats"]))
+    return result
+
+
+# ---------------- BACKGROUND-FRIENDLY ENTRY POINT ----------------
+def detached_copy(uploaded_file):
+    """In-memory copy of a Streamlit upload that a worker thread can read on its own.
+
+    The uploader's object is shared with the script thread (and reset between reruns), so jobs
+    get their own file position. BytesIO shares the underlying bytes until written to.
+    """
+    copy = io.BytesIO(uploaded_file.getvalue())
+    copy.name = uploaded_file.name
+    copy.size = uploaded_file.size
+    copy.file_id = getattr(uploaded_file, "file_id", None) or getattr(uploaded_file, "id", None)
+    return copy
+
+
+def ingest_upload(fileobj, on_progress=None, owner: str = None, source: str = None) -> dict:
+    """Parse an upload the way its size calls for. Returns a summary the page can render.
+
+    `frame` is the compacted DataFrame for small files; large files are streamed, so only
+    `stream` (aggregates + preview, see ingest_csv_streaming) is returned and the data itself
+    lives in the metadata_store snapshot. `diff` compares it with `owner`'s previous upload of
+    the same source and layout (metadata_diff.diff_against_previous; None for a first upload).
+    `source` defaults to the file name.
+    """
+    name = getattr(fileobj, "name", None)
+    size = getattr(fileobj, "size", None)
+    if on_progress is not None:
+        report = on_progress
+        on_progress = lambda fraction, rows: report(fraction, f"{rows:,} rows")  # noqa: E731
+    if is_compressed(name) or (size is not None and size > STREAMING_THRESHOLD_BYTES):
+        result = read_metadata_streaming(fileobj, on_progress=on_progress)
+        return {"name": name, "digest": result["digest"], "rows": result["rows"], "frame": None, "stream": result,
+                "diff": diff_against_previous(result["digest"], owner, source or name)}
+    df, digest = read_metadata_csv(fileobj, source_name=name)
+    if on_progress is not None:
+        on_progress(1.0, len(df))
+    return {"name": name, "digest": digest, "rows": len(df), "frame": df, "stream": None,
+            "diff": diff_against_previous(digest, owner, source or name)}
+
+
+# ---------------- BATCH (MULTI-FILE) INGEST ----------------
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    """Process pool for parsing many files across cores, created once and reused.
+
+    Uses "spawn": forking a process that is running Streamlit's threads is not safe.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _batch_pool
+
+
+def _parse_csv_bytes(name: str, data: bytes):
+    """Worker-process side of ingest_batch(). Returns (name, frame or None, seconds, error)."""
+    started = time.perf_counter()
+    try:
+        df = read_csv_any(io.BytesIO(data), name)
+        return name, df, time.perf_counter() - started, None
+    except Exception as e:
+        return name, None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+
+
+def ingest_batch(files, on_progress=None, owner: str = None, source: str = None) -> dict:
+    """Parse many uploads in parallel, check their schemas agree, then merge and de-duplicate.
+
+    Files whose columns differ from the first successfully parsed file are left out and
+    reported. Only rows identical in every column are dropped as duplicates (overlapping
+    exports): layout keys are not unique per row, so rows that merely share one are kept.
+    Returns the same shape as ingest_upload() plus a per-file `files` report; `source`
+    defaults to the sorted file names.
+    """
+    digests = sorted(fingerprint_upload(f) for f in files)
+    batch_digest = hashlib.sha256("".join(digests).encode()).hexdigest()
+    name = f"{len(files)} files"
+
+    pool = _get_batch_pool()
+    futures = {pool.submit(_parse_csv_bytes, f.name, f.getvalue()): i for i, f in enumerate(files)}
+    parsed = [None] * len(files)
+    for done, future in enumerate(as_completed(futures), start=1):
+        _, df, seconds, error = future.result()
+        parsed[futures[future]] = (df, seconds, error)
+        if on_progress is not None:
+            on_progress(done / len(files), f"{done}/{len(files)} files parsed")
+
+    reports, frames, reference = [], [], None
+    for f, (df, seconds, error) in zip(files, parsed):
+        report = {"file": f.name, "rows": 0, "seconds": round(seconds, 3), "status": "ok"}
+        if error:
+            report["status"] = f"failed: {error}"
+        else:
+            report["rows"] = len(df)
+            columns = {normalize_column(c): c for c in df.columns}
+            if reference is None:
+                reference = list(df.columns)
+            ref_normalized = {normalize_column(c) for c in reference}
+            missing, extra = ref_normalized - columns.keys(), columns.keys() - ref_normalized
+            if missing or extra:
+                report["status"] = f"schema mismatch — missing {sorted(missing)}, extra {sorted(extra)}"
+            else:
+                # same columns, possibly in another order or spelling: align to the reference
+                frames.append(df.rename(columns={columns[normalize_column(c)]: c for c in reference})[reference])
+        reports.append(report)
+
+    if frames:
+        merged = pd.concat(frames, ignore_index=True)
+        before = len(merged)
+        merged = merged.drop_duplicates(keep="last", ignore_index=True)
+        duplicates = before - len(merged)
+        merged, compaction = compact_frame(merged)
+        merged.attrs["compaction"] = compaction
+        if metadata_store.available():
+            metadata_store.ensure_snapshot(merged, batch_digest, name)
+        FRAME_CACHE.put(("csv", batch_digest), merged, frame_nbytes(merged))
+    else:
+        merged, duplicates = pd.DataFrame(), 0
+
+    return {
+        "name": name,
+        "digest": batch_digest,
+        "rows": len(merged),
+        "frame": merged,
+        "stream": None,
+        "files": reports,
+        "duplicates": duplicates,
+        "diff": diff_against_previous(batch_digest, owner, source or "|".join(sorted(f.name for f in files)))
+        if frames else None,
+    }
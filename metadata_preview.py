@@ -0,0 +1,107 @@
+import math
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from asset_cache import ByteLRUCache
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# NOTE: filtering and sorting happen here, on the server; only the rows of the current page
+# are handed to st.dataframe, so the websocket payload is one page regardless of file size.
+# The row order for a (source, filter, sort) combination is computed once and cached, so
+# paging through it is just a slice.
+
+PAGE_SIZES = [25, 50, 100, 250]
+_ORDER_CACHE = ByteLRUCache(256 * 1024 * 1024)
+
+
+def _is_arrow(data) -> bool:
+    return pa is not None and isinstance(data, pa.Table)
+
+
+def _columns(data) -> list:
+    return list(data.column_names) if _is_arrow(data) else [str(c) for c in data.columns]
+
+
+def _num_rows(data) -> int:
+    return data.num_rows if _is_arrow(data) else len(data)
+
+
+def _row_order(data, filter_col, filter_text, sort_col, descending) -> np.ndarray:
+    """Positions of the rows that pass the filter, in display order."""
+    if _is_arrow(data):
+        positions = np.arange(data.num_rows)
+        if filter_col and filter_text:
+            text = pc.cast(data[filter_col], pa.string())
+            mask = pc.fill_null(pc.match_substring(text, filter_text, ignore_case=True), False)
+            positions = np.flatnonzero(mask.to_numpy(zero_copy_only=False))
+        if sort_col:
+            order = pc.sort_indices(
+                data.select([sort_col]).take(positions),
+                sort_keys=[(sort_col, "descending" if descending else "ascending")],
+            )
+            positions = positions[order.to_numpy()]
+        return positions
+
+    positions = np.arange(len(data))
+    if filter_col and filter_text:
+        text = data[filter_col].astype("string")
+        positions = np.flatnonzero(text.str.contains(filter_text, case=False, regex=False, na=False).to_numpy())
+    if sort_col:
+        values = data[sort_col].iloc[positions].reset_index(drop=True)
+        order = values.sort_values(ascending=not descending, na_position="last", kind="stable").index
+        positions = positions[order.to_numpy()]
+    return positions
+
+
+def _window(data, positions: np.ndarray) -> pd.DataFrame:
+    if _is_arrow(data):
+        window = data.take(pa.array(positions)).to_pandas()
+    else:
+        window = data.iloc[positions]
+    window.index = positions  # keep the original row numbers visible
+    return window
+
+
+def render_paginated_preview(data, source_id: str, key: str = "preview") -> None:
+    """Browse a DataFrame or pyarrow Table one server-side page at a time."""
+    columns = _columns(data)
+    total = _num_rows(data)
+
+    c1, c2, c3, c4 = st.columns([1, 2, 2, 2])
+    with c1:
+        page_size = st.selectbox("Rows", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    with c2:
+        sort_col = st.selectbox("Sort by", [None] + columns, key=f"{key}_sort",
+                                format_func=lambda c: "—" if c is None else c)
+        descending = st.checkbox("Descending", key=f"{key}_desc", disabled=sort_col is None)
+    with c3:
+        filter_col = st.selectbox("Filter column", [None] + columns, key=f"{key}_filter_col",
+                                  format_func=lambda c: "—" if c is None else c)
+    with c4:
+        filter_text = st.text_input("Contains", key=f"{key}_filter_text", disabled=filter_col is None)
+
+    cache_key = (source_id, filter_col, filter_text if filter_col else "", sort_col, bool(descending and sort_col))
+    positions = _ORDER_CACHE.get(cache_key)
+    if positions is None:
+        positions = _row_order(data, filter_col, filter_text, sort_col, descending)
+        _ORDER_CACHE.put(cache_key, positions, positions.nbytes)
+
+    matched = len(positions)
+    pages = max(1, math.ceil(matched / page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:  # the filter just shrank the result
+        st.session_state[f"{key}_page"] = pages
+    page = int(st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page"))
+    start = (page - 1) * page_size
+    window_positions = positions[start:start + page_size]
+
+    st.dataframe(_window(data, window_positions), use_container_width=True)
+    shown = f"{start + 1:,}–{start + len(window_positions):,}" if len(window_positions) else "0"
+    suffix = f" (filtered from {total:,})" if matched != total else ""
+    st.caption(f"Rows {shown} of {matched:,}{suffix} · page {page} of {pages}")
@@ -0,0 +1,140 @@
+import re
+
+import pandas as pd
+
+# NOTE: BI metadata exports are wide but very repetitive — thousands of rows share a handful
+# of projects, owners, sites and data source types. Declaring those columns `category` (and
+# counts int32, timestamps datetime) instead of letting read_csv infer `object`/`int64`
+# shrinks a frame several times over. Column names are matched after normalisation
+# ("Project Name" -> "project_name").
+
+# Known layouts: name -> columns that identify it. Most specific first: an export that names
+# several kinds of object (a views export also carries workbook_id/workbook_name) has one row
+# per object of the most downstream kind.
+LAYOUTS = {
+    "tableau_views": {"view_id", "view_name"},
+    "tableau_workbooks": {"workbook_id", "workbook_name"},
+    "tableau_datasources": {"datasource_id", "datasource_name"},
+    "tableau_users": {"user_id", "user_name"},
+}
+
+# Columns that identify one row of each layout (used to match rows across uploads). Not
+# guaranteed unique: an export may list an object once per related object.
+LAYOUT_KEYS = {
+    "tableau_views": ("site", "site_name", "view_id"),
+    "tableau_workbooks": ("site", "site_name", "workbook_id"),
+    "tableau_datasources": ("site", "site_name", "datasource_id"),
+    "tableau_users": ("site", "site_name", "user_id"),
+}
+
+# Declared dtype per normalised column name, shared by all layouts
+COLUMN_DTYPES = {
+    # identifiers — unique per row, keep as plain strings
+    "workbook_id": "string",
+    "view_id": "string",
+    "datasource_id": "string",
+    "user_id": "string",
+    "field_id": "string",
+    # low-cardinality labels
+    "site": "category",
+    "site_name": "category",
+    "project": "category",
+    "project_name": "category",
+    "owner": "category",
+    "owner_name": "category",
+    "workbook_name": "category",
+    "view_name": "category",
+    "datasource_name": "category",
+    "datasource_type": "category",
+    "data_source_type": "category",
+    "connection_type": "category",
+    "content_type": "category",
+    "site_role": "category",
+    "tags": "category",
+    # counts
+    "view_count": "Int32",
+    "total_views": "Int32",
+    "usage_count": "Int32",
+    "size": "Int64",
+    # timestamps
+    "created_at": "datetime",
+    "updated_at": "datetime",
+    "last_login": "datetime",
+    "last_accessed_at": "datetime",
+}
+
+# Undeclared object columns become `category` when distinct values / rows is below this
+AUTO_CATEGORY_RATIO = 0.5
+
+
+def normalize_column(name) -> str:
+    return re.sub(r"[^0-9a-z]+", "_", str(name).strip().lower()).strip("_")
+
+
+def detect_layout(columns):
+    """Name of the most specific known layout whose identifying columns are all present, else None."""
+    names = {normalize_column(c) for c in columns}
+    for layout, required in LAYOUTS.items():
+        if required <= names:
+            return layout
+    return None
+
+
+def _convert(s: pd.Series, dtype: str):
+    """`s` converted to `dtype`, or None when the data does not fit it without losing values."""
+    try:
+        if dtype == "datetime":
+            out = pd.to_datetime(s, errors="coerce", utc=True)
+        elif dtype in ("Int32", "Int64"):
+            out = pd.to_numeric(s, errors="coerce")
+            if (out.dropna() % 1 != 0).any():
+                return None
+            out = out.astype(dtype)
+        else:
+            out = s.astype(dtype)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    # Never trade data for memory: values that failed to parse would silently become null
+    if out.isna().sum() > s.isna().sum():
+        return None
+    return out
+
+
+def _auto_dtype(s: pd.Series):
+    if pd.api.types.is_integer_dtype(s) and not isinstance(s.dtype, pd.CategoricalDtype):
+        return pd.to_numeric(s, downcast="integer")
+    if pd.api.types.is_float_dtype(s):
+        return None
+    if s.dtype == object or pd.api.types.is_string_dtype(s):
+        if len(s) and s.nunique(dropna=True) / len(s) < AUTO_CATEGORY_RATIO:
+            return s.astype("category")
+    return None
+
+
+def compact_frame(df: pd.DataFrame):
+    """Apply declared dtypes, downcast the rest. Returns (compacted frame, report dict)."""
+    before = int(df.memory_usage(deep=True).sum())
+    out = df.copy()
+    changes = {}
+    for col in df.columns:
+        s = df[col]
+        declared = COLUMN_DTYPES.get(normalize_column(col))
+        converted = _convert(s, declared) if declared else _auto_dtype(s)
+        if converted is not None and str(converted.dtype) != str(s.dtype):
+            out[col] = converted
+            changes[col] = (str(s.dtype), str(converted.dtype))
+    after = int(out.memory_usage(deep=True).sum())
+    report = {
+        "layout": detect_layout(df.columns),
+        "before_bytes": before,
+        "after_bytes": after,
+        "changes": changes,
+    }
+    return out, report
+
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
@@ -0,0 +1,226 @@
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+import metadata_store
+from jobs import get_job, submit_job, track_job
+from metadata_store import WORKSPACE_DIR
+
+try:
+    import duckdb
+except ImportError:  # the SQL panel is simply not shown
+    duckdb = None
+
+# NOTE: ad-hoc questions about an upload run in an embedded DuckDB database. The upload's
+# memory-mapped Arrow snapshot is registered as the view `metadata` (and the other uploads
+# of the same session as `snapshot_<hash prefix>`, for joins across uploads), so DuckDB
+# scans the columns in place — vectorised and multi-threaded, nothing copied into pandas first.
+# Results come back as a stream of record batches and the page only pulls the batches it
+# shows. Saved queries are plain JSON in the workspace.
+# The SQL is typed by users, so it is sandboxed: only a single SELECT statement is accepted,
+# and every query gets its own fresh in-memory database, so nothing one query could leave behind
+# (a table, view or macro) is visible to the next. That database has no file system or network
+# access (read_csv, COPY ... TO, ATTACH), no extension installs or loads, capped memory and
+# threads, and a locked configuration so a query cannot undo any of that. Only snapshots the
+# session itself uploaded are registered, so one user's query cannot see another user's data.
+# Queries run as jobs (see jobs.py) and can be cancelled; the first page is read in the job.
+
+SQL_PAGE_ROWS = 500
+SAVED_QUERIES_PATH = WORKSPACE_DIR / "saved_queries.json"
+DEFAULT_QUERY = "SELECT * FROM metadata LIMIT 100"
+SQL_MEMORY_LIMIT = os.environ.get("BI4BI_SQL_MEMORY_LIMIT", "1GB")  # per query
+SQL_THREADS = int(os.environ.get("BI4BI_SQL_THREADS", 2))
+CANCEL_POLL_SECONDS = 0.2
+
+_lock = threading.Lock()
+
+
+def available() -> bool:
+    return duckdb is not None and metadata_store.available()
+
+
+def _connect():
+    """A new sandboxed in-memory database for one query."""
+    connection = duckdb.connect(":memory:", config={
+        "enable_external_access": False,
+        "autoinstall_known_extensions": False,
+        "autoload_known_extensions": False,
+        "memory_limit": SQL_MEMORY_LIMIT,
+        "threads": SQL_THREADS,
+    })
+    connection.execute("SET lock_configuration = true")  # last: the limits above are set by now
+    return connection
+
+
+def _check_select(sql: str) -> None:
+    statements = duckdb.extract_statements(sql)
+    if len(statements) != 1 or statements[0].type != duckdb.StatementType.SELECT:
+        raise duckdb.InvalidInputException("Only a single SELECT query can be run")
+
+
+def _snapshot_view_name(source_hash: str) -> str:
+    return f"snapshot_{source_hash[:12]}"
+
+
+# ---------------- QUERIES ----------------
+def run_query(sql: str, source_hash: str, page_rows: int = SQL_PAGE_ROWS, snapshots=(), cancel=None) -> dict:
+    """Run `sql` against the snapshot of `source_hash` and read its first page; the rest is
+    fetched lazily by fetch_page().
+
+    `snapshots` are the other source hashes the query may join as `snapshot_<hash prefix>`.
+    Setting the `cancel` threading.Event interrupts the query.
+    """
+    _check_select(sql)
+    connection = _connect()
+    done = threading.Event()
+
+    def _watch():
+        while not done.wait(CANCEL_POLL_SECONDS):
+            if cancel.is_set():
+                connection.interrupt()
+                return
+
+    try:
+        connection.register("metadata", metadata_store.open_snapshot(source_hash))
+        for other in snapshots:
+            if metadata_store.get_entry(other) and re.search(rf"\b{_snapshot_view_name(other)}\b", sql):
+                connection.register(_snapshot_view_name(other), metadata_store.open_snapshot(other))
+        if cancel is not None:
+            threading.Thread(target=_watch, daemon=True, name="bi4bi-sql-cancel").start()
+        started = time.perf_counter()
+        reader = connection.execute(sql).fetch_record_batch(page_rows)
+        result = {
+            "sql": sql,
+            "source_hash": source_hash,
+            "connection": connection,
+            "reader": reader,
+            "pages": [],
+            "exhausted": False,
+            "columns": list(reader.schema.names),
+        }
+        fetch_page(result, 1)  # a streamed query does its work as batches are read
+        result["seconds"] = time.perf_counter() - started
+        return result
+    except BaseException:
+        connection.close()
+        raise
+    finally:
+        done.set()
+
+
+def close_query(result: dict) -> None:
+    if not result["exhausted"]:
+        result["exhausted"] = True
+        result["connection"].close()
+
+
+def fetch_page(result: dict, page: int):
+    """DataFrame for page `page` (0-based), reading further batches only as needed; None past the end."""
+    while len(result["pages"]) <= page and not result["exhausted"]:
+        try:
+            batch = result["reader"].read_next_batch()
+        except StopIteration:
+            close_query(result)
+            break
+        if batch.num_rows:
+            result["pages"].append(batch.to_pandas())
+    return result["pages"][page] if page < len(result["pages"]) else None
+
+
+# ---------------- SAVED QUERIES ----------------
+def load_saved_queries() -> dict:
+    try:
+        return json.loads(SAVED_QUERIES_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_saved_queries(queries: dict) -> None:
+    SAVED_QUERIES_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = SAVED_QUERIES_PATH.with_name(f".saved_queries.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(queries, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, SAVED_QUERIES_PATH)
+
+
+def save_query(name: str, sql: str) -> None:
+    with _lock:
+        queries = load_saved_queries()
+        queries[name] = sql
+        _write_saved_queries(queries)
+
+
+def delete_query(name: str) -> None:
+    with _lock:
+        queries = load_saved_queries()
+        queries.pop(name, None)
+        _write_saved_queries(queries)
+
+
+# ---------------- UI ----------------
+def render_sql_panel(source_hash: str, key: str = "sql") -> None:
+    """Query box with saved queries and paged results for the upload `source_hash`."""
+    snapshots = st.session_state.setdefault("sql_snapshots", [])  # this session's uploads, for joins
+    if source_hash not in snapshots:
+        snapshots.append(source_hash)
+    saved = load_saved_queries()
+    choice = st.selectbox("Saved queries", [None] + sorted(saved), key=f"{key}_saved",
+                          format_func=lambda q: "—" if q is None else q)
+    if choice is not None and st.session_state.get(f"{key}_loaded") != choice:
+        st.session_state[f"{key}_text"] = saved[choice]  # load it into the editor once
+        st.session_state[f"{key}_loaded"] = choice
+    st.session_state.setdefault(f"{key}_text", DEFAULT_QUERY)
+    sql = st.text_area("SQL", key=f"{key}_text", height=120,
+                       help="The upload is the table `metadata`; your other uploads in this session are "
+                            "`snapshot_<first 12 hash chars>`.")
+
+    c1, c2, c3, c4 = st.columns([1, 2, 1, 1])
+    run = c1.button("Run", key=f"{key}_run", type="primary")
+    name = c2.text_input("Name", key=f"{key}_name", label_visibility="collapsed", placeholder="Query name")
+    if c3.button("Save", key=f"{key}_save", disabled=not name):
+        save_query(name, sql)
+        st.rerun()  # so the saved-queries list picks it up
+    if c4.button("Delete", key=f"{key}_delete", disabled=choice is None):
+        delete_query(choice)
+        st.session_state.pop(f"{key}_loaded", None)
+        st.rerun()
+
+    previous = get_job(st.session_state.get(f"{key}_job"))
+    if run:
+        if previous is not None and previous["status"] == "done":
+            close_query(previous["result"])
+        job_id = submit_job("Run SQL query", run_query, sql, source_hash, snapshots=list(snapshots),
+                            cancel_kw="cancel")
+        st.session_state[f"{key}_job"] = job_id
+        st.session_state[f"{key}_page"] = 0
+        track_job(job_id)
+        st.rerun()
+
+    # Failures (parser, binder, catalog, ... errors) and cancellation show in the job status area
+    if previous is None or previous["status"] != "done" or previous["result"]["source_hash"] != source_hash:
+        return
+    result = previous["result"]
+    page = st.session_state.get(f"{key}_page", 0)
+    frame = fetch_page(result, page)
+    if frame is None and page > 0:  # the stream ended exactly at the previous page
+        page = st.session_state[f"{key}_page"] = page - 1
+        frame = fetch_page(result, page)
+    if frame is None:
+        frame = pd.DataFrame(columns=result["columns"])
+    st.dataframe(frame, use_container_width=True)
+
+    more = fetch_page(result, page + 1) is not None  # read one batch ahead to know if there is a next page
+    p1, p2, p3 = st.columns([1, 1, 4])
+    if p1.button("Previous", key=f"{key}_prev", disabled=page == 0):
+        st.session_state[f"{key}_page"] = page - 1
+        st.rerun()
+    if p2.button("Next", key=f"{key}_next", disabled=not more):
+        st.session_state[f"{key}_page"] = page + 1
+        st.rerun()
+    fetched = sum(len(p) for p in result["pages"])
+    total = f"{fetched:,}" if result["exhausted"] else f"{fetched:,}+"
+    p3.caption(f"Page {page + 1} · {total} rows · started in {result['seconds'] * 1000:.0f} ms")
@@ -0,0 +1,158 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# NOTE: every ingested metadata file gets a columnar copy in STORE_DIR as an uncompressed
+# Arrow IPC file (<sha256>.arrow). Uncompressed IPC can be memory-mapped and read without
+# copying or parsing, which Parquet cannot, so later pages/reruns reopen it for ~free.
+# manifest.json records schema, row count and source hash for each snapshot, plus a short
+# history of who uploaded which snapshot for which source (see record_upload()), because a
+# snapshot is shared by everyone who uploads the same bytes.
+
+WORKSPACE_DIR = Path(os.environ.get("BI4BI_WORKSPACE", Path(__file__).parent / ".bi4bi_workspace"))
+STORE_DIR = WORKSPACE_DIR / "store"
+MANIFEST_PATH = STORE_DIR / "manifest.json"
+UPLOAD_HISTORY_MAX = 1000
+
+_lock = threading.Lock()
+_open_tables = {}  # source_hash -> memory-mapped pa.Table
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def snapshot_path(source_hash: str) -> Path:
+    return STORE_DIR / f"{source_hash}.arrow"
+
+
+# ---------------- MANIFEST ----------------
+def load_manifest() -> dict:
+    if not MANIFEST_PATH.exists():
+        return {"snapshots": {}}
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"snapshots": {}}
+
+
+def _save_manifest(manifest: dict) -> None:
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_name(f".manifest.{os.getpid()}-{threading.get_ident()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def get_entry(source_hash: str):
+    entry = load_manifest()["snapshots"].get(source_hash)
+    if entry and Path(entry["path"]).exists():
+        return entry
+    return None
+
+
+def latest_entry():
+    entries = [e for e in load_manifest()["snapshots"].values() if Path(e["path"]).exists()]
+    return max(entries, key=lambda e: e["created_at"], default=None)
+
+
+def _register(source_hash: str, source_name: str, schema, rows: int) -> dict:
+    path = snapshot_path(source_hash)
+    entry = {
+        "source_hash": source_hash,
+        "source_name": source_name,
+        "path": str(path),
+        "rows": int(rows),
+        "bytes": path.stat().st_size,
+        "schema": [{"name": f.name, "type": str(f.type)} for f in schema],
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    with _lock:
+        manifest = load_manifest()
+        manifest["snapshots"][source_hash] = entry
+        _save_manifest(manifest)
+        _open_tables.pop(source_hash, None)
+    return entry
+
+
+def record_upload(source_hash: str, owner: str, source: str) -> None:
+    """Note that `owner` uploaded snapshot `source_hash` as metadata of `source`."""
+    record = {"source_hash": source_hash, "owner": owner, "source": source,
+              "uploaded_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    with _lock:
+        manifest = load_manifest()
+        manifest["uploads"] = (manifest.get("uploads", []) + [record])[-UPLOAD_HISTORY_MAX:]
+        _save_manifest(manifest)
+
+
+def upload_history() -> list:
+    """record_upload() records, oldest first."""
+    return load_manifest().get("uploads", [])
+
+
+# ---------------- WRITE ----------------
+def frame_to_arrow(df: pd.DataFrame):
+    """pa.Table for `df`; object columns holding mixed Python types are stored as strings."""
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].astype("string")
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_snapshot(df: pd.DataFrame, source_hash: str, source_name: str) -> dict:
+    """Write `df` as the columnar snapshot of `source_hash` and record it in the manifest."""
+    return write_table(frame_to_arrow(df), source_hash, source_name)
+
+
+def write_table(table, source_hash: str, source_name: str) -> dict:
+    """write_snapshot() for data that is already a pa.Table."""
+    path = snapshot_path(source_hash)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return _register(source_hash, source_name, table.schema, table.num_rows)
+
+
+def commit_snapshot(tmp_path: Path, source_hash: str, source_name: str, schema, rows: int) -> dict:
+    """Adopt an Arrow IPC file written elsewhere (e.g. the streaming spill) as a snapshot."""
+    path = snapshot_path(source_hash)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, path)
+    return _register(source_hash, source_name, schema, rows)
+
+
+def ensure_snapshot(df: pd.DataFrame, source_hash: str, source_name: str) -> dict:
+    return get_entry(source_hash) or write_snapshot(df, source_hash, source_name)
+
+
+# ---------------- READ ----------------
+def open_snapshot(source_hash: str):
+    """Memory-mapped pa.Table for a snapshot (zero-copy; pages are read lazily by the OS)."""
+    with _lock:
+        table = _open_tables.get(source_hash)
+    if table is None:
+        entry = get_entry(source_hash)
+        if entry is None:
+            raise KeyError(f"No metadata snapshot for {source_hash}")
+        source = pa.memory_map(entry["path"], "r")
+        table = pa.ipc.open_file(source).read_all()
+        with _lock:
+            _open_tables[source_hash] = table
+    return table
+
+
+def load_snapshot_frame(source_hash: str) -> pd.DataFrame:
+    return open_snapshot(source_hash).to_pandas()
@@ -0,0 +1,146 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+# NOTE: a stand-in for BACKEND_URL that implements just enough of the backend for local
+# testing: the chunked upload protocol of backend_upload.py and /reports/test-connection.
+# Run it with `python mock_backend.py --port 8000` and point core.config.BACKEND_URL at
+# http://127.0.0.1:8000. `--fail-every N` drops every Nth chunk request to exercise resuming.
+
+
+class MockBackend(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, root: Path, fail_every: int = 0):
+        super().__init__(address, _Handler)
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.fail_every = fail_every
+        self.uploads = {}  # upload id -> {name, size, sha256, received, complete}
+        self.requests_seen = 0
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockBackend
+    protocol_version = "HTTP/1.1"  # keep-alive, like a real backend behind a proxy
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, code: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _upload(self, upload_id):
+        upload = self.server.uploads.get(upload_id)
+        if upload is None:
+            self._reply(404, {"error": f"unknown upload {upload_id}"})
+        return upload
+
+    def do_GET(self):
+        m = re.fullmatch(r"/uploads/([\w-]+)", urlparse(self.path).path)
+        if not m:
+            return self._reply(404, {"error": "not found"})
+        upload = self._upload(m.group(1))
+        if upload is not None:
+            self._reply(200, {"upload_id": m.group(1), "received": upload["received"], "complete": upload["complete"]})
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path == "/reports/test-connection":
+            body = json.loads(self._body() or b"{}")
+            return self._reply(200, {"ok": True, "adapter": body.get("adapter")})
+        if path == "/uploads":
+            body = json.loads(self._body())
+            upload_id = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.uploads[upload_id] = dict(name=body["name"], size=int(body["size"]),
+                                                      sha256=body["sha256"], received=0, complete=False)
+            (self.server.root / upload_id).write_bytes(b"")
+            return self._reply(201, {"upload_id": upload_id, "received": 0})
+        m = re.fullmatch(r"/uploads/([\w-]+)/complete", path)
+        if m:
+            upload = self._upload(m.group(1))
+            if upload is None:
+                return
+            h = hashlib.sha256()
+            with open(self.server.root / m.group(1), "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    h.update(block)
+            upload["complete"] = h.hexdigest() == json.loads(self._body())["sha256"]
+            return self._reply(200 if upload["complete"] else 422, {"complete": upload["complete"], "sha256": h.hexdigest()})
+        self._reply(404, {"error": "not found"})
+
+    def do_PUT(self):
+        parsed = urlparse(self.path)
+        m = re.fullmatch(r"/uploads/([\w-]+)/chunks", parsed.path)
+        if not m:
+            return self._reply(404, {"error": "not found"})
+        with self.server.lock:
+            self.server.requests_seen += 1
+            fail = self.server.fail_every and self.server.requests_seen % self.server.fail_every == 0
+        body = self._body()
+        if fail:
+            self.close_connection = True
+            return self._reply(503, {"error": "injected failure"})
+        upload = self._upload(m.group(1))
+        if upload is None:
+            return
+        chunk = gzip.decompress(body) if self.headers.get("Content-Encoding") == "gzip" else body
+        if hashlib.sha256(chunk).hexdigest() != self.headers.get("X-Chunk-Sha256"):
+            return self._reply(400, {"error": "chunk checksum mismatch", "received": upload["received"]})
+        with self.server.lock:
+            offset = int(parse_qs(parsed.query).get("offset", ["0"])[0])
+            if offset != upload["received"]:
+                return self._reply(409, {"error": "offset mismatch", "received": upload["received"]})
+            with open(self.server.root / m.group(1), "ab") as f:
+                f.write(chunk)
+            upload["received"] += len(chunk)
+        self._reply(200, {"received": upload["received"]})
+
+
+def serve(port: int = 0, root=None, fail_every: int = 0) -> MockBackend:
+    """Start a MockBackend on a daemon thread (port 0 picks a free port); call .shutdown() to stop."""
+    server = MockBackend(("127.0.0.1", port), root or tempfile.mkdtemp(prefix="bi4bi-backend-"), fail_every)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the BI4BI backend")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--root", default=os.path.join(tempfile.gettempdir(), "bi4bi-backend"))
+    parser.add_argument("--fail-every", type=int, default=0)
+    args = parser.parse_args()
+    server = MockBackend(("127.0.0.1", args.port), args.root, args.fail_every)
+    print(f"Mock backend on {server.url}, storing uploads in {args.root}")
+    server.serve_forever()
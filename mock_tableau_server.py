@@ -0,0 +1,262 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# NOTE: a local stand-in for a Tableau Server / Cloud site, implementing the slice of the
+# REST API that tableau_extractor.py uses: personal-access-token sign-in/sign-out and the
+# paginated workbooks, views (with usage), data sources and users lists, in JSON. It can add
+# latency to every request and throttle with 429 + Retry-After, so extraction throughput
+# and rate-limit handling can be measured offline:
+#   python mock_tableau_server.py --port 8766 --workbooks 5000 --latency-ms 40 --rate-limit 50
+# Lists understand `filter=updatedAt:gt|gte|lt|lte:<ISO time>` and `fields=a,b.c`, as used by
+# incremental syncs; touch() and remove() change a site in place to give them something to find.
+
+MAX_PAGE_SIZE = 1000
+TOKEN_NAME = "mock-token"
+TOKEN_SECRET = "mock-secret"
+SITE_ID = "9a8b7c6d-0000-4000-8000-00000000beef"
+
+
+def _iso(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def synthetic_site(workbooks: int = 1000, views_per_workbook: int = 5, datasources: int = None,
+                   users: int = None, seed: int = 7) -> dict:
+    """Deterministic site contents: resource -> list of REST API JSON objects."""
+    rng = random.Random(seed)
+    datasources = datasources if datasources is not None else max(1, workbooks // 4)
+    users = users if users is not None else max(1, workbooks // 2)
+    base = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    projects = [{"id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Project {i}"} for i in range(20)]
+    site = {"users": [], "datasources": [], "workbooks": [], "views": []}
+    for i in range(users):
+        site["users"].append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"user{i}@example.com", "fullName": f"User {i}",
+            "siteRole": rng.choice(["Viewer", "Explorer", "Creator", "SiteAdministratorCreator"]),
+            "authSetting": "ServerDefault", "lastLogin": _iso(base + timedelta(hours=rng.randrange(20_000))),
+        })
+    for i in range(datasources):
+        project = rng.choice(projects)
+        created = base + timedelta(minutes=rng.randrange(500_000))
+        site["datasources"].append({
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Data source {i}", "contentUrl": f"ds{i}",
+            "type": rng.choice(["sqlserver", "snowflake", "excel-direct", "postgres", "hyper"]),
+            "createdAt": _iso(created), "updatedAt": _iso(created + timedelta(minutes=rng.randrange(100_000))),
+            "project": dict(project), "owner": {"id": rng.choice(site["users"])["id"]},
+        })
+    for i in range(workbooks):
+        project = rng.choice(projects)
+        created = base + timedelta(minutes=rng.randrange(500_000))
+        workbook = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Workbook {i}", "contentUrl": f"wb{i}",
+            "size": str(rng.randrange(1, 500)), "createdAt": _iso(created),
+            "updatedAt": _iso(created + timedelta(minutes=rng.randrange(100_000))),
+            "project": dict(project), "owner": {"id": rng.choice(site["users"])["id"]},
+            "tags": {"tag": [{"label": t} for t in rng.sample(["finance", "sales", "ops", "hr", "kpi"], rng.randrange(3))]},
+        }
+        site["workbooks"].append(workbook)
+        for j in range(views_per_workbook):
+            site["views"].append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))), "name": f"Sheet {j}", "contentUrl": f"wb{i}/sheets/s{j}",
+                "createdAt": workbook["createdAt"], "updatedAt": workbook["updatedAt"],
+                "workbook": {"id": workbook["id"]}, "project": {"id": project["id"]}, "owner": workbook["owner"],
+                "usage": {"totalViewCount": str(rng.randrange(10_000))},
+            })
+    return site
+
+
+def touch(site: dict, resource: str, count: int, seed: int = 0, when: datetime = None) -> list:
+    """Edit `count` random objects of `resource` (new name, updatedAt = `when`); returns their ids."""
+    rng = random.Random(seed)
+    stamp = _iso(when or datetime.now(timezone.utc))
+    items = rng.sample(site[resource], min(count, len(site[resource])))
+    for item in items:
+        item["name"] = item["name"] + " (edited)"
+        item["updatedAt"] = stamp
+    return [item["id"] for item in items]
+
+
+def remove(site: dict, resource: str, count: int, seed: int = 0) -> list:
+    """Delete `count` random objects of `resource`; returns their ids."""
+    rng = random.Random(seed)
+    gone = {item["id"] for item in rng.sample(site[resource], min(count, len(site[resource])))}
+    site[resource][:] = [item for item in site[resource] if item["id"] not in gone]
+    return sorted(gone)
+
+
+def _matches(item: dict, expression: str) -> bool:
+    """One `field:operator:value` filter term; ISO timestamps compare correctly as strings."""
+    field, operator, value = expression.split(":", 2)
+    current = item.get(field)
+    if current is None:
+        return False
+    return {"eq": current == value, "gt": current > value, "gte": current >= value,
+            "lt": current < value, "lte": current <= value}[operator]
+
+
+def _project(item: dict, fields: list) -> dict:
+    out = {}
+    for field in fields:
+        source, target, parts = item, out, field.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            target = target.setdefault(part, {})
+        if isinstance(source, dict) and parts[-1] in source:
+            target[parts[-1]] = source[parts[-1]]
+    return out
+
+
+class MockTableauServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, site: dict, site_name: str = "", latency: float = 0.0, rate_limit: int = 0):
+        super().__init__(address, _Handler)
+        self.site = site
+        self.site_name = site_name
+        self.latency = latency
+        self.rate_limit = rate_limit  # requests per second, 0 = unlimited
+        self.tokens = set()
+        self.requests_seen = 0
+        self.throttled = 0
+        self.window = (0, 0)  # (second, requests in it)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def admit(self) -> bool:
+        """Count a request; False when it exceeds the per-second rate limit."""
+        with self.lock:
+            self.requests_seen += 1
+            if not self.rate_limit:
+                return True
+            second = int(time.monotonic())
+            count = self.window[1] + 1 if self.window[0] == second else 1
+            self.window = (second, count)
+            if count > self.rate_limit:
+                self.throttled += 1
+                return False
+            return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: MockTableauServer
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, code: int, body: dict = None, headers: dict = None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, summary: str, headers: dict = None):
+        self._reply(code, {"error": {"code": str(code), "summary": summary, "detail": summary}}, headers)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _admitted(self) -> bool:
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if not self.server.admit():
+            self._error(429, "Too many requests", {"Retry-After": "1"})
+            return False
+        return True
+
+    def do_POST(self):
+        body = self._body()
+        if not self._admitted():
+            return
+        path = urlparse(self.path).path
+        if re.fullmatch(r"/api/[\d.]+/auth/signin", path):
+            credentials = json.loads(body or b"{}").get("credentials", {})
+            if (credentials.get("personalAccessTokenName"), credentials.get("personalAccessTokenSecret")) != (TOKEN_NAME, TOKEN_SECRET):
+                return self._error(401, "Signin Error")
+            if credentials.get("site", {}).get("contentUrl", "") != self.server.site_name:
+                return self._error(401, "Site not found")
+            token = uuid.uuid4().hex
+            with self.server.lock:
+                self.server.tokens.add(token)
+            return self._reply(200, {"credentials": {
+                "token": token, "site": {"id": SITE_ID, "contentUrl": self.server.site_name},
+                "user": {"id": self.server.site["users"][0]["id"] if self.server.site["users"] else SITE_ID},
+            }})
+        if re.fullmatch(r"/api/[\d.]+/auth/signout", path):
+            with self.server.lock:
+                self.server.tokens.discard(self.headers.get("X-Tableau-Auth"))
+            return self._reply(204)
+        self._error(404, "Resource not found")
+
+    def do_GET(self):
+        if not self._admitted():
+            return
+        parsed = urlparse(self.path)
+        m = re.fullmatch(r"/api/[\d.]+/sites/([\w-]+)/(workbooks|views|datasources|users)", parsed.path)
+        if not m:
+            return self._error(404, "Resource not found")
+        if self.headers.get("X-Tableau-Auth") not in self.server.tokens:
+            return self._error(401, "Authentication required")
+        if m.group(1) != SITE_ID:
+            return self._error(404, "Site not found")
+        resource = m.group(2)
+        query = parse_qs(parsed.query)
+        page_size = min(int(query.get("pageSize", ["100"])[0]), MAX_PAGE_SIZE)
+        page_number = int(query.get("pageNumber", ["1"])[0])
+        items = self.server.site[resource]
+        for expression in query.get("filter", [""])[0].split(","):
+            if expression:
+                try:
+                    items = [item for item in items if _matches(item, expression)]
+                except (ValueError, KeyError):
+                    return self._error(400, f"Invalid filter {expression}")
+        page = items[(page_number - 1) * page_size:page_number * page_size]
+        if resource == "views" and query.get("includeUsageStatistics", ["false"])[0] != "true":
+            page = [{k: v for k, v in item.items() if k != "usage"} for item in page]
+        if "fields" in query and query["fields"][0] != "_default_":
+            page = [_project(item, query["fields"][0].split(",")) for item in page]
+        self._reply(200, {
+            "pagination": {"pageNumber": str(page_number), "pageSize": str(page_size), "totalAvailable": str(len(items))},
+            resource: {resource[:-1]: page},
+        })
+
+
+def serve(port: int = 0, site: dict = None, site_name: str = "", latency: float = 0.0,
+          rate_limit: int = 0) -> MockTableauServer:
+    """Start a MockTableauServer on a daemon thread (port 0 picks a free port); call .shutdown() to stop."""
+    server = MockTableauServer(("127.0.0.1", port), site if site is not None else synthetic_site(),
+                               site_name, latency, rate_limit)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the Tableau REST API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--site-name", default="")
+    parser.add_argument("--workbooks", type=int, default=1000)
+    parser.add_argument("--views-per-workbook", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per second before answering 429")
+    args = parser.parse_args()
+    server = MockTableauServer(("127.0.0.1", args.port), synthetic_site(args.workbooks, args.views_per_workbook),
+                               args.site_name, args.latency_ms / 1000, args.rate_limit)
+    print(f"Mock Tableau server on {server.url} (token {TOKEN_NAME} / {TOKEN_SECRET}, site '{args.site_name}')")
+    server.serve_forever()
@@ -0,0 +1,258 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from metadata_schema import normalize_column
+
+# NOTE: near-duplicate reports are found without comparing every pair. Each report becomes
+# a set of tokens ("datasource_name=Sales", "field_name=Profit", ...) and a MinHash
+# signature: for each of NUM_PERM random hash functions, the smallest hash over its tokens.
+# Two signatures agree in a position with probability = Jaccard similarity of the sets.
+# Locality-sensitive hashing then cuts each signature into `bands` of `rows` and buckets
+# reports by band; only reports sharing a bucket are compared, which is close to linear in
+# the number of reports. Candidates are confirmed on estimated similarity and grouped into
+# clusters with union-find. Everything is vectorised numpy; `python similarity.py` benchmarks
+# it on synthetic data.
+
+NUM_PERM = 128
+DEFAULT_THRESHOLD = 0.8
+SIGNATURE_CHUNK_TOKENS = 8_192  # (NUM_PERM x tokens) uint64 working array: 8 MB
+_EMPTY = np.iinfo(np.uint32).max
+
+# Columns describing what a report is built from, in order of preference
+REPORT_ID_COLUMNS = ("workbook_id", "view_id", "report_id", "datasource_id")
+FEATURE_COLUMNS = (
+    "datasource_name", "datasource_id", "data_source_type", "datasource_type", "connection_type",
+    "table_name", "field_name", "field_id", "calculation", "formula", "sheet_name", "view_name", "tags",
+)
+
+
+# ---------------- TOKENS ----------------
+def report_tokens(df: pd.DataFrame, id_column: str = None, feature_columns=None):
+    """(report ids, token hashes, offsets): a CSR layout of each report's set of token hashes.
+
+    Rows are grouped by `id_column`, so exports with one row per report/field/data source all
+    work. Tokens of report i are tokens[offsets[i]:offsets[i + 1]].
+    """
+    by_normalized = {normalize_column(c): c for c in df.columns}
+    if id_column is None:
+        id_column = next((by_normalized[c] for c in REPORT_ID_COLUMNS if c in by_normalized), None)
+        if id_column is None:
+            raise ValueError(f"No report id column found (looked for {', '.join(REPORT_ID_COLUMNS)})")
+    if feature_columns is None:
+        feature_columns = [by_normalized[c] for c in FEATURE_COLUMNS if c in by_normalized and by_normalized[c] != id_column]
+    if not feature_columns:
+        raise ValueError("No feature columns to compare reports on")
+
+    report_codes, ids = pd.factorize(df[id_column], use_na_sentinel=True)
+    codes_parts, hash_parts = [], []
+    for col in feature_columns:
+        # hash each distinct value once; the column name is folded in so "a" in two columns differs
+        value_codes, uniques = pd.factorize(df[col])
+        normalized = pd.Index(uniques).astype("string").str.strip().str.lower()
+        salt = pd.util.hash_array(np.array([normalize_column(col)], dtype=object))[0]
+        value_hash = pd.util.hash_array(normalized.to_numpy(dtype=object)) ^ salt
+        present = (value_codes >= 0) & (report_codes >= 0)
+        codes_parts.append(report_codes[present])
+        hash_parts.append(value_hash[value_codes[present]])
+    codes = np.concatenate(codes_parts)
+    hashes = np.concatenate(hash_parts)
+    order = np.lexsort((hashes, codes))
+    codes, hashes = codes[order], hashes[order]
+    distinct = np.r_[True, (codes[1:] != codes[:-1]) | (hashes[1:] != hashes[:-1])]
+    codes, hashes = codes[distinct], hashes[distinct]
+    offsets = np.searchsorted(codes, np.arange(len(ids) + 1)).astype(np.int64)
+    return np.asarray(ids), hashes.astype(np.uint64), offsets
+
+
+# ---------------- MINHASH ----------------
+def _permutations(num_perm: int, seed: int):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)  # odd multipliers
+    b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+    return a[:, None], b[:, None]
+
+
+def minhash_signatures(tokens: np.ndarray, offsets: np.ndarray, num_perm: int = NUM_PERM, seed: int = 1) -> np.ndarray:
+    """(reports x num_perm) uint32 MinHash signatures, computed over report-aligned token chunks.
+
+    The hash functions are multiply-shift ((a * x + b) mod 2**64) >> 32, which needs no
+    modulo; the working array is (num_perm x chunk), so each min-reduction runs along
+    contiguous memory and stays in cache.
+    """
+    a, b = _permutations(num_perm, seed)
+    n = len(offsets) - 1
+    signatures = np.full((n, num_perm), _EMPTY, dtype=np.uint32)
+    start = 0
+    while start < n:
+        # as many whole reports as fit in the chunk (at least one)
+        end = int(np.searchsorted(offsets, offsets[start] + SIGNATURE_CHUNK_TOKENS, side="right")) - 1
+        end = min(max(end, start + 1), n)
+        lo, hi = offsets[start], offsets[end]
+        if hi > lo:
+            hashed = a * tokens[lo:hi]
+            hashed += b
+            hashed >>= np.uint64(32)
+            nonempty = np.flatnonzero(offsets[start:end] < offsets[start + 1:end + 1])
+            reduced = np.minimum.reduceat(hashed, offsets[start:end][nonempty] - lo, axis=1)
+            signatures[start + nonempty] = reduced.T
+        start = end
+    return signatures
+
+
+def lsh_params(threshold: float, num_perm: int = NUM_PERM, fn_weight: float = 0.9):
+    """(bands, rows) minimising the weighted false positive/negative mass of the LSH S-curve.
+
+    Leaning on recall (fn_weight > 0.5) is cheap: false positives are dropped afterwards by
+    the estimated-similarity check, false negatives are gone for good.
+    """
+    s = np.linspace(0, 1, 201)
+    best, best_cost = None, np.inf
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        p = 1 - (1 - s ** rows) ** bands  # probability of sharing at least one bucket
+        cost = ((1 - fn_weight) * np.where(s < threshold, p, 0).mean()
+                + fn_weight * np.where(s >= threshold, 1 - p, 0).mean())
+        if cost < best_cost:
+            best, best_cost = (bands, rows), cost
+    return best
+
+
+def estimated_similarity(signatures: np.ndarray, i, j) -> np.ndarray:
+    return (signatures[i] == signatures[j]).mean(axis=-1)
+
+
+# ---------------- LSH + CLUSTERS ----------------
+def _find(parent: np.ndarray, x: int) -> int:
+    root = x
+    while parent[root] != root:
+        root = parent[root]
+    while parent[x] != root:
+        parent[x], x = root, parent[x]
+    return root
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int, rows: int, seed: int = 2) -> np.ndarray:
+    """(k x 2) array of report pairs that share at least one LSH bucket.
+
+    Within a bucket each member is paired with the bucket's first member only, which keeps the
+    pair count linear in bucket size; union-find restores the transitive groups.
+    """
+    n = len(signatures)
+    mult = np.random.default_rng(seed).integers(1, 1 << 62, size=rows, dtype=np.uint64)
+    signatures = signatures.astype(np.uint64)
+    found = []
+    for band in range(bands):
+        part = signatures[:, band * rows:(band + 1) * rows]
+        keys = (part * mult).sum(axis=1)  # wraps mod 2**64, which is fine for bucketing
+        keys[(part == np.uint64(_EMPTY)).all(axis=1)] = 0  # reports without tokens never match
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        first_in_run = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        run_start = order[np.maximum.accumulate(np.where(first_in_run, np.arange(n), 0))]
+        mask = ~first_in_run & (sorted_keys != 0)
+        found.append(np.column_stack([run_start[mask], order[mask]]))
+    if not found:
+        return np.empty((0, 2), dtype=np.int64)
+    pairs = np.concatenate(found)
+    pairs.sort(axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def find_near_duplicates(df: pd.DataFrame, threshold: float = DEFAULT_THRESHOLD, num_perm: int = NUM_PERM,
+                         id_column: str = None, feature_columns=None, on_progress=None) -> dict:
+    """Clusters of reports whose estimated Jaccard similarity is at least `threshold`.
+
+    Returns {clusters: DataFrame(cluster, size, similarity, reports), pairs: DataFrame(a, b,
+    similarity), reports, bands, rows, seconds}.
+    """
+    started = time.perf_counter()
+    ids, tokens, offsets = report_tokens(df, id_column, feature_columns)
+    if on_progress is not None:
+        on_progress(0.2, f"{len(ids):,} reports tokenised")
+    signatures = minhash_signatures(tokens, offsets, num_perm)
+    if on_progress is not None:
+        on_progress(0.6, "signatures built")
+    bands, rows = lsh_params(threshold, num_perm)
+    pairs = candidate_pairs(signatures, bands, rows)
+    similarity = estimated_similarity(signatures, pairs[:, 0], pairs[:, 1]) if len(pairs) else np.empty(0)
+    keep = similarity >= threshold
+    pairs, similarity = pairs[keep], similarity[keep]
+
+    parent = np.arange(len(ids))
+    for i, j in pairs:
+        ri, rj = _find(parent, i), _find(parent, j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    roots = np.array([_find(parent, i) for i in range(len(ids))], dtype=np.int64)
+
+    in_pair = np.zeros(len(ids), dtype=bool)
+    in_pair[pairs.ravel()] = True
+    members = pd.DataFrame({"root": roots[in_pair], "report": ids[in_pair].astype(str)})
+    clusters = members.groupby("root")["report"].agg(["size", list]).rename(columns={"list": "reports"})
+    clusters["similarity"] = pd.Series(similarity).groupby(roots[pairs[:, 0]]).mean().round(3)
+    clusters = clusters.sort_values(["size", "similarity"], ascending=False)[["size", "similarity", "reports"]]
+    clusters.insert(0, "cluster", range(1, len(clusters) + 1))
+    clusters = clusters.reset_index(drop=True)
+    return {
+        "clusters": clusters,
+        "pairs": pd.DataFrame({"a": ids[pairs[:, 0]] if len(pairs) else [], "b": ids[pairs[:, 1]] if len(pairs) else [],
+                               "similarity": similarity}),
+        "reports": len(ids),
+        "bands": bands,
+        "rows": rows,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def near_duplicates_in_snapshot(source_hash: str, threshold: float = DEFAULT_THRESHOLD, on_progress=None) -> dict:
+    """find_near_duplicates() over a stored upload, reading only the columns it needs."""
+    import metadata_store
+
+    table = metadata_store.open_snapshot(source_hash)
+    wanted = set(REPORT_ID_COLUMNS) | set(FEATURE_COLUMNS)
+    columns = [c for c in table.column_names if normalize_column(c) in wanted]
+    return find_near_duplicates(table.select(columns).to_pandas(), threshold, on_progress=on_progress)
+
+
+# ---------------- BENCHMARK ----------------
+def synthetic_reports(n_reports: int, duplicate_share: float = 0.2, tokens_per_report: int = 40,
+                      vocabulary: int = 50_000, mutate: float = 0.05, seed: int = 0) -> pd.DataFrame:
+    """One row per (workbook, field): a share of workbooks are copies of others with a few fields changed."""
+    rng = np.random.default_rng(seed)
+    originals = int(n_reports * (1 - duplicate_share))
+    fields = rng.integers(0, vocabulary, size=(n_reports, tokens_per_report))
+    source = rng.integers(0, originals, size=n_reports - originals)
+    copies = fields[source].copy()
+    flip = rng.random(copies.shape) < mutate
+    copies[flip] = rng.integers(0, vocabulary, size=int(flip.sum()))
+    fields[originals:] = copies
+    df = pd.DataFrame({
+        "workbook_id": np.repeat([f"wb{i}" for i in range(n_reports)], tokens_per_report),
+        "field_name": [f"f{v}" for v in fields.ravel()],
+    })
+    df.attrs["planted"] = [(f"wb{originals + k}", f"wb{src}") for k, src in enumerate(source)]
+    return df
+
+
+def _benchmark(sizes, threshold: float):
+    """Time find_near_duplicates() and check how many planted copies land with their original."""
+    print(f"{'reports':>9} {'rows':>10} {'bands x rows':>13} {'pairs':>8} {'clusters':>9} {'recall':>7} {'seconds':>8}")
+    for n in sizes:
+        df = synthetic_reports(n)
+        result = find_near_duplicates(df, threshold)
+        cluster_of = {r: c for c, members in zip(result["clusters"]["cluster"], result["clusters"]["reports"]) for r in members}
+        planted = df.attrs["planted"]
+        recall = np.mean([cluster_of.get(a, -1) == cluster_of.get(b, -2) for a, b in planted]) if planted else 1.0
+        print(f"{n:>9,} {len(df):>10,} {result['bands']:>6} x {result['rows']:<4} {len(result['pairs']):>8,} "
+              f"{len(result['clusters']):>9,} {recall:>7.1%} {result['seconds']:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark MinHash/LSH near-duplicate detection on synthetic reports")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+    _benchmark(args.sizes, args.threshold)
@@ -0,0 +1,60 @@
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+
+from asset_cache import file_fingerprint
+
+# NOTE: files are published into ./static next to the main script, which Streamlit serves at
+# `app/static/...` when `server.enableStaticServing` is on (see .streamlit/config.toml).
+# Names carry a content hash, so a URL never changes meaning. Streamlit (1.66) sends no
+# Cache-Control for app/static, only ETag/Last-Modified: browsers revalidate (cheap 304s) or
+# cache heuristically. A proxy in front of Streamlit may add `immutable` for these URLs.
+
+# "static": images are published under app/static with content-hashed names so browsers
+#           cache them (needs server.enableStaticServing).
+# "inline": images are embedded as base64 data URIs on every rerun.
+# Stylesheets are always inlined (see css_bundle.py): app/static serves only images with
+# their real content type.
+ASSET_MODE = os.environ.get("BI4BI_ASSET_MODE", "static")
+
+STATIC_DIR = Path(__file__).parent / "static"
+STATIC_URL_PREFIX = "app/static"
+
+_published = {}  # file_fingerprint -> url
+_lock = threading.Lock()
+
+
+def _write_atomic(target: Path, data: bytes) -> None:
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}-{threading.get_ident()}.tmp")  # sessions render concurrently
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+
+
+def publish_bytes(data: bytes, name: str, subdir: str = "img") -> str:
+    """Publish `data` as `static/<subdir>/<stem>.<hash><suffix>` and return its URL."""
+    stem, suffix = os.path.splitext(name)
+    digest = hashlib.sha256(data).hexdigest()[:12]
+    target = STATIC_DIR / subdir / f"{stem}.{digest}{suffix}"
+    if not target.exists():
+        _write_atomic(target, data)
+        # Older hashed copies of the same asset are never referenced again
+        pattern = re.compile(re.escape(stem) + r"\.[0-9a-f]{12}" + re.escape(suffix) + "$")
+        for stale in target.parent.iterdir():
+            if stale != target and pattern.match(stale.name):
+                stale.unlink(missing_ok=True)
+    return f"{STATIC_URL_PREFIX}/{subdir}/{target.name}"
+
+
+def publish_static(path: Path, subdir: str = "img") -> str:
+    """Publish a file from disk, hashing it only once per (path, mtime, size)."""
+    key = file_fingerprint(path) + (subdir,)
+    with _lock:
+        url = _published.get(key)
+    if url is None:
+        url = publish_bytes(path.read_bytes(), path.name, subdir)
+        with _lock:
+            _published[key] = url
+    return url
@@ -1,8 +1,23 @@
 import os
+import secrets
 import streamlit as st
-import requests
 import pandas as pd
 from core.config import BACKEND_URL, CREDENTIALS_PATH
+from backend_client import render_health_panel
+from backend_upload import upload_many
+from connection_check import CHECK_CONCURRENCY, check_connection, check_many, parse_site_list
+from css_bundle import page_css_html
+from jobs import get_job, render_job_status, render_live, submit_job, track_job
+from lineage import depends_on, impacted, level_columns, lineage_for_snapshot, nodes_of_kind
+from metadata_diff import delta_csv, diff_summary
+from metadata_ingest import (STREAMING_THRESHOLD_BYTES, UPLOAD_TYPES, detached_copy, ingest_batch, ingest_upload,
+                             stats_frame)
+from metadata_preview import render_paginated_preview
+from metadata_schema import format_bytes
+from metadata_sql import available as sql_available, render_sql_panel
+from metadata_store import available as store_available, open_snapshot
+from similarity import DEFAULT_THRESHOLD, near_duplicates_in_snapshot
+from tableau_extractor import load_sync_state, site_label, sync_site, sync_state_path
 
 # NOTE: this module exposes a callable function `render_configure_page(selected_tool)`
 # so the configuration UI can be embedded in other pages without creating a new Streamlit page.
@@ -17,7 +32,7 @@ def _load_saved_credentials():
     site_name_saved = ''
     if os.path.exists(cred_path):
         try:
-            df = pd.read_csv(cred_path)
+            df = pd.read_csv(cred_path, dtype=str, keep_default_na=False)  # a blank site stays '', not NaN
             row = df.iloc[0]
             server_saved = row.get('server_saved')
             api_version_saved = row.get('api_version_saved') or api_version_saved
@@ -29,65 +44,219 @@ def _load_saved_credentials():
     return cred_path, server_saved, api_version_saved, token_name_saved, token_secret_saved, site_name_saved
 
 
+def _upload_owner() -> str:
+    """Whose uploads a re-upload is compared with: the signed-in user, else this browser session."""
+    try:
+        if st.user.is_logged_in:
+            return f"user:{st.user.email}"
+    except Exception:  # no st.user, or authentication not configured
+        pass
+    return st.session_state.setdefault('upload_owner', f"session:{secrets.token_hex(8)}")
+
+
+def _render_diff(diff: dict):
+    summary = diff_summary(diff)
+    if diff.get('by') == 'row':
+        matched = 'row by row (the keys repeat, so a changed row counts as deleted + added)'
+    else:
+        matched = f"on {', '.join(diff['keys'])}"
+    st.caption(f"Compared with your previous upload of the same site ({diff['previous_name']}) {matched}")
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric('Added', f"{summary['added']:,}")
+    c2.metric('Changed', f"{summary['changed']:,}")
+    c3.metric('Deleted', f"{summary['deleted']:,}")
+    c4.metric('Unchanged', f"{summary['unchanged']:,}")
+
+
+def _render_near_duplicates(digest: str):
+    """Threshold + button that runs near_duplicates_in_snapshot() as a job, then its clusters."""
+    threshold = st.slider('Similarity threshold', 0.5, 1.0, DEFAULT_THRESHOLD, 0.05, key='dup_threshold')
+    dup_jobs = st.session_state.setdefault('dup_jobs', {})
+    job = get_job(dup_jobs.get((digest, threshold)))
+    if job is None and st.button('Find near-duplicate reports', key='dup_run'):
+        job_id = submit_job('Find near-duplicate reports', near_duplicates_in_snapshot, digest, threshold,
+                            progress_kw='on_progress', lane='batch')
+        dup_jobs[(digest, threshold)] = job_id
+        track_job(job_id)
+        st.rerun()
+    if job is not None and job['status'] == 'done':
+        result = job['result']
+        st.caption(
+            f"{len(result['clusters']):,} clusters among {result['reports']:,} reports · "
+            f"LSH {result['bands']}×{result['rows']} · {result['seconds']:.2f}s"
+        )
+        st.dataframe(result['clusters'], use_container_width=True, hide_index=True)
+
+
+def _render_impact(upload: dict):
+    """Pick a data source/workbook/view and list what depends on it (lineage.py)."""
+    digest = upload['digest']
+    lineage_jobs = st.session_state.setdefault('lineage_jobs', {})
+    job = get_job(lineage_jobs.get(digest))
+    if job is None:
+        job_id = submit_job('Build lineage index', lineage_for_snapshot, digest, upload.get('diff'), lane='batch')
+        lineage_jobs[digest] = job_id
+        track_job(job_id)
+        return
+    if job['status'] in ('failed', 'cancelled'):
+        # Forget it so the next rerun builds the index again
+        del lineage_jobs[digest]
+        if job['status'] == 'failed':
+            st.error(f"Building the lineage index failed: {job['error']}")
+        else:
+            st.caption('Building the lineage index was cancelled; it restarts on the next rerun.')
+        return
+    if job['status'] != 'done':
+        st.caption('Building the lineage index…')
+        return
+    index = job['result']
+    st.caption(
+        f"{len(index['nodes']):,} objects · {len(index['src']):,} links · built in {index['build_seconds']:.2f}s "
+        f"({index['recomputed']:,} closures computed)"
+    )
+    kinds = [kind for kind, _ in level_columns(open_snapshot(digest).column_names)]
+    c1, c2 = st.columns([1, 2])
+    kind = c1.selectbox('Object type', kinds[:-1], key='impact_kind')
+    search = c2.text_input('Search', key='impact_search', placeholder='id or name contains…')
+    labels = [x for x in nodes_of_kind(index, kind) if search.lower() in x.lower()][:500]
+    label = st.selectbox('Object', labels, key='impact_label', format_func=lambda x: x.split(':', 1)[1])
+    if label:
+        downstream = impacted(index, label)
+        counts = pd.Series([x.split(':', 1)[0] for x in downstream], dtype='object').value_counts()
+        cols = st.columns(max(len(counts), 1))
+        for col, (k, n) in zip(cols, counts.items()):
+            col.metric(f'Impacted {k}s', f'{n:,}')
+        st.dataframe(pd.DataFrame([x.split(':', 1) for x in downstream], columns=['type', 'id']),
+                     use_container_width=True, hide_index=True)
+        upstream = depends_on(index, label)
+        if upstream:
+            st.caption('Depends on: ' + ', '.join(upstream[:20]) + (' …' if len(upstream) > 20 else ''))
+
+
+def _render_upload(upload: dict):
+    """Show the result of ingest_upload()/ingest_batch(): rows, memory report and a paginated preview."""
+    st.session_state['metadata_source'] = upload['digest']
+    st.success(f"Uploaded {upload['name']} — {upload['rows']} rows")
+    if upload.get('diff'):
+        _render_diff(upload['diff'])
+    if upload.get('files'):
+        st.caption(f"{upload['duplicates']} duplicate rows (identical in every column) removed while merging")
+        st.dataframe(pd.DataFrame(upload['files']), use_container_width=True, hide_index=True)
+    if upload['frame'] is not None:
+        df_upload = upload['frame']
+        report = df_upload.attrs.get('compaction')
+        if report:
+            st.caption(
+                f"Layout: {report['layout'] or 'unknown'} · memory "
+                f"{format_bytes(report['before_bytes'])} → {format_bytes(report['after_bytes'])}"
+            )
+        render_paginated_preview(df_upload, upload['digest'], key='upload_preview')
+    else:
+        result = upload['stream']
+        if result['spill_path']:
+            render_paginated_preview(open_snapshot(result['digest']), result['digest'], key='upload_preview')
+        else:
+            st.dataframe(result['preview'].head())
+        with st.expander('Column summary'):
+            st.dataframe(stats_frame(result))
+    if sql_available():
+        with st.expander('Query with SQL'):
+            render_sql_panel(upload['digest'], key='upload_sql')
+    if store_available() and upload['rows']:
+        with st.expander('Near-duplicate reports'):
+            _render_near_duplicates(upload['digest'])
+        if len(level_columns(open_snapshot(upload['digest']).column_names)) >= 2:
+            with st.expander('Impact analysis'):
+                _render_impact(upload)
+
+
+def _render_bulk_rows(job: dict, rows: list):
+    df = pd.DataFrame(rows, columns=['site', 'status', 'latency_ms', 'error'])
+    failed = int((df['status'] == 'failed').sum())
+    ok = int(df['status'].str.startswith('ok').sum())
+    st.caption(f"{ok} ok · {failed} failed · {len(df) - ok - failed} pending — {job['status']}")
+    st.dataframe(df, use_container_width=True, hide_index=True,
+                 column_config={'latency_ms': st.column_config.NumberColumn('latency (ms)')})
+
+
+def _render_bulk_test(adapter_key: str, defaults: dict, force_refresh: bool):
+    """Test a pasted/uploaded list of sites concurrently, results filling a live table."""
+    st.caption(
+        'One site per line: server, site_name[, api_version, token_name, token_secret]. '
+        'A header row is optional; missing token fields use the values in the form above.'
+    )
+    pasted = st.text_area('Sites', key='bulk_sites_text', height=120, label_visibility='collapsed',
+                          placeholder='server,site_name\nhttps://tableau.example.com,Finance')
+    site_file = st.file_uploader('…or upload a CSV', type=['csv', 'txt'], key='bulk_sites_file')
+    concurrency = st.slider('Parallel checks', 1, 32, CHECK_CONCURRENCY, key='bulk_concurrency')
+    if st.button('Test all sites', key='bulk_test_btn'):
+        text = site_file.getvalue().decode('utf-8-sig') if site_file is not None else pasted
+        try:
+            configs = parse_site_list(text, defaults)
+        except Exception as e:
+            configs = []
+            st.error(f'Could not read the site list: {e}')
+        if configs:
+            rows = []
+            job_id = submit_job(f'Test {len(configs)} sites', check_many, adapter_key, configs, rows,
+                                concurrency=concurrency, force_refresh=force_refresh,
+                                progress_kw='on_progress', cancel_kw='cancel', lane='batch')
+            st.session_state['bulk_check'] = {'job': job_id, 'rows': rows}
+            track_job(job_id)
+        elif text.strip():
+            st.warning('No sites with a server found in the list.')
+    bulk = st.session_state.get('bulk_check')
+    if bulk is not None:
+        render_live(bulk['job'], lambda job: _render_bulk_rows(job, bulk['rows']))
+
+
+def _render_extract(cred_path, server, api_version, token_name, token_secret, site_name):
+    """Pull the site's metadata over the REST API (tableau_extractor.py) and browse the result."""
+    if not (server and token_name and token_secret):
+        st.caption('Fill in and save Server, Token name and Token secret above first.')
+        return
+    label = site_label(server, site_name)
+    state_path = sync_state_path(cred_path)
+    synced = load_sync_state(state_path).get(label)
+    if synced:
+        last = max(r['synced_at'] for r in synced.values())
+        st.caption(f'Workbooks, views (with usage), data sources and users of {label} · last synced {last}; '
+                   'only changes since then are fetched.')
+    else:
+        st.caption(f'Workbooks, views (with usage), data sources and users of {label} · first sync extracts everything.')
+    full = st.checkbox('Full re-extract', key='extract_full', disabled=not synced)
+    if st.button('Sync now', key='extract_btn'):
+        job_id = submit_job(f'Sync {label}', sync_site, server, site_name, token_name, token_secret,
+                            api_version, state_path=state_path, full=full,
+                            progress_kw='on_progress', cancel_kw='cancel', lane='batch')
+        st.session_state['extract_job'] = job_id
+        track_job(job_id)
+    job = get_job(st.session_state.get('extract_job'))
+    if job is None or job['status'] != 'done':
+        return
+    result = job['result']
+    st.caption(
+        f"{result['site']} · {result['seconds']:.1f}s · {result['requests']:,} requests"
+        + (f" · {result['throttled']} rate-limited" if result['throttled'] else '')
+    )
+    summary = pd.DataFrame([dict(resource=k, rows=v['rows'], mode=v['mode'], changed=v.get('changed'),
+                                 added=v.get('added'), deleted=v.get('deleted'))
+                            for k, v in result['resources'].items()])
+    summary[['changed', 'added', 'deleted']] = summary[['changed', 'added', 'deleted']].astype('Int64')
+    st.dataframe(summary, use_container_width=True, hide_index=True)
+    resource = st.selectbox('Browse', list(result['resources']), key='extract_resource')
+    digest = result['resources'][resource]['digest']
+    st.session_state['metadata_source'] = digest
+    render_paginated_preview(open_snapshot(digest), digest, key='extract_preview')
+    if sql_available():
+        render_sql_panel(digest, key='extract_sql')
+
+
 def render_configure_page(selected_tool: str = 'Tableau'):
     """Render the configure UI for the given tool inside the current Streamlit page."""
 
     cred_path, server_saved, api_version_saved, token_name_saved, token_secret_saved, site_name_saved = _load_saved_credentials()
 
-    # ---------- Page styling ----------
-    st.markdown("""<style>
-        html, body, .stApp {
-            margin: 0 !important;
-            padding: 0 !important;
-            height: 100vh !important;
-            overflow: hidden !important;
-        }
-        /* Center the header */
-        h2 {
-            text-align: center !important;
-        }
-        /* Style the Save button yellow */
-        div[data-testid="stForm"] button[kind="secondaryFormSubmit"]:first-of-type,
-        div[data-testid="stForm"] button[type="submit"]:first-of-type {
-            background-color: #FFD100 !important;
-            color: #000 !important;
-            border: none !important;
-            font-weight: 700 !important;
-            border-radius: 8px !important;
-            width: 100% !important;
-        }
-        div[data-testid="stForm"] button[kind="secondaryFormSubmit"]:first-of-type:hover,
-        div[data-testid="stForm"] button[type="submit"]:first-of-type:hover {
-            background-color: #FFC000 !important;
-        }
-        /* Fixed back button — top left corner */
-        .fixed-back-btn {
-            position: fixed;
-            top: 18px;
-            left: 24px;
-            z-index: 99999;
-        }
-        .fixed-back-btn a {
-            display: inline-block;
-            background:  #ffd54f;
-            color: #222;
-            font-weight: 600;
-            font-size: 0.85rem;
-            font-family: Arial, sans-serif;
-            padding: 0.35rem 1rem;
-            border: 1px solid #ccc;
-            border-radius: 8px;
-            text-decoration: none;
-            transition: background 0.15s ease;
-        }
-        .fixed-back-btn a:hover {
-           transform: translateY(-2px) !important;
-            box-shadow: 0 8px 24px rgba(255,140,0,0.32) !important;
-        }
-    </style>
-
-    """, unsafe_allow_html=True)
-
     # ---------- Header ----------
     st.markdown(f"<h2 style='text-align:center; margin-bottom:0;'>Configure {selected_tool}</h2>", unsafe_allow_html=True)
     st.markdown(
@@ -103,13 +272,15 @@ def render_configure_page(selected_tool: str = 'Tableau'):
         token_name = st.text_input('Token name', value=token_name_saved)
         token_secret = st.text_input('Token secret', value=token_secret_saved)
         site_name = st.text_input('Site name', value=site_name_saved)
+        force_refresh = st.checkbox('Re-test even if recently checked', key='test_force_refresh',
+                                    help='Connection results are reused for a few minutes (failures for less).')
 
         # Save and Test Connection buttons side by side
         btn_col1, btn_col2 = st.columns(2)
         with btn_col1:
-            submit = st.form_submit_button('Test Connection', use_container_width=True)
+            submit = st.form_submit_button('Save', use_container_width=True)
         with btn_col2:
-            test_conn = st.form_submit_button('Save', use_container_width=True)
+            test_conn = st.form_submit_button('Test Connection', use_container_width=True)
 
     # ---------- Handle Save ----------
     if submit:
@@ -140,93 +311,118 @@ def render_configure_page(selected_tool: str = 'Tableau'):
     # ---------- Handle Test Connection ----------
     if test_conn:
         if server and token_name and token_secret:
-            with st.spinner('Testing connection...'):
-                try:
-                    config = {
-                        'tableau_prod': {
-                            'server': server,
-                            'api_version': api_version,
-                            'personal_access_token_name': token_name,
-                            'personal_access_token_secret': token_secret,
-                            'site_name': site_name,
-                        }
-                    }
-                    adapter_key = selected_tool.lower() if selected_tool else 'tableau'
-                    r = requests.post(
-                        f'{BACKEND_URL}/reports/test-connection',
-                        json={'adapter': adapter_key, 'config': config},
-                        timeout=30,
-                    )
-                    r.raise_for_status()
-                    st.success('Connection successful!')
-                except Exception as e:
-                    st.error(f'Connection failed: {e}')
+            config = {
+                'tableau_prod': {
+                    'server': server,
+                    'api_version': api_version,
+                    'personal_access_token_name': token_name,
+                    'personal_access_token_secret': token_secret,
+                    'site_name': site_name,
+                }
+            }
+            adapter_key = selected_tool.lower() if selected_tool else 'tableau'
+            track_job(submit_job('Test connection', check_connection, adapter_key, config,
+                                 force_refresh=force_refresh, progress_kw='on_progress', cancel_kw='cancel'))
         else:
             st.warning('Please fill in Server, Token name, and Token secret to test the connection.')
 
+    # ---------- Test many sites ----------
+    with st.expander('Test many sites at once'):
+        defaults = {
+            'api_version': api_version,
+            'personal_access_token_name': token_name,
+            'personal_access_token_secret': token_secret,
+        }
+        _render_bulk_test(selected_tool.lower() if selected_tool else 'tableau',
+                          {k: v for k, v in defaults.items() if v}, force_refresh)
+
+    # ---------- Extract metadata over the REST API ----------
+    with st.expander('Extract metadata from Tableau'):
+        _render_extract(cred_path, server, api_version, token_name, token_secret, site_name)
+
     # ---------- Upload metadata file ----------
-    # ---------- Upload metadata file ----------
-# (1) Optional: show a clearer section title (keeps your current phrasing)
-st.markdown(
-    "<div style='margin-top:6px; font-weight:600; color:#1a1a1a;'>Upload metadata file</div>",
-    unsafe_allow_html=True
-)
-
-# (2) Keep Streamlit's uploader (drag & drop + open dialog), just hide the label for cleaner UI
-uploaded_file = st.file_uploader(
-    "Upload metadata file",
-    type=["csv"],
-    key="metadata_csv",
-    label_visibility="collapsed"
-)
-
-# (3) CSS override: rename the built-in 'Browse files' button text to 'Upload file'
-st.markdown("""
-<style>
-/* Scope to this uploader only (by its key) */
-div[data-testid="stFileUploader"] div:has(input#metadata_csv) 
-  [data-testid="stFileUploadDropzone"] [data-testid="stBaseButton-secondary"] > div {
-    /* Hide the original 'Browse files' text node */
-    color: transparent !important;
-}
-
-/* Inject our replacement text */
-div[data-testid="stFileUploader"] div:has(input#metadata_csv) 
-  [data-testid="stFileUploadDropzone"] [data-testid="stBaseButton-secondary"] > div::after {
-    content: "Upload file";
-    color: #1a1a1a;                 /* text color */
-    font-weight: 600;
-    letter-spacing: .2px;
-}
-
-/* Optional: button styling to match your yellow theme (comment out if not needed) */
-div[data-testid="stFileUploader"] div:has(input#metadata_csv)
-  [data-testid="stFileUploadDropzone"] [data-testid="stBaseButton-secondary"] {
-    background: white !important;   /* keep white to contrast yellow band */
-    border: 1px solid #e6e6e6 !important;
-    border-radius: 8px !important;
-}
-div[data-testid="stFileUploader"] div:has(input#metadata_csv)
-  [data-testid="stFileUploadDropzone"] {
-    border-radius: 10px !important;
-}
-</style>
-""", unsafe_allow_html=True)
-
-# (4) Your original CSV handling remains unchanged
-if uploaded_file is not None:
-    try:
-        df_upload = pd.read_csv(uploaded_file)
-        st.success(f"Uploaded {uploaded_file.name} — {len(df_upload)} rows")
-        st.dataframe(df_upload.head())
-    except Exception as e:
-        st.error(f"Failed to read CSV: {e}")
+    # (1) Optional: show a clearer section title (keeps your current phrasing)
+    st.markdown(
+        "<div style='margin-top:6px; font-weight:600; color:#1a1a1a;'>Upload metadata file</div>",
+        unsafe_allow_html=True
+    )
+
+    # (2) Keep Streamlit's uploader (drag & drop + open dialog), just hide the label for cleaner UI.
+    #     Batch mode takes many per-site / per-project exports and merges them.
+    batch_mode = st.checkbox("Batch mode (several files, merged)", key="metadata_batch_mode")
+    if batch_mode:
+        uploaded_files = st.file_uploader(
+            "Upload metadata files",
+            type=UPLOAD_TYPES,
+            key="metadata_csv_batch",
+            accept_multiple_files=True,
+            label_visibility="collapsed"
+        )
+        uploaded_file = None
+    else:
+        uploaded_file = st.file_uploader(
+            "Upload metadata file",
+            type=UPLOAD_TYPES,
+            key="metadata_csv",
+            label_visibility="collapsed"
+        )
+        uploaded_files = []
+
+    # (3) Parsed in a background job (see jobs.py), once per file content (see metadata_ingest.py).
+    #     Batch uploads are parsed in parallel worker processes, then merged and de-duplicated.
+    #     Large files are streamed in chunks: only aggregates + a preview stay in memory.
+    #     Either way a columnar copy lands in metadata_store; `metadata_source` is its key.
+    ingest_job = None
+    if uploaded_file is not None:
+        upload_id = getattr(uploaded_file, 'file_id', None) or uploaded_file.name
+        ingest_jobs = st.session_state.setdefault('ingest_jobs', {})
+        ingest_job = get_job(ingest_jobs.get(upload_id))
+        if ingest_job is None:
+            large = uploaded_file.size > STREAMING_THRESHOLD_BYTES
+            job_id = submit_job(f'Read {uploaded_file.name}', ingest_upload, detached_copy(uploaded_file),
+                                owner=_upload_owner(), progress_kw='on_progress',
+                                lane='batch' if large else 'interactive')
+            ingest_jobs[upload_id] = job_id
+            track_job(job_id)
+            ingest_job = get_job(job_id)
+    elif uploaded_files:
+        upload_id = '|'.join(sorted(getattr(f, 'file_id', None) or f.name for f in uploaded_files))
+        ingest_jobs = st.session_state.setdefault('ingest_jobs', {})
+        ingest_job = get_job(ingest_jobs.get(upload_id))
+        if ingest_job is None:
+            job_id = submit_job(f'Read {len(uploaded_files)} files', ingest_batch,
+                                [detached_copy(f) for f in uploaded_files], owner=_upload_owner(),
+                                progress_kw='on_progress', lane='batch')
+            ingest_jobs[upload_id] = job_id
+            track_job(job_id)
+            ingest_job = get_job(job_id)
+
+    # ---------- Background jobs ----------
+    render_job_status()
+    with st.expander('Backend health'):
+        render_health_panel()
+
+    if ingest_job is not None and ingest_job['status'] == 'done':
+        _render_upload(ingest_job['result'])
 
+        # (4) Hand the file(s) to the backend: chunked, compressed, resumable. For a re-upload
+        #     only the added/changed/deleted rows are sent by default.
+        diff = ingest_job['result'].get('diff')
+        changes_only = diff is not None and st.checkbox('Send only the changes', value=True, key='upload_changes_only')
+        if st.button('Upload to backend', key='upload_metadata_btn'):
+            if changes_only:
+                files = [delta_csv(diff, ingest_job['result']['name'])]
+            else:
+                files = [detached_copy(f) for f in ([uploaded_file] if uploaded_file is not None else uploaded_files)]
+            track_job(submit_job(f'Upload {len(files)} file(s) to backend', upload_many,
+                                 files, BACKEND_URL, progress_kw='on_progress', lane='batch'))
+            st.rerun()
 
 
 if __name__ == '__main__':
     # Allow running this file directly for quick debugging
     st.set_page_config(page_title='bi4bi - Configure (debug)', layout='centered')
+    st.markdown(page_css_html('configure'), unsafe_allow_html=True)  # My_First_Page.py emits it otherwise
     render_configure_page('Tableau')
 
 
@@ -0,0 +1,544 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import metadata_store
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = pc = None
+
+# NOTE: pulls a site's metadata straight from the Tableau REST API instead of a hand-made
+# CSV export. It signs in once with the personal access token, reads the first page of every
+# resource (workbooks, views with usage, data sources, users) to learn how many pages there
+# are, then fetches the rest on a pool of EXTRACT_CONCURRENCY threads — that pool size is the
+# bound on requests in flight. A 429 pauses every worker until its Retry-After has passed.
+# Pages are converted to Arrow on the worker and appended to the resource's metadata_store
+# snapshot as they arrive, so memory holds a few pages, not the site. The snapshot key is a
+# hash of the pages' contents in page order: re-extracting an unchanged site gives the same
+# snapshot. mock_tableau_server.py stands in for a real server; `python tableau_extractor.py`
+# benchmarks against it.
+# sync_site() keeps a per-site updatedAt watermark (SYNC_STATE_FILE, next to the saved
+# credentials). Later syncs only fetch objects updated since then (`filter=updatedAt:gte:`),
+# plus an id-only listing (`fields=`) to notice deletions and refresh view usage counts,
+# which change without updatedAt moving. Both are merged into the previous snapshot.
+
+DEFAULT_API_VERSION = "3.17"
+EXTRACT_CONCURRENCY = int(os.environ.get("BI4BI_TABLEAU_CONCURRENCY", 8))
+EXTRACT_PAGE_SIZE = int(os.environ.get("BI4BI_TABLEAU_PAGE_SIZE", 1000))
+MAX_PAGE_SIZE = 1000  # the API's maximum, used for the (tiny) id listings of a sync
+EXTRACT_TIMEOUT = (5, 60)  # (connect, read) seconds
+EXTRACT_MAX_RETRIES = 5  # per page, for 429s
+POLL_SECONDS = 0.2
+SYNC_STATE_FILE = "tableau_sync_state.json"
+
+# resource -> (extra query parameters, output column -> (path into the JSON object, type))
+RESOURCES = {
+    "workbooks": ({}, {
+        "workbook_id": (("id",), "string"),
+        "workbook_name": (("name",), "string"),
+        "project_id": (("project", "id"), "string"),
+        "project_name": (("project", "name"), "string"),
+        "owner_id": (("owner", "id"), "string"),
+        "content_url": (("contentUrl",), "string"),
+        "size": (("size",), "int"),
+        "tags": (("tags", "tag"), "tags"),
+        "created_at": (("createdAt",), "timestamp"),
+        "updated_at": (("updatedAt",), "timestamp"),
+    }),
+    "views": ({"includeUsageStatistics": "true"}, {
+        "view_id": (("id",), "string"),
+        "view_name": (("name",), "string"),
+        "workbook_id": (("workbook", "id"), "string"),
+        "project_id": (("project", "id"), "string"),
+        "owner_id": (("owner", "id"), "string"),
+        "content_url": (("contentUrl",), "string"),
+        "view_count": (("usage", "totalViewCount"), "int"),
+        "created_at": (("createdAt",), "timestamp"),
+        "updated_at": (("updatedAt",), "timestamp"),
+    }),
+    "datasources": ({}, {
+        "datasource_id": (("id",), "string"),
+        "datasource_name": (("name",), "string"),
+        "datasource_type": (("type",), "string"),
+        "project_id": (("project", "id"), "string"),
+        "project_name": (("project", "name"), "string"),
+        "owner_id": (("owner", "id"), "string"),
+        "content_url": (("contentUrl",), "string"),
+        "created_at": (("createdAt",), "timestamp"),
+        "updated_at": (("updatedAt",), "timestamp"),
+    }),
+    "users": ({}, {
+        "user_id": (("id",), "string"),
+        "user_name": (("name",), "string"),
+        "full_name": (("fullName",), "string"),
+        "site_role": (("siteRole",), "string"),
+        "auth_setting": (("authSetting",), "string"),
+        "last_login": (("lastLogin",), "timestamp"),
+    }),
+}
+
+
+# Columns an incremental sync refreshes for every object from the id listing
+REFRESHED_COLUMNS = {"views": ("view_count",)}
+
+_state_lock = threading.Lock()
+
+
+class TableauError(RuntimeError):
+    pass
+
+
+class ExtractionCancelled(RuntimeError):
+    pass
+
+
+# ---------------- SESSION ----------------
+def api_base(server: str, api_version: str = DEFAULT_API_VERSION) -> str:
+    server = server.strip().rstrip("/")
+    return f"{server if '://' in server else 'https://' + server}/api/{api_version or DEFAULT_API_VERSION}"
+
+
+def _error_text(r: requests.Response) -> str:
+    try:
+        error = r.json()["error"]
+        return f"HTTP {r.status_code} {error.get('summary', '')}: {error.get('detail', '')}".strip(": ")
+    except (ValueError, KeyError, TypeError):
+        return f"HTTP {r.status_code} {r.reason}"
+
+
+def _session(concurrency: int) -> requests.Session:
+    """Pooled session for one extraction; 429 is left to the shared pause in _get()."""
+    session = requests.Session()
+    retry = Retry(total=3, connect=3, read=0, status=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                  allowed_methods={"GET"}, raise_on_status=False,
+                  respect_retry_after_header=False)  # else urllib3 sleeps on 429s per worker, unseen
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency), max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"Accept": "application/json", "Accept-Encoding": "gzip, deflate",
+                            "User-Agent": "bi4bi-extractor"})
+    return session
+
+
+def sign_in(session: requests.Session, server: str, site_name: str, token_name: str, token_secret: str,
+            api_version: str = DEFAULT_API_VERSION) -> dict:
+    """Sign in with a personal access token. Returns the extraction context (base URL, site id, counters)."""
+    base = api_base(server, api_version)
+    payload = {"credentials": {"personalAccessTokenName": token_name, "personalAccessTokenSecret": token_secret,
+                               "site": {"contentUrl": site_name or ""}}}
+    try:
+        r = session.post(f"{base}/auth/signin", json=payload, timeout=EXTRACT_TIMEOUT)
+    except requests.RequestException as e:
+        raise TableauError(f"Sign-in to {server} failed: {e}") from e
+    if r.status_code != 200:
+        raise TableauError(f"Sign-in to {server} failed: {_error_text(r)}")
+    credentials = r.json()["credentials"]
+    session.headers["X-Tableau-Auth"] = credentials["token"]
+    return {
+        "session": session,
+        "base": base,
+        "site_id": credentials["site"]["id"],
+        "site_name": site_name or "",
+        "not_before": 0.0,  # monotonic time before which nobody sends (set by a 429)
+        "requests": 1,
+        "throttled": 0,
+        "lock": threading.Lock(),
+        "cancel": threading.Event(),  # the caller's (extract_site replaces it)
+        "stop": threading.Event(),  # set when the extraction ends, for workers still waiting
+    }
+
+
+def sign_out(ctx: dict) -> None:
+    try:
+        ctx["session"].post(f"{ctx['base']}/auth/signout", timeout=EXTRACT_TIMEOUT)
+    except requests.RequestException:
+        pass  # the token expires on its own
+
+
+# ---------------- PAGES ----------------
+def _retry_after(value, attempt: int) -> float:
+    """Seconds to wait from a Retry-After header (seconds or HTTP date), else backoff."""
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    return min(2.0 ** attempt, 30.0)
+
+
+def _wait_turn(ctx: dict) -> None:
+    while True:
+        if ctx["cancel"].is_set() or ctx["stop"].is_set():
+            raise ExtractionCancelled("Extraction cancelled")
+        delay = ctx["not_before"] - time.monotonic()
+        if delay <= 0:
+            return
+        ctx["stop"].wait(min(delay, POLL_SECONDS))
+
+
+def _get(ctx: dict, path: str, params: dict) -> dict:
+    """GET {site}/{path}, waiting out 429s (for every worker) up to EXTRACT_MAX_RETRIES times."""
+    url = f"{ctx['base']}/sites/{ctx['site_id']}/{path}"
+    for attempt in range(EXTRACT_MAX_RETRIES + 1):
+        _wait_turn(ctx)
+        try:
+            r = ctx["session"].get(url, params=params, timeout=EXTRACT_TIMEOUT)
+        except requests.RequestException as e:
+            raise TableauError(f"GET {path} failed: {e}") from e
+        with ctx["lock"]:
+            ctx["requests"] += 1
+            if r.status_code == 429:
+                ctx["throttled"] += 1
+                ctx["not_before"] = max(ctx["not_before"], time.monotonic() + _retry_after(r.headers.get("Retry-After"), attempt))
+        if r.status_code == 429:
+            continue
+        if r.status_code != 200:
+            raise TableauError(f"GET {path} failed: {_error_text(r)}")
+        return r.json()
+    raise TableauError(f"GET {path} still rate limited after {EXTRACT_MAX_RETRIES} retries")
+
+
+def _dig(item: dict, path):
+    for key in path:
+        item = item.get(key) if isinstance(item, dict) else None
+    return item
+
+
+def _schema(columns: dict):
+    types = {"string": pa.string(), "tags": pa.string(), "int": pa.int64(), "timestamp": pa.timestamp("ns", tz="UTC")}
+    return pa.schema([pa.field("site_name", pa.string())] + [pa.field(c, types[kind]) for c, (_, kind) in columns.items()])
+
+
+def page_frame(items: list, columns: dict, site_name: str) -> pd.DataFrame:
+    """One page of REST API objects as a typed frame with the RESOURCES columns."""
+    data = {"site_name": pd.Series([site_name] * len(items), dtype="string")}
+    for column, (path, kind) in columns.items():
+        values = [_dig(item, path) for item in items]
+        if kind == "tags":
+            values = [", ".join(t["label"] for t in v) if v else None for v in values]
+        if kind == "int":
+            data[column] = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").astype("Int64")
+        elif kind == "timestamp":
+            data[column] = pd.to_datetime(pd.Series(values, dtype=object), errors="coerce", utc=True)
+        else:
+            data[column] = pd.Series(values, dtype="string")
+    return pd.DataFrame(data)
+
+
+def _fetch_page(ctx: dict, resource: str, page: int, page_size: int, params: dict, columns: dict):
+    """(Arrow table, totalAvailable, content hash) of one page of a `resource` listing."""
+    body = _get(ctx, resource, dict(params, pageSize=page_size, pageNumber=page))
+    items = (body.get(resource) or {}).get(resource[:-1]) or []
+    total = int(body.get("pagination", {}).get("totalAvailable", len(items)))
+    page_hash = hashlib.sha256(json.dumps(items, sort_keys=True).encode("utf-8")).hexdigest()
+    table = pa.Table.from_pandas(page_frame(items, columns, ctx["site_name"]), schema=_schema(columns),
+                                 preserve_index=False)
+    return table, total, page_hash
+
+
+def _crawl(ctx: dict, listings: dict, concurrency: int, on_page, on_progress=None) -> None:
+    """Fetch every page of `listings` ({key: (resource, params, columns, page_size)}) on a bounded pool.
+
+    Page 1 of each listing goes first and tells how many more there are. `on_page(key, page,
+    table, page_hash)` runs on the calling thread as pages arrive, in any order.
+    """
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="bi4bi-extract")
+    pending = {}
+    total_pages = dict.fromkeys(listings, 1)
+    pages_done = rows = 0
+
+    def submit(key, page):
+        resource, params, columns, page_size = listings[key]
+        pending[pool.submit(_fetch_page, ctx, resource, page, page_size, params, columns)] = (key, page)
+
+    try:
+        for key in listings:
+            submit(key, 1)
+        while pending:
+            done, _ = wait(pending, timeout=POLL_SECONDS, return_when=FIRST_COMPLETED)
+            if ctx["cancel"].is_set():
+                raise ExtractionCancelled("Extraction cancelled")
+            for future in done:
+                key, page = pending.pop(future)
+                table, total, page_hash = future.result()
+                if page == 1:
+                    total_pages[key] = max(1, math.ceil(total / listings[key][3]))
+                    for later in range(2, total_pages[key] + 1):
+                        submit(key, later)
+                on_page(key, page, table, page_hash)
+                pages_done += 1
+                rows += table.num_rows
+            if on_progress is not None:
+                known = sum(total_pages.values())
+                on_progress(pages_done / known, f"{pages_done}/{known} pages · {rows:,} rows")
+    except BaseException:
+        ctx["stop"].set()  # queued pages and workers waiting out a 429 give up
+        raise
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# ---------------- SYNC STATE ----------------
+def site_label(server: str, site_name: str) -> str:
+    return f"{api_base(server).split('://', 1)[1].split('/', 1)[0]}/{site_name or 'Default'}"
+
+
+def sync_state_path(credentials_path) -> Path:
+    """The watermark file, kept next to the saved credentials."""
+    return Path(os.path.abspath(credentials_path)).with_name(SYNC_STATE_FILE)
+
+
+def load_sync_state(path) -> dict:
+    """{site label: {resource: {digest, watermark, synced_at}}}; empty if missing or unreadable."""
+    try:
+        return json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_site_state(path, label: str, site_state: dict) -> None:
+    path = Path(path)
+    with _state_lock:
+        state = load_sync_state(path)
+        state[label] = site_state
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+        os.replace(tmp, path)
+
+
+def _max_updated(table, watermark: str = None):
+    """Latest of `watermark` and the table's updated_at, as the API's filter format."""
+    if "updated_at" not in table.column_names or table.num_rows == 0:
+        return watermark
+    latest = pc.max(table["updated_at"])
+    if not latest.is_valid:
+        return watermark
+    stamp = datetime.fromtimestamp(latest.value / 1e9, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    return max(stamp, watermark) if watermark else stamp
+
+
+# ---------------- EXTRACT ----------------
+def _id_listing(resource: str):
+    """(params, columns) of the light listing an incremental sync uses to spot deletions:
+    ids only, plus the REFRESHED_COLUMNS that change without touching updatedAt."""
+    params, columns = RESOURCES[resource]
+    light = {c: columns[c] for c in [next(iter(columns)), *REFRESHED_COLUMNS.get(resource, ())]}
+    return dict(params, fields=",".join(".".join(path) for path, _ in light.values())), light
+
+
+def _open_spill(resource: str) -> dict:
+    metadata_store.STORE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = metadata_store.STORE_DIR / f".extract-{resource}-{os.getpid()}-{threading.get_ident()}.tmp"
+    schema = _schema(RESOURCES[resource][1])
+    sink = pa.OSFile(str(tmp), "wb")
+    return {"tmp": tmp, "sink": sink, "writer": pa.ipc.new_file(sink, schema), "schema": schema,
+            "rows": 0, "pages": {}, "watermark": None}
+
+
+def _close_spill(spill: dict) -> None:
+    if spill["writer"] is not None:
+        spill["writer"].close()
+        spill["sink"].close()
+        spill["writer"] = None
+
+
+def _table_digest(table, label: str, resource: str) -> str:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    h = hashlib.sha256(f"tableau|{label}|{resource}|".encode("utf-8"))
+    h.update(sink.getvalue())
+    return h.hexdigest()
+
+
+def _merge(resource: str, label: str, previous_state: dict, changed_pages: list, id_pages: list) -> dict:
+    """Previous snapshot + objects updated since the watermark - objects no longer listed."""
+    columns = RESOURCES[resource][1]
+    id_col = next(iter(columns))
+    schema = _schema(columns)
+    previous = metadata_store.open_snapshot(previous_state["digest"])
+    changed = pa.concat_tables(changed_pages) if changed_pages else schema.empty_table()
+    ids = changed[id_col].to_pylist()
+    last = {v: i for i, v in enumerate(ids)}  # an object can show up twice if pages shifted meanwhile
+    if len(last) < len(ids):
+        changed = changed.take(pa.array(sorted(last.values())))
+    live = pa.concat_tables(id_pages) if id_pages else _schema(_id_listing(resource)[1]).empty_table()
+    live_ids = live[id_col].combine_chunks()
+    changed_ids = changed[id_col].combine_chunks()
+
+    listed = pc.is_in(previous[id_col], value_set=live_ids)
+    kept = previous.filter(pc.and_(listed, pc.invert(pc.is_in(previous[id_col], value_set=changed_ids))))
+    for column in REFRESHED_COLUMNS.get(resource, ()):
+        positions = pc.index_in(kept[id_col], value_set=live_ids)
+        kept = kept.set_column(kept.schema.get_field_index(column), column, pc.take(live[column], positions))
+    merged = pa.concat_tables([kept, changed.select(kept.column_names).cast(kept.schema)]).sort_by(id_col)
+
+    digest = _table_digest(merged, label, resource)
+    if metadata_store.get_entry(digest) is None:
+        metadata_store.write_table(merged, digest, f"Tableau {label} · {resource}")
+    is_new = pc.invert(pc.is_in(changed_ids, value_set=previous[id_col].combine_chunks()))
+    # `gte` re-fetches the objects stamped exactly at the watermark; those are not news
+    since = pa.scalar(datetime.strptime(previous_state["watermark"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc),
+                      type=changed.schema.field("updated_at").type)
+    newer = pc.fill_null(pc.greater(changed["updated_at"].combine_chunks(), since), False)
+    added = int(pc.sum(is_new).as_py() or 0)
+    return {
+        "digest": digest,
+        "rows": merged.num_rows,
+        "mode": "incremental",
+        "changed": int(pc.sum(pc.and_(newer, pc.invert(is_new))).as_py() or 0),
+        "added": added,
+        "deleted": previous.num_rows - int(pc.sum(listed).as_py() or 0),
+        "watermark": _max_updated(changed, previous_state["watermark"]),
+    }
+
+
+def _incremental(resource: str, previous_state: dict, full: bool) -> bool:
+    return (not full and previous_state is not None and bool(previous_state.get("watermark"))
+            and "updated_at" in RESOURCES[resource][1] and metadata_store.get_entry(previous_state["digest"]) is not None)
+
+
+def sync_site(server: str, site_name: str, token_name: str, token_secret: str,
+              api_version: str = DEFAULT_API_VERSION, state_path=None, full: bool = False, resources=None,
+              concurrency: int = EXTRACT_CONCURRENCY, page_size: int = EXTRACT_PAGE_SIZE,
+              on_progress=None, cancel: threading.Event = None) -> dict:
+    """Bring the metadata_store snapshots of one site up to date.
+
+    A resource with a watermark in `state_path` (and its snapshot still stored) is synced
+    incrementally: objects with updatedAt >= watermark are fetched with a server-side filter
+    and merged into the previous snapshot, and a light id listing drops deleted objects. Other
+    resources, or all with `full=True`, are extracted in full. The new watermarks are saved to
+    `state_path` afterwards. Returns {site, resources: {name: {digest, rows, mode, ...}},
+    requests, throttled, seconds}. Raises TableauError or ExtractionCancelled.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to extract metadata")
+    resources = list(resources or RESOURCES)
+    label = site_label(server, site_name)
+    site_state = load_sync_state(state_path).get(label, {}) if state_path else {}
+    started = time.perf_counter()
+    session = _session(concurrency)
+    ctx = sign_in(session, server, site_name, token_name, token_secret, api_version)
+    if cancel is not None:
+        ctx["cancel"] = cancel
+
+    listings = {}
+    for resource in resources:
+        params, columns = RESOURCES[resource]
+        if _incremental(resource, site_state.get(resource), full):
+            since = site_state[resource]["watermark"]
+            listings[(resource, "changed")] = (resource, dict(params, filter=f"updatedAt:gte:{since}"), columns, page_size)
+            listings[(resource, "ids")] = (resource, *_id_listing(resource), MAX_PAGE_SIZE)
+        else:
+            listings[(resource, "full")] = (resource, params, columns, page_size)
+    spills = {resource: _open_spill(resource) for resource, kind in listings if kind == "full"}
+    collected = {key: [] for key in listings if key[1] != "full"}
+
+    def on_page(key, page, table, page_hash):
+        resource, kind = key
+        if kind != "full":
+            collected[key].append(table)
+            return
+        spill = spills[resource]
+        spill["writer"].write_table(table)
+        spill["rows"] += table.num_rows
+        spill["pages"][page] = page_hash
+        spill["watermark"] = _max_updated(table, spill["watermark"])
+
+    committed = False
+    try:
+        _crawl(ctx, listings, concurrency, on_page, on_progress)
+        summary = {}
+        for resource in resources:
+            spill = spills.get(resource)
+            if spill is None:
+                summary[resource] = _merge(resource, label, site_state[resource],
+                                           collected[(resource, "changed")], collected[(resource, "ids")])
+                continue
+            _close_spill(spill)
+            pages = "".join(spill["pages"][p] for p in sorted(spill["pages"]))
+            digest = hashlib.sha256(f"tableau|{label}|{resource}|{pages}".encode("utf-8")).hexdigest()
+            metadata_store.commit_snapshot(spill["tmp"], digest, f"Tableau {label} · {resource}",
+                                           spill["schema"], spill["rows"])
+            summary[resource] = {"digest": digest, "rows": spill["rows"], "mode": "full",
+                                 "pages": len(spill["pages"]), "watermark": spill["watermark"]}
+        committed = True
+    finally:
+        if not committed:
+            for spill in spills.values():
+                _close_spill(spill)
+                spill["tmp"].unlink(missing_ok=True)
+        sign_out(ctx)
+        session.close()
+
+    if state_path:
+        synced_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        for resource, result in summary.items():
+            site_state[resource] = {"digest": result["digest"], "watermark": result["watermark"], "synced_at": synced_at}
+        _save_site_state(state_path, label, site_state)
+    return {
+        "site": label,
+        "resources": summary,
+        "requests": ctx["requests"],
+        "throttled": ctx["throttled"],
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def extract_site(server: str, site_name: str, token_name: str, token_secret: str,
+                 api_version: str = DEFAULT_API_VERSION, resources=None, concurrency: int = EXTRACT_CONCURRENCY,
+                 page_size: int = EXTRACT_PAGE_SIZE, on_progress=None, cancel: threading.Event = None) -> dict:
+    """Full extraction of `resources` (default: all of RESOURCES) without touching any sync state."""
+    return sync_site(server, site_name, token_name, token_secret, api_version, full=True, resources=resources,
+                     concurrency=concurrency, page_size=page_size, on_progress=on_progress, cancel=cancel)
+
+
+# ---------------- BENCHMARK ----------------
+def _benchmark(workbooks: int, latency_ms: float, rate_limit: int, page_size: int, concurrencies) -> None:
+    import mock_tableau_server
+
+    site = mock_tableau_server.synthetic_site(workbooks)
+    server = mock_tableau_server.serve(site=site, latency=latency_ms / 1000, rate_limit=rate_limit)
+    total_rows = sum(len(items) for items in site.values())
+    print(f"{total_rows:,} objects · page size {page_size} · {latency_ms:g} ms latency"
+          + (f" · {rate_limit} req/s limit" if rate_limit else ""))
+    try:
+        for concurrency in concurrencies:
+            result = extract_site(server.url, "", mock_tableau_server.TOKEN_NAME, mock_tableau_server.TOKEN_SECRET,
+                                  concurrency=concurrency, page_size=page_size)
+            rows = sum(r["rows"] for r in result["resources"].values())
+            print(f"concurrency {concurrency:>3}: {result['seconds']:6.2f}s · {rows / result['seconds']:9,.0f} rows/s · "
+                  f"{result['requests']} requests · {result['throttled']} throttled")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark metadata extraction against mock_tableau_server.py")
+    parser.add_argument("--workbooks", type=int, default=5_000)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    _benchmark(args.workbooks, args.latency_ms, args.rate_limit, args.page_size, args.concurrency)
@@ -0,0 +1,46 @@
+import io
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The deployment provides core.config; outside it, point the backend at a closed port.
+try:
+    import core.config  # noqa: F401
+except ImportError:
+    core = types.ModuleType("core")
+    config = types.ModuleType("core.config")
+    config.BACKEND_URL = "http://127.0.0.1:9"
+    config.CREDENTIALS_PATH = str(ROOT / ".bi4bi_workspace" / "credentials.csv")
+    core.config = config
+    sys.modules.update({"core": core, "core.config": config})
+
+
+def upload(name: str, text: str) -> io.BytesIO:
+    """In-memory stand-in for a Streamlit upload (name, size, getvalue())."""
+    f = io.BytesIO(text.encode("utf-8"))
+    f.name = name
+    f.size = len(f.getvalue())
+    return f
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """An empty metadata_store under tmp_path, with the in-process caches cleared."""
+    import metadata_diff
+    import metadata_ingest
+    import metadata_store
+    from asset_cache import ByteLRUCache
+
+    store_dir = tmp_path / "store"
+    monkeypatch.setattr(metadata_store, "STORE_DIR", store_dir)
+    monkeypatch.setattr(metadata_store, "MANIFEST_PATH", store_dir / "manifest.json")
+    monkeypatch.setattr(metadata_store, "_open_tables", {})
+    monkeypatch.setattr(metadata_ingest, "FRAME_CACHE", ByteLRUCache(64 * 1024 * 1024))
+    monkeypatch.setattr(metadata_ingest, "_DIGESTS", ByteLRUCache(1024 * 1024))
+    monkeypatch.setattr(metadata_diff, "_HASHES", ByteLRUCache(64 * 1024 * 1024))
+    return store_dir
@@ -0,0 +1,97 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import backend_client
+from backend_client import BackendUnavailable, _admit, _record, breaker_failure
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker():
+    backend_client.reset_health()
+    yield
+    backend_client.reset_health()
+
+
+def _fail(n, healthy=False):
+    for _ in range(n):
+        _record("GET /x", 0.01, False, _admit(), "boom", healthy=healthy)
+
+
+def _expire_cooldown():
+    backend_client._breaker["opened_at"] -= backend_client._breaker["cooldown"] + 1
+
+
+def test_breaker_opens_after_enough_failures():
+    _fail(backend_client.BREAKER_MIN_CALLS - 1)
+    assert backend_client.health_snapshot()["state"] == "closed"
+    _fail(1)
+    assert backend_client.health_snapshot()["state"] == "open"
+    with pytest.raises(BackendUnavailable):
+        _admit()
+
+
+def test_half_open_probe_success_closes_the_breaker():
+    _fail(backend_client.BREAKER_MIN_CALLS)
+    _expire_cooldown()
+    assert _admit() is True  # the probe
+    with pytest.raises(BackendUnavailable):
+        _admit()  # only one probe at a time
+    _record("GET /x", 0.01, True, True)
+    assert backend_client.health_snapshot()["state"] == "closed"
+    assert _admit() is False
+
+
+def test_half_open_probe_failure_reopens_with_longer_cooldown():
+    _fail(backend_client.BREAKER_MIN_CALLS)
+    cooldown = backend_client._breaker["cooldown"]
+    _expire_cooldown()
+    _record("GET /x", 0.01, False, _admit(), "still down")
+    assert backend_client.health_snapshot()["state"] == "open"
+    assert backend_client._breaker["cooldown"] == min(2 * cooldown, backend_client.BREAKER_MAX_COOLDOWN_SECONDS)
+
+
+def test_application_errors_do_not_open_the_breaker():
+    _fail(3 * backend_client.BREAKER_MIN_CALLS, healthy=True)
+    health = backend_client.health_snapshot()
+    assert health["state"] == "closed"
+    assert health["endpoints"][0]["error_rate"] == 1.0
+
+
+@pytest.mark.parametrize("status, failure", [(500, False), (404, False), (502, True), (503, True), (504, True)])
+def test_only_gateway_statuses_count_against_the_backend(status, failure):
+    response = requests.Response()
+    response.status_code = status
+    assert breaker_failure(response) is failure
+
+
+def test_connection_errors_and_timeouts_count_against_the_backend():
+    assert breaker_failure(error=requests.ConnectionError("refused"))
+    assert breaker_failure(error=requests.ReadTimeout("slow"))
+    assert not breaker_failure(error=ValueError("bad payload"))
+
+
+def test_relayed_500s_leave_the_breaker_closed():
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = backend_client.get_session()
+        for _ in range(2 * backend_client.BREAKER_MIN_CALLS):
+            assert session.post(f"http://127.0.0.1:{server.server_address[1]}/reports/test-connection",
+                                json={}, timeout=5).status_code == 500
+        assert backend_client.health_snapshot()["state"] == "closed"
+    finally:
+        server.shutdown()
+        backend_client.close()
@@ -0,0 +1,73 @@
+import hashlib
+import io
+import os
+
+import pytest
+import requests
+
+import backend_upload
+import mock_backend
+from backend_upload import UploadError, _open_upload, _send_chunk, upload_to_backend
+
+CHUNK = 1000
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(backend_upload, "UPLOAD_STATE_DIR", tmp_path / "state")
+    monkeypatch.setattr(backend_upload.time, "sleep", lambda seconds: None)  # no backoff waits
+    servers = []
+
+    def start(fail_every=0):
+        servers.append(mock_backend.serve(root=tmp_path / "backend", fail_every=fail_every))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def _file(size=10 * CHUNK + 123):
+    f = io.BytesIO(os.urandom(size))
+    f.name = "metadata.csv"
+    return f
+
+
+def _stored(server, upload_id) -> bytes:
+    return (server.root / upload_id).read_bytes()
+
+
+def test_upload_resumes_after_injected_failures(backend):
+    server = backend(fail_every=3)
+    f = _file()
+    result = upload_to_backend(f, server.url, chunk_size=CHUNK, session=requests.Session())
+    assert server.requests_seen > 11  # 11 chunks, and some of them were dropped
+    assert _stored(server, result["upload_id"]) == f.getvalue()
+    assert result["sha256"] == hashlib.sha256(f.getvalue()).hexdigest()
+    assert server.uploads[result["upload_id"]]["complete"]
+    assert not list(backend_upload.UPLOAD_STATE_DIR.glob("*.json"))  # nothing left to resume
+
+
+def test_stale_offset_gets_a_409_and_resyncs(backend):
+    server = backend()
+    f, session = _file(), requests.Session()
+    data, sha256 = f.getvalue(), hashlib.sha256(f.getvalue()).hexdigest()
+    upload_id = _open_upload(session, server.url, f.name, len(data), sha256, CHUNK)["upload_id"]
+    assert _send_chunk(session, server.url, upload_id, 0, data[:CHUNK]) == CHUNK
+    assert _send_chunk(session, server.url, upload_id, CHUNK, data[CHUNK:2 * CHUNK]) == 2 * CHUNK
+    # a client that lost track of the offset is told where the backend is, and nothing is appended
+    assert _send_chunk(session, server.url, upload_id, 0, data[:CHUNK]) == 2 * CHUNK
+    assert len(_stored(server, upload_id)) == 2 * CHUNK
+
+    result = upload_to_backend(f, server.url, chunk_size=CHUNK, session=session)
+    assert result["upload_id"] == upload_id  # resumed from the recorded upload
+    assert result["sent_bytes"] == len(data) - 2 * CHUNK
+    assert _stored(server, upload_id) == data
+
+
+def test_checksum_mismatch_is_reported(backend, monkeypatch):
+    server = backend()
+    monkeypatch.setattr(backend_upload, "file_sha256", lambda fileobj: "0" * 64)
+    with pytest.raises(UploadError, match="Checksum mismatch"):
+        upload_to_backend(_file(), server.url, chunk_size=CHUNK, session=requests.Session())
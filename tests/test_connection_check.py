@@ -0,0 +1,180 @@
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+import connection_check
+from backend_client import BackendUnavailable
+from connection_check import (ConnectionCheckError, ConnectionCheckTimeout, _run_stage, check_connection,
+                              check_many, parse_site_list)
+
+CONFIG = {"tableau_prod": {"server": "https://tableau.example.com", "site_name": "finance"}}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(connection_check, "_results", {})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual monotonic clock for the result cache; advance with clock.now += seconds."""
+    fake = types.SimpleNamespace(now=1000.0, perf_counter=time.perf_counter)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(connection_check, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    """Replace the staged check with one that returns (or raises) `checks.outcome`, counting calls."""
+    fake = types.SimpleNamespace(calls=0, outcome={"stages": [("sign-in", 0.01)], "seconds": 0.01, "warnings": []})
+
+    def run(*args, **kwargs):
+        fake.calls += 1
+        if isinstance(fake.outcome, Exception):
+            raise fake.outcome
+        return fake.outcome
+
+    monkeypatch.setattr(connection_check, "_run_check", run)
+    return fake
+
+
+def _failure(message, cause=None):
+    error = ConnectionCheckError(message)
+    error.__cause__ = cause
+    return error
+
+
+def test_stage_deadline_starts_when_the_stage_runs():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(time.sleep, 0.3)  # the only thread is busy for longer than the stage's timeout
+        assert _run_stage("slow queue", lambda: "ok", timeout=0.2, executor=pool) == "ok"
+
+
+def test_stage_that_runs_too_long_times_out():
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(ConnectionCheckTimeout):
+            _run_stage("sleepy", lambda: time.sleep(0.5), timeout=0.1, executor=pool)
+
+
+def test_timeouts_are_not_cached(monkeypatch):
+    def timing_out(*args, **kwargs):
+        raise ConnectionCheckTimeout("Sign-in timed out after 1s")
+
+    monkeypatch.setattr(connection_check, "_run_check", timing_out)
+    config = {"tableau_prod": {"server": "https://tableau.example.com", "site_name": "timeouts"}}
+    with pytest.raises(ConnectionCheckTimeout):
+        connection_check.check_connection("tableau", config)
+    assert connection_check._cached(connection_check.config_fingerprint("tableau", config)) is None
+
+
+def test_connect_tries_every_resolved_address():
+    import socket
+    with socket.socket() as listener:
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        with socket.socket() as closed:
+            closed.bind(("127.0.0.1", 0))
+            dead_port = closed.getsockname()[1]  # bound but not listening: refuses connections
+            addrinfo = [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", dead_port)),
+                        (socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+            assert connection_check._connect(addrinfo, "localhost", tls=False) == ("127.0.0.1", port)
+
+
+def test_frontend_network_failures_do_not_fail_the_check(monkeypatch):
+    def unresolvable(host, port):
+        raise connection_check.ConnectionCheckError(f"DNS lookup for {host} failed")
+
+    monkeypatch.setattr(connection_check, "_resolve", unresolvable)
+    monkeypatch.setattr(connection_check.backend_client, "post_json", lambda *args, **kwargs: {"ok": True})
+    result = connection_check._run_check("tableau", {"tableau_prod": {"server": "https://internal.example"}})
+    assert [stage for stage, _ in result["stages"]] == ["sign-in"]
+    assert result["warnings"] == ["DNS lookup for internal.example failed"]
+
+
+def test_results_are_cached_until_their_ttl(clock, checks):
+    assert check_connection("tableau", CONFIG)["cached"] is False
+    clock.now += connection_check.RESULT_TTL_SECONDS - 1
+    assert check_connection("tableau", CONFIG)["cached"] is True
+    assert checks.calls == 1
+    clock.now += 2
+    assert check_connection("tableau", CONFIG)["cached"] is False
+    assert checks.calls == 2
+
+
+def test_failures_are_cached_for_less(clock, checks):
+    assert connection_check.FAILURE_TTL_SECONDS < connection_check.RESULT_TTL_SECONDS
+    checks.outcome = _failure("Sign-in failed: HTTP 401")
+    with pytest.raises(ConnectionCheckError):
+        check_connection("tableau", CONFIG)
+    clock.now += connection_check.FAILURE_TTL_SECONDS - 1
+    with pytest.raises(ConnectionCheckError, match="cached"):
+        check_connection("tableau", CONFIG)
+    assert checks.calls == 1
+    clock.now += 2
+    with pytest.raises(ConnectionCheckError):
+        check_connection("tableau", CONFIG)
+    assert checks.calls == 2
+
+
+@pytest.mark.parametrize("cause", [BackendUnavailable("breaker open"), requests.Timeout("read timed out"),
+                                   TimeoutError("timed out")])
+def test_backend_outages_and_timeouts_are_not_cached(clock, checks, cause):
+    checks.outcome = _failure("Sign-in failed", cause)
+    for _ in range(2):
+        with pytest.raises(ConnectionCheckError):
+            check_connection("tableau", CONFIG)
+    assert checks.calls == 2
+
+
+def test_force_refresh_skips_the_cache(clock, checks):
+    check_connection("tableau", CONFIG)
+    assert check_connection("tableau", CONFIG, force_refresh=True)["cached"] is False
+    assert checks.calls == 2
+
+
+def test_check_many_runs_at_most_concurrency_stages_at_once(monkeypatch):
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def stage():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return "ok"
+
+    def run(adapter_key, config, on_progress=None, cancel=None, executor=None):
+        _run_stage("fake", stage, 5, cancel, executor)
+        return {"stages": [("fake", 0.05)], "seconds": 0.05, "warnings": []}
+
+    monkeypatch.setattr(connection_check, "_run_check", run)
+    configs = [{"tableau_prod": {"server": f"https://tableau{i}.example.com"}} for i in range(12)]
+    rows = check_many("tableau", configs, concurrency=3)
+    assert [row["status"] for row in rows] == ["ok"] * 12
+    assert peak[0] == 3
+
+
+def test_parse_site_list_with_a_header_and_defaults():
+    text = "Server, Site, Token Name\nhttps://a.example, sales, tok-a\nhttps://b.example, ,\n, orphan, tok\n"
+    defaults = {"personal_access_token_name": "form", "personal_access_token_secret": "secret"}
+    assert parse_site_list(text, defaults) == [
+        {"tableau_prod": {"server": "https://a.example", "site_name": "sales",
+                          "personal_access_token_name": "tok-a", "personal_access_token_secret": "secret"}},
+        {"tableau_prod": {"server": "https://b.example",
+                          "personal_access_token_name": "form", "personal_access_token_secret": "secret"}},
+    ]
+
+
+def test_parse_site_list_without_a_header_reads_columns_in_order():
+    sites = parse_site_list("a.example,hr,3.20\nb.example\n")
+    assert sites == [{"tableau_prod": {"server": "a.example", "site_name": "hr", "api_version": "3.20"}},
+                     {"tableau_prod": {"server": "b.example"}}]
+    assert parse_site_list("  \n") == []
@@ -0,0 +1,35 @@
+import threading
+import time
+
+import jobs
+
+
+def _wait(job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while jobs.is_active(jobs.get_job(job_id)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return jobs.get_job(job_id)
+
+
+def test_batch_jobs_do_not_hold_up_interactive_ones():
+    release = threading.Event()
+    batch = [jobs.submit_job("sync", release.wait, 5, lane="batch") for _ in range(jobs.BATCH_JOB_WORKERS + 1)]
+    try:
+        quick = _wait(jobs.submit_job("test connection", lambda: "ok"), timeout=1.0)
+        assert (quick["status"], quick["result"]) == ("done", "ok")
+    finally:
+        release.set()
+    assert all(_wait(j)["status"] == "done" for j in batch)
+
+
+def test_session_keeps_active_and_last_finished_jobs():
+    finished = [jobs.submit_job("done", lambda: None) for _ in range(jobs.SESSION_FINISHED_JOBS + 3)]
+    for j in finished:
+        _wait(j)
+    release = threading.Event()
+    active = jobs.submit_job("running", release.wait, 5)
+    try:
+        kept = jobs._prune_session([active] + finished + [10 ** 9])  # an id that no longer exists
+        assert kept == [active] + finished[-jobs.SESSION_FINISHED_JOBS:]
+    finally:
+        release.set()
@@ -0,0 +1,54 @@
+import io
+
+import pandas as pd
+import pytest
+
+from conftest import upload
+from lineage import _snapshot_frame, apply_changes, build_lineage, impacted, lineage_for_snapshot, nodes_of_kind
+from metadata_ingest import ingest_upload
+
+FIELDS = "site,datasource_id,workbook_id,view_id,view_name,field_id\n"
+VIEWS = "site,datasource_id,workbook_id,view_id,view_name\n"
+
+
+def _closures(index) -> dict:
+    """label -> impacted labels, for every node that has any."""
+    return {label: sorted(impacted(index, label)) for label in index["nodes"] if impacted(index, label)}
+
+
+def _incremental_and_full(first: str, second: str):
+    lineage_for_snapshot(ingest_upload(upload("old.csv", first), owner="ann")["digest"])
+    new = ingest_upload(upload("new.csv", second), owner="ann")
+    assert new["diff"] is not None
+    incremental = lineage_for_snapshot(new["digest"], new["diff"])
+    return incremental, build_lineage(_snapshot_frame(new["digest"]))
+
+
+def test_removing_a_field_row_with_repeated_keys(store):
+    rows = ["A,d1,w1,v1,Map,f1", "A,d1,w1,v1,Map,f2", "A,d1,w1,v2,Bar,f1"]
+    incremental, full = _incremental_and_full(FIELDS + "\n".join(rows) + "\n",
+                                              FIELDS + "\n".join(rows[:1] + rows[2:]) + "\n")
+    assert "field:f2" not in impacted(incremental, "view:v1")
+    assert _closures(incremental) == _closures(full)
+    assert sorted(incremental["nodes"]) == sorted(full["nodes"])
+
+
+@pytest.mark.parametrize("second", [
+    "A,d1,w1,v1,Map\nA,d2,w2,v2,Bar\nA,d2,w3,v3,Pie\n",  # v2 moved to another workbook, v3 added
+    "A,d1,w1,v1,Map\n",  # v2 deleted
+])
+def test_incremental_matches_full_rebuild_with_unique_keys(store, second):
+    incremental, full = _incremental_and_full(VIEWS + "A,d1,w1,v1,Map\nA,d1,w1,v2,Bar\n", VIEWS + second)
+    assert _closures(incremental) == _closures(full)
+    assert sorted(incremental["nodes"]) == sorted(full["nodes"])
+
+
+def test_objects_whose_last_row_went_are_dropped():
+    old = pd.read_csv(io.StringIO(VIEWS + "A,d1,w1,v1,Map\nA,d2,w2,v2,Bar\nA,d2,w2,v3,Pie\n"))
+    index = build_lineage(old)
+    apply_changes(index, old.iloc[:0], old.iloc[[0]])  # d1 -> w1 -> v1 is gone
+    full = build_lineage(old.iloc[1:])
+    assert nodes_of_kind(index, "datasource") == nodes_of_kind(full, "datasource") == ["datasource:d2"]
+    assert sorted(index["nodes"]) == sorted(full["nodes"])
+    assert index["node_ids"] == {label: i for i, label in enumerate(index["nodes"])}
+    assert _closures(index) == _closures(full)
@@ -0,0 +1,53 @@
+from conftest import upload
+from metadata_diff import delta_frame, diff_summary
+from metadata_ingest import ingest_upload
+
+HEADER = "site,workbook_id,workbook_name,view_id,view_name,view_count\n"
+
+
+def test_first_upload_has_no_diff(store):
+    assert ingest_upload(upload("a.csv", HEADER + "A,w1,Sales,v1,Map,3\n"), owner="ann")["diff"] is None
+
+
+def test_reupload_of_the_same_site_is_diffed_by_key(store):
+    ingest_upload(upload("week1.csv", HEADER + "A,w1,Sales,v1,Map,3\nA,w1,Sales,v2,Bar,5\nA,w2,Ops,v3,Pie,1\n"),
+                  owner="ann")
+    diff = ingest_upload(upload("week2.csv", HEADER + "A,w1,Sales,v1,Map,3\nA,w1,Sales,v2,Bar,9\nA,w2,Ops,v4,New,0\n"),
+                         owner="ann")["diff"]
+    assert diff["by"] == "key"
+    assert diff["previous_name"] == "week1.csv"
+    summary = diff_summary(diff)
+    assert (summary["added"], summary["changed"], summary["deleted"], summary["unchanged"]) == (1, 1, 1, 1)
+    delta = delta_frame(diff)
+    assert sorted(delta["_change"]) == ["added", "changed", "deleted"]
+    assert delta.loc[delta["_change"] == "deleted", "view_id"].tolist() == ["v3"]
+
+
+def test_another_site_is_not_diffed_against(store):
+    ingest_upload(upload("siteA.csv", HEADER + "A,w1,Sales,v1,Map,3\nA,w1,Sales,v2,Bar,5\n"), owner="ann")
+    assert ingest_upload(upload("siteB.csv", HEADER + "B,w9,Ops,v9,Pie,1\n"), owner="ann")["diff"] is None
+
+
+def test_another_owners_upload_is_not_diffed_against(store):
+    ingest_upload(upload("a.csv", HEADER + "A,w1,Sales,v1,Map,3\n"), owner="ann")
+    assert ingest_upload(upload("a2.csv", HEADER + "A,w1,Sales,v1,Map,4\n"), owner="bob")["diff"] is None
+    assert ingest_upload(upload("a3.csv", HEADER + "A,w1,Sales,v1,Map,5\n"))["diff"] is None  # no owner
+
+
+def test_repeated_keys_fall_back_to_whole_rows(store):
+    header = "site,view_id,view_name,field_id,field_name\n"
+    ingest_upload(upload("fields.csv", header + "A,v1,Map,f1,Sales\nA,v1,Map,f2,Region\nA,v2,Bar,f1,Sales\n"),
+                  owner="ann")
+    diff = ingest_upload(upload("fields2.csv", header + "A,v1,Map,f1,Sales\nA,v2,Bar,f1,Sales\n"), owner="ann")["diff"]
+    assert diff["by"] == "row"
+    summary = diff_summary(diff)
+    assert (summary["added"], summary["changed"], summary["deleted"], summary["unchanged"]) == (0, 0, 1, 2)
+    deleted = delta_frame(diff)
+    assert deleted[["view_id", "field_id"]].values.tolist() == [["v1", "f2"]]
+
+
+def test_changed_share_is_at_most_one(store):
+    header = "site,view_id,view_name,field_id\n"
+    ingest_upload(upload("x.csv", header + "A,v1,Map,f1\nA,v1,Map,f2\n"), owner="ann")
+    diff = ingest_upload(upload("y.csv", header + "A,v1,Map,f3\nA,v1,Map,f4\n"), owner="ann")["diff"]
+    assert diff_summary(diff)["changed_share"] == 1.0
@@ -0,0 +1,85 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import upload
+import metadata_store
+from metadata_ingest import ingest_batch, ingest_csv_streaming
+from metadata_schema import detect_layout
+
+VIEWS_HEADER = "site,workbook_id,workbook_name,view_id,view_name,view_count\n"
+
+
+def test_views_export_with_workbook_columns_is_a_views_layout():
+    assert detect_layout(VIEWS_HEADER.strip().split(",")) == "tableau_views"
+    assert detect_layout(["site", "workbook_id", "workbook_name"]) == "tableau_workbooks"
+
+
+def test_batch_keeps_distinct_rows_that_share_a_workbook(store):
+    a = upload("a.csv", VIEWS_HEADER + "s,w1,Sales,v1,Map,3\ns,w1,Sales,v2,Bar,5\ns,w2,Ops,v3,Pie,1\n")
+    b = upload("b.csv", VIEWS_HEADER + "s,w1,Sales,v4,Line,2\ns,w2,Ops,v5,Table,8\n")
+    result = ingest_batch([a, b])
+    assert result["rows"] == 5
+    assert result["duplicates"] == 0
+    assert sorted(result["frame"]["view_id"]) == ["v1", "v2", "v3", "v4", "v5"]
+
+
+def test_batch_drops_only_identical_rows(store):
+    a = upload("a.csv", VIEWS_HEADER + "s,w1,Sales,v1,Map,3\ns,w1,Sales,v2,Bar,5\n")
+    b = upload("b.csv", VIEWS_HEADER + "s,w1,Sales,v1,Map,3\ns,w1,Sales,v2,Bar,6\n")
+    result = ingest_batch([a, b])
+    assert result["duplicates"] == 1
+    assert result["rows"] == 3  # v2 differs in view_count, so both versions stay
+
+
+def test_batch_reports_schema_mismatch(store):
+    a = upload("a.csv", VIEWS_HEADER + "s,w1,Sales,v1,Map,3\n")
+    b = upload("b.csv", "site,user_id,user_name\ns,u1,Ann\n")
+    result = ingest_batch([a, b])
+    assert result["rows"] == 1
+    assert result["files"][1]["status"].startswith("schema mismatch")
+
+
+def test_batch_reads_compressed_uploads(store):
+    import gzip
+    import io
+    import zipfile
+
+    gz = io.BytesIO(gzip.compress((VIEWS_HEADER + "s,w1,Sales,v1,Map,3\n").encode()))
+    gz.name, gz.size = "a.csv.gz", len(gz.getvalue())
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as z:
+        z.writestr("b.csv", VIEWS_HEADER + "s,w1,Sales,v2,Bar,5\n")
+        z.writestr("c.csv", VIEWS_HEADER + "s,w2,Ops,v3,Pie,1\n")
+    archive.name, archive.size = "bc.zip", len(archive.getvalue())
+    result = ingest_batch([gz, archive])
+    assert [f["status"] for f in result["files"]] == ["ok", "ok"]
+    assert sorted(result["frame"]["view_id"]) == ["v1", "v2", "v3"]
+
+
+def test_read_csv_any_in_chunks_matches_a_plain_read():
+    import pandas as pd
+
+    from metadata_ingest import read_csv_any
+
+    text = VIEWS_HEADER + "".join(f"s,w{i % 3},Wb,v{i},View,{i}\n" for i in range(25))
+    chunked = read_csv_any(upload("views.csv", text), "views.csv", chunk_rows=4)
+    pd.testing.assert_frame_equal(chunked, pd.read_csv(upload("views.csv", text)))
+
+
+def test_streaming_widens_a_column_that_turns_to_text(store):
+    text = "view_id,view_count\n" + "".join(f"v{i},{i}\n" for i in range(6)) + "v6,unknown\nv7,7\n"
+    result = ingest_csv_streaming(upload("views.csv", text), "widen", chunk_rows=2)
+    assert result["rows"] == 8
+    snapshot = metadata_store.open_snapshot("widen")
+    assert str(snapshot.schema.field("view_count").type) == "string"
+    counts = metadata_store.load_snapshot_frame("widen")["view_count"].tolist()
+    assert counts[5:] == ["5", "unknown", "7"]
+
+
+def test_concurrent_streaming_ingests_of_one_file_do_not_collide(store):
+    text = "view_id,view_count\n" + "".join(f"v{i},{i}\n" for i in range(5000))
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(lambda _: ingest_csv_streaming(upload("views.csv", text), "same", chunk_rows=100),
+                                range(4)))
+    assert [r["rows"] for r in results] == [5000] * 4
+    assert metadata_store.open_snapshot("same").num_rows == 5000
+    assert not list(store.glob("*.tmp"))
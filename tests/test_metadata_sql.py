@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+duckdb = pytest.importorskip("duckdb")
+
+from conftest import upload  # noqa: E402
+from metadata_ingest import ingest_upload  # noqa: E402
+from metadata_sql import SQL_THREADS, _snapshot_view_name, fetch_page, run_query  # noqa: E402
+
+HEADER = "site,view_id,view_name\n"
+
+
+def _rows(sql, source_hash, **kwargs):
+    return fetch_page(run_query(sql, source_hash, **kwargs), 0)
+
+
+def test_query_reads_the_upload(store):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\nA,v2,Bar\n"))["digest"]
+    assert _rows("SELECT count(*) AS n FROM metadata", digest)["n"].tolist() == [2]
+
+
+def test_files_are_off_limits(store):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    with pytest.raises(duckdb.PermissionException):
+        run_query("SELECT * FROM read_csv('/etc/hostname')", digest)
+
+
+@pytest.mark.parametrize("sql", [
+    "COPY (SELECT 1) TO 'leak.csv'",
+    "INSTALL httpfs",
+    "SET enable_external_access = true",
+    "SET memory_limit = '100GB'",
+    "CREATE MACRO leak() AS 1",
+    "SELECT 1; SELECT 2",
+])
+def test_only_a_single_select_runs(store, sql):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    with pytest.raises(duckdb.InvalidInputException):
+        run_query(sql, digest)
+
+
+def test_nothing_a_query_creates_outlives_it(store):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    with pytest.raises(duckdb.InvalidInputException):
+        run_query("CREATE TABLE leak AS SELECT * FROM metadata", digest)
+    with pytest.raises(duckdb.CatalogException):
+        run_query("SELECT * FROM leak", digest)
+
+
+def test_memory_and_threads_are_capped(store):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    settings = _rows("SELECT current_setting('threads') AS threads, "
+                     "current_setting('lock_configuration') AS locked", digest)
+    assert settings["threads"].tolist() == [SQL_THREADS]
+    assert settings["locked"].tolist() == [True]
+
+
+def test_a_cancelled_query_is_interrupted(store):
+    digest = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    with pytest.raises(duckdb.InterruptException):
+        run_query("SELECT count(*) FROM range(100000000000) a, metadata", digest, cancel=cancel)
+
+
+def test_only_the_sessions_snapshots_can_be_joined(store):
+    mine = ingest_upload(upload("a.csv", HEADER + "A,v1,Map\n"))["digest"]
+    other = ingest_upload(upload("b.csv", HEADER + "B,v9,Secret\n"))["digest"]
+    sql = f"SELECT * FROM {_snapshot_view_name(other)}"
+    with pytest.raises(duckdb.CatalogException):
+        run_query(sql, mine)
+    assert _rows(sql, mine, snapshots=[other])["view_id"].tolist() == ["v9"]
@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+
+from similarity import DEFAULT_THRESHOLD, find_near_duplicates, lsh_params
+
+TOKENS = 40
+
+
+def _reports(originals: int = 300, copies: int = 60, changed: int = 2, seed: int = 0):
+    """Reports with distinct random fields, plus copies of some with `changed` fields replaced."""
+    rng = np.random.default_rng(seed)
+    vocabulary = rng.permutation(10_000_000)[:(originals + copies) * TOKENS].reshape(-1, TOKENS)
+    fields = vocabulary[:originals].copy()
+    sources = rng.choice(originals, size=copies, replace=False)
+    planted = fields[sources].copy()
+    planted[:, :changed] = vocabulary[originals:, :changed]  # fresh values no other report has
+    fields = np.vstack([fields, planted])
+    df = pd.DataFrame({
+        "workbook_id": np.repeat([f"wb{i}" for i in range(len(fields))], TOKENS),
+        "field_name": [f"f{v}" for v in fields.ravel()],
+    })
+    pairs = {frozenset((f"wb{originals + k}", f"wb{src}")) for k, src in enumerate(sources)}
+    return df, pairs
+
+
+def test_planted_near_duplicates_are_found_without_false_pairs():
+    df, planted = _reports()  # a copy shares 38 of 42 distinct fields: Jaccard 0.90
+    result = find_near_duplicates(df, DEFAULT_THRESHOLD)
+    assert (result["bands"], result["rows"]) == lsh_params(DEFAULT_THRESHOLD)
+    found = {frozenset(pair) for pair in zip(result["pairs"]["a"], result["pairs"]["b"])}
+    assert found == planted
+    assert (result["clusters"]["size"] == 2).all()
+    assert len(result["clusters"]) == len(planted)
+
+
+def test_copies_below_the_threshold_are_not_paired():
+    df, _ = _reports(changed=12)  # 28 of 52 fields shared: Jaccard 0.54
+    result = find_near_duplicates(df, DEFAULT_THRESHOLD)
+    assert result["pairs"].empty
+    assert result["clusters"].empty
+
+
+def test_lsh_params_favour_recall_at_the_threshold():
+    bands, rows = lsh_params(DEFAULT_THRESHOLD)
+    assert bands * rows <= 128
+    assert 1 - (1 - DEFAULT_THRESHOLD ** rows) ** bands > 0.8  # a pair right at the threshold
+    assert 1 - (1 - 0.9 ** rows) ** bands > 0.99  # a pair comfortably above it
+    assert 1 - (1 - 0.3 ** rows) ** bands < 0.05  # a clearly distinct one almost never is
@@ -0,0 +1,81 @@
+import hashlib
+import io
+import os
+import threading
+from pathlib import Path
+
+from asset_cache import file_fingerprint
+
+try:
+    from PIL import Image
+except ImportError:  # thumbnails are an optimisation; fall back to the original files
+    Image = None
+
+# NOTE: thumbnails are built on first use and kept on disk keyed by the SOURCE content hash,
+# so restarts and other worker processes reuse them and an edited logo gets new ones.
+
+THUMB_DIR = Path(os.environ.get("BI4BI_THUMB_DIR", Path(__file__).parent / ".cache" / "thumbnails"))
+THUMB_FORMATS = ("webp", "png")
+
+_resolved = {}  # (file_fingerprint, width) -> Path
+_lock = threading.Lock()
+
+
+def _source_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+
+
+def _encode_smallest(img) -> tuple:
+    """Encode `img` as every format in THUMB_FORMATS and keep the smallest (ext, bytes)."""
+    best = None
+    for ext in THUMB_FORMATS:
+        buf = io.BytesIO()
+        if ext == "webp":
+            img.save(buf, format="WEBP", quality=90, method=6)
+        else:
+            img.save(buf, format="PNG", optimize=True)
+        if best is None or buf.tell() < len(best[1]):
+            best = (ext, buf.getvalue())
+    return best
+
+
+def _build(src: Path, width: int, target_stem: Path) -> Path:
+    with Image.open(src) as im:
+        img = im.convert("RGBA")
+    if img.width > width:
+        img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+    ext, data = _encode_smallest(img)
+    target = target_stem.with_name(f"{target_stem.name}.{ext}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f".{target.name}.{os.getpid()}-{threading.get_ident()}.tmp")  # sessions render concurrently
+    tmp.write_bytes(data)
+    os.replace(tmp, target)
+    return target
+
+
+def get_thumbnail(src: Path, width: int = 120) -> Path:
+    """Path of a `width`-px-wide thumbnail of `src` (WebP or PNG, whichever is smaller)."""
+    if Image is None:
+        return src
+    key = (file_fingerprint(src), width)
+    with _lock:
+        cached = _resolved.get(key)
+    if cached is not None and cached.exists():
+        return cached
+
+    target_stem = THUMB_DIR / f"{src.stem}.{_source_hash(src)}.{width}w"
+    existing = [target_stem.with_name(f"{target_stem.name}.{ext}") for ext in THUMB_FORMATS]
+    thumb = next((p for p in existing if p.exists()), None)
+    if thumb is None:
+        try:
+            thumb = _build(src, width, target_stem)
+        except OSError:  # unreadable / unsupported image — show the original
+            return src
+    with _lock:
+        _resolved[key] = thumb
+    return thumb
+
+
+def get_thumbnail_set(src: Path, width: int = 120) -> tuple:
+    """(1x, 2x) thumbnails for `src` displayed at `width` CSS pixels."""
+    return get_thumbnail(src, width), get_thumbnail(src, width * 2)